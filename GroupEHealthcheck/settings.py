@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 
@@ -30,11 +31,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "healthcheck.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "healthcheck.middleware.AccessScopeMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -59,13 +62,144 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "GroupEHealthcheck.wsgi.application"
 
-DATABASES = {
-    "default": {
+# database profile; choose with HEALTHCHECK_DB_PROFILE=sqlite|sqlite-concurrent|postgres
+# sqlite-concurrent keeps connections open, starts write transactions with BEGIN IMMEDIATE
+# (Django 5.1+) and runs SQLITE_PRAGMAS on every new connection, so parallel vote submissions
+# wait for the write lock instead of failing with "database is locked"; postgres uses
+# psycopg's connection pool (pip install "psycopg[pool]")
+DATABASE_PROFILES = {
+    "sqlite": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    "sqlite-concurrent": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+        # tests use a file too: the in-memory test database locks whole tables and would
+        # fail parallel writers instead of making them wait
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+    },
+    "postgres": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("HEALTHCHECK_DB_NAME", "healthcheck"),
+        "USER": os.environ.get("HEALTHCHECK_DB_USER", "healthcheck"),
+        "PASSWORD": os.environ.get("HEALTHCHECK_DB_PASSWORD", ""),
+        "HOST": os.environ.get("HEALTHCHECK_DB_HOST", "localhost"),
+        "PORT": os.environ.get("HEALTHCHECK_DB_PORT", "5432"),
+        "OPTIONS": {
+            "pool": {
+                "min_size": 2,
+                "max_size": int(os.environ.get("HEALTHCHECK_DB_POOL_SIZE", "10")),
+            },
+        },
+    },
+}
+
+DATABASE_PROFILE = os.environ.get("HEALTHCHECK_DB_PROFILE", "sqlite")
+
+DATABASES = {
+    "default": DATABASE_PROFILES[DATABASE_PROFILE],
 }
 
+# PRAGMAs run on each new SQLite connection (healthcheck/db.py): WAL lets the dashboards keep
+# reading while a vote is written, busy_timeout (ms) waits for the write lock, and NORMAL
+# synchronous is durable with WAL apart from the last commits on power loss
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 20000,
+    "synchronous": "NORMAL",
+} if DATABASE_PROFILE == "sqlite-concurrent" else {}
+
+# cache used for dashboard results; choose with HEALTHCHECK_CACHE_BACKEND=locmem|file|db
+# (file and db are shared between worker processes; db needs `manage.py createcachetable`)
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "healthcheck",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("HEALTHCHECK_CACHE_LOCATION", str(BASE_DIR / "cache")),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": os.environ.get("HEALTHCHECK_CACHE_LOCATION", "healthcheck_cache"),
+    },
+}
+
+CACHES = {
+    "default": CACHE_BACKENDS[os.environ.get("HEALTHCHECK_CACHE_BACKEND", "locmem")],
+    # sessions kept in the cache get their own file-based cache: shared by every worker
+    # process, outside the database, and not evicted along with dashboard results
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("HEALTHCHECK_SESSION_CACHE_LOCATION", str(BASE_DIR / "cache" / "sessions")),
+        "TIMEOUT": SESSION_COOKIE_AGE,
+    },
+}
+
+# where sessions live; choose with HEALTHCHECK_SESSION_STORAGE=db|cached_db|cache|signed_cookies
+# db writes and reads django_session in the same SQLite file as the votes; cached_db still
+# writes there but serves reads from the sessions cache; cache and signed_cookies keep
+# sessions out of the database (a cleared cache or a changed SECRET_KEY logs everyone out,
+# and signed cookies are readable by the browser and cannot be revoked before they expire)
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+SESSION_STORAGE = os.environ.get("HEALTHCHECK_SESSION_STORAGE", "db")
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STORAGE]
+
+SESSION_CACHE_ALIAS = "sessions"
+
+# whether every process sees the same cache; with locmem each process has its own, so the
+# version bumps another process makes (a worker, import_healthcheck, generate_synthetic_org)
+# never reach it and entries must expire quickly instead
+SHARED_CACHE = CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+
+# seconds a dashboard result may be served from the cache
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# seconds the department/team/session reference data is cached (changes invalidate it)
+REFERENCE_CACHE_TIMEOUT = 86400 if SHARED_CACHE else 30
+
+# seconds a user's access scope (role, department, teams) is cached (changes invalidate it)
+ACCESS_SCOPE_CACHE_TIMEOUT = 3600 if SHARED_CACHE else 30
+
+# who folds new vote events into the votes and tallies; choose with
+# HEALTHCHECK_VOTE_CONSUMER=inline|worker. inline does it right after each submission
+# commits; worker leaves it to `manage.py consume_vote_events --follow`, keeping
+# submissions to a single INSERT while the dashboards lag by the polling interval
+VOTE_EVENT_CONSUMER = os.environ.get("HEALTHCHECK_VOTE_CONSUMER", "inline")
+
+# seconds a closed session's trend results are cached (votes still invalidate them)
+TREND_CACHE_TIMEOUT = 86400 if SHARED_CACHE else DASHBOARD_CACHE_TIMEOUT
+
+# how many sessions, up to the chosen one, the organisation overview compares
+ORG_OVERVIEW_SESSIONS = 4
+
+# a decline alert is raised when a team's share of good votes on a card falls by at least
+# DECLINE_ALERT_MIN_DROP percentage points from one session to the next, with at least
+# DECLINE_ALERT_MIN_VOTES votes in both
+DECLINE_ALERT_MIN_DROP = 25
+DECLINE_ALERT_MIN_VOTES = 3
+
+# where dashboard numbers come from: "tallies" (the VoteTally table) or "cube" (an
+# in-memory NumPy vote cube per process, needs numpy)
+DASHBOARD_SUMMARY_SOURCE = os.environ.get("HEALTHCHECK_SUMMARY_SOURCE", "tallies")
+
+# seconds before a process reloads its vote cube; it is also updated as this process
+# saves votes, but votes written by other processes only show up after a reload
+VOTE_CUBE_MAX_AGE = 60
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = "en-us"
@@ -0,0 +1,190 @@
+# which teams and departments a user may look at and vote for, following the rules of the
+# team and department dashboard views
+#
+# a user's role, own department and team memberships are cached per user under a version
+# counter that UserProfile and TeamMembership signals bump on commit; everything derived
+# from them is worked out against the reference data, so team moves apply at once
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from .models import TeamMembership, UserProfile
+from .reference import get_reference_data
+
+
+KEY_PREFIX = 'hc:scope'
+
+DEPARTMENT_VIEW_ROLES = ['departmentLeader', 'seniorManager']
+
+
+def get_user_profile(user):
+    try:
+        return user.userprofile
+    except UserProfile.DoesNotExist:
+        return None
+
+
+class AccessScope:
+    def __init__(self, user_id=None, role=None, department_id=None, team_ids=()):
+        self.user_id = user_id
+        self.role = role
+        self._department_id = department_id
+        self.team_ids = frozenset(team_ids)
+
+    @cached_property
+    def reference(self):
+        return get_reference_data()
+
+    @property
+    def has_profile(self):
+        return self.role is not None
+
+    @property
+    def role_display(self):
+        return dict(UserProfile.ROLES).get(self.role, self.role)
+
+    @property
+    def can_vote(self):
+        return self.has_profile and self.role not in DEPARTMENT_VIEW_ROLES
+
+    # the user's own department (department leaders), None if unset or since deleted
+    @property
+    def department(self):
+        return self.reference.department(self._department_id)
+
+    @property
+    def department_id(self):
+        department = self.department
+        return department.id if department else None
+
+    # teams the user belongs to, by department then team name
+    @cached_property
+    def teams(self):
+        teams = [team for team in map(self.reference.team, self.team_ids) if team]
+        return sorted(teams, key=lambda team: (team.department.name if team.department else '', team.name))
+
+    # departments of the teams the user belongs to
+    @cached_property
+    def member_department_ids(self):
+        teams = (self.reference.team(team_id) for team_id in self.team_ids)
+        return {team.department_id for team in teams if team and team.department_id}
+
+    # departments whose teams the team dashboard shows: all of them for senior managers, the
+    # leader's own for department leaders, and those of the user's teams for everyone else
+    @cached_property
+    def permitted_department_ids(self):
+        if not self.has_profile:
+            return set()
+        if self.role == 'seniorManager':
+            return set(self.reference.department_by_id)
+        if self.role == 'departmentLeader':
+            return {self.department_id} if self.department_id else set()
+        return self.member_department_ids
+
+    def permitted_departments(self):
+        return [department for department in self.reference.departments if department.id in self.permitted_department_ids]
+
+    # teams shown on the team dashboard and in trends, by name; senior managers also see
+    # teams without a department
+    def dashboard_teams(self):
+        if self.role == 'seniorManager':
+            return self.reference.teams
+        return [team for team in self.reference.teams if team.department_id in self.permitted_department_ids]
+
+    # departments available on the department dashboard, by name; only leaders and senior
+    # managers get one, and a department leader needs a department of their own first
+    def dashboard_departments(self):
+        if self.role not in DEPARTMENT_VIEW_ROLES:
+            return []
+        if self.role == 'departmentLeader' and not self.department_id:
+            return []
+        return self.reference.departments
+
+    # teams whose vote comments the user may search: every team for senior managers, those of
+    # their own department for department leaders and their own teams for team leaders
+    def comment_search_teams(self):
+        if self.role == 'seniorManager':
+            return self.reference.teams
+        if self.role == 'departmentLeader':
+            return self.reference.department_teams(self.department_id) if self.department_id else []
+        if self.role == 'teamLeader':
+            return self.teams
+        return []
+
+    # departments whose decline alerts the user may list: every one for senior managers and
+    # their own for department leaders
+    def decline_alert_departments(self):
+        if self.role == 'seniorManager':
+            return self.reference.departments
+        if self.role == 'departmentLeader':
+            return [self.department] if self.department else []
+        return []
+
+    # teams the user may vote for: every team in the departments of the teams they belong
+    # to, by department then team name
+    @cached_property
+    def votable_teams(self):
+        return [
+            team
+            for department in self.reference.departments if department.id in self.member_department_ids
+            for team in self.reference.department_teams(department.id)
+        ]
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:ver:{user_id}'
+
+
+def _version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so a lost counter never comes back to an old version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _load(user_id):
+    profile = UserProfile.objects.filter(user_id=user_id).values_list('role', 'department_id').first()
+    if profile is None:
+        return None, None, []
+    team_ids = list(TeamMembership.objects.filter(user_id=user_id).values_list('team_id', flat=True))
+    return (*profile, team_ids)
+
+
+def get_access_scope(user):
+    if not user.is_authenticated:
+        return AccessScope()
+    key = f'{KEY_PREFIX}:{user.pk}:{_version(user.pk)}'
+    data = cache.get(key)
+    if data is None:
+        data = _load(user.pk)
+        cache.set(key, data, settings.ACCESS_SCOPE_CACHE_TIMEOUT)
+    return AccessScope(user.pk, *data)
+
+
+# for async code: the scope comes back with its reference data already loaded, so reading
+# it does not touch the database
+@sync_to_async
+def aget_access_scope(user):
+    scope = get_access_scope(user)
+    scope.reference
+    return scope
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+# called when a user's profile or team memberships change
+def invalidate(user_id):
+    transaction.on_commit(lambda: _bump(user_id))
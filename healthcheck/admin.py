@@ -1,10 +1,21 @@
 # Authors
 # Oliver Bryan, Smaran Holkar, Aaron Madhok
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from .models import (
-    Team, UserProfile, HealthCheckSession, Vote, TeamMembership, Department
+    Team, UserProfile, HealthCheckSession, Vote, TeamMembership, Department, VoteTally, VoteEvent, DeclineAlert
 )
+from .forms import ImportForm
+from .importing import IMPORT_COLUMNS, IMPORT_MODELS, Importer, format_for, text_stream
+from .changelists import KeysetPaginationAdmin, LargeTableAdmin, ReferenceFieldListFilter
+from .search import comment_index_available, match_expression, matching_vote_ids
+
+
+# bad rows listed after an admin import; the rest are only counted
+IMPORT_ERRORS_SHOWN = 200
 
 
 @admin.register(Department)
@@ -18,9 +29,10 @@ class DepartmentAdmin(admin.ModelAdmin):
 class TeamAdmin(admin.ModelAdmin):
 
     list_display = ('name', 'department', 'created_at')
+    list_select_related = ('department',)
     search_fields = ('name', 'department__name')
 
-    list_filter = ('department',)
+    list_filter = (('department', ReferenceFieldListFilter),)
     readonly_fields = ('created_at',)
 
     autocomplete_fields = ['department']
@@ -40,7 +52,8 @@ class HealthCheckSessionAdmin(admin.ModelAdmin):
 @admin.register(TeamMembership)
 class TeamMembershipAdmin(admin.ModelAdmin):
     list_display = ('user', 'team', 'get_department', 'date_joined')
-    list_filter = ('team__department', 'team',)
+    list_select_related = ('user', 'team__department')
+    list_filter = (('team__department', ReferenceFieldListFilter), ('team', ReferenceFieldListFilter))
     search_fields = ('user__username', 'team__name', 'team__department__name')
     autocomplete_fields = ['user', 'team']
     readonly_fields = ('date_joined',)
@@ -55,13 +68,128 @@ class TeamMembershipAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'department')
-    list_filter = ('role', 'department')
+    list_select_related = ('user', 'department')
+    list_filter = ('role', ('department', ReferenceFieldListFilter))
     search_fields = ('user__username', 'department__name')
     autocomplete_fields = ['user', 'department']
 
 @admin.register(Vote)
-class VoteAdmin(admin.ModelAdmin):
+class VoteAdmin(KeysetPaginationAdmin):
    list_display = ('user', 'team', 'session', 'card_type', 'vote', 'progress')
-   list_filter = ('session', 'team__department', 'team', 'card_type', 'vote', 'progress')
+   list_select_related = ('user', 'team', 'session')
+   list_filter = (
+       ('session', ReferenceFieldListFilter),
+       ('department', ReferenceFieldListFilter),
+       ('team', ReferenceFieldListFilter),
+       'card_type', 'vote', 'progress',
+   )
    search_fields = ('user__username', 'team__name', 'session__name', 'comments')
-   readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+   # the department follows the team on save
+   readonly_fields = ('department', 'created_at', 'updated_at')
+   autocomplete_fields = ['user', 'team', 'session']
+
+   # on SQLite comments are searched through the full-text index rather than a LIKE scan of
+   # every vote; the other fields are still matched as usual
+   def get_search_fields(self, request):
+       if comment_index_available():
+           return tuple(field for field in self.search_fields if field != 'comments')
+       return self.search_fields
+
+   def get_search_results(self, request, queryset, search_term):
+       results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+       if comment_index_available() and match_expression(search_term):
+           results |= queryset.filter(id__in=matching_vote_ids(search_term))
+       return results, may_have_duplicates
+
+   def get_urls(self):
+       return [
+           path('import/', self.admin_site.admin_view(self.import_view), name='healthcheck_vote_import'),
+           *super().get_urls(),
+       ]
+
+   def changelist_view(self, request, extra_context=None):
+       extra_context = {**(extra_context or {}), 'import_url': reverse('admin:healthcheck_vote_import')}
+       return super().changelist_view(request, extra_context)
+
+   # imports an uploaded file of departments, teams, sessions, memberships or votes; rows
+   # that cannot be imported are listed on the page
+   def import_view(self, request):
+       allowed_kinds = {
+           kind for kind, model in IMPORT_MODELS.items()
+           if request.user.has_perm(f'{model._meta.app_label}.add_{model._meta.model_name}')
+       }
+       if not allowed_kinds:
+           raise PermissionDenied
+       form = ImportForm(request.POST or None, request.FILES or None)
+       result = None
+       if request.method == 'POST' and form.is_valid():
+           kind = form.cleaned_data['kind']
+           if kind not in allowed_kinds:
+               raise PermissionDenied
+           upload = form.cleaned_data['file']
+           file_format = form.cleaned_data['format'] or format_for(upload.name)
+           try:
+               result = Importer().run(kind, text_stream(upload), file_format)
+           except UnicodeDecodeError:
+               messages.error(request, "The file is not UTF-8 text; rows before the error were imported.")
+           else:
+               level = messages.WARNING if result['errors'] else messages.SUCCESS
+               messages.add_message(
+                   request, level,
+                   f"{kind.title()}: imported {result['created']}, skipped {result['skipped']} existing, "
+                   f"{len(result['errors'])} errors."
+               )
+
+       context = {
+           **self.admin_site.each_context(request),
+           'title': "Import health check data",
+           'opts': self.model._meta,
+           'form': form,
+           'columns': IMPORT_COLUMNS,
+           'errors': result['errors'][:IMPORT_ERRORS_SHOWN] if result else [],
+           'more_errors': max(0, len(result['errors']) - IMPORT_ERRORS_SHOWN) if result else 0,
+       }
+       return TemplateResponse(request, 'admin/healthcheck/import.html', context)
+
+@admin.register(VoteTally)
+class VoteTallyAdmin(LargeTableAdmin):
+    list_display = ('team', 'session', 'card_type', 'good_count', 'neutral_count', 'needs_improvement_count', 'total_votes')
+    list_select_related = ('team', 'session')
+    list_filter = (('session', ReferenceFieldListFilter), ('team__department', ReferenceFieldListFilter), 'card_type')
+
+    # tallies are derived from votes; use the rebuild_vote_tallies command to correct them
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(VoteEvent)
+class VoteEventAdmin(KeysetPaginationAdmin):
+    list_display = ('user', 'team', 'session', 'card_type', 'vote', 'progress', 'deleted', 'created_at')
+    list_select_related = ('user', 'team', 'session')
+    list_filter = (('session', ReferenceFieldListFilter), 'card_type', 'deleted')
+    date_hierarchy = 'created_at'
+
+    # the event log is append-only; corrections are made by submitting new votes
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(DeclineAlert)
+class DeclineAlertAdmin(LargeTableAdmin):
+    list_display = ('team', 'session', 'card_type', 'previous_good_share', 'good_share', 'total_votes', 'created_at')
+    list_select_related = ('team', 'session')
+    list_filter = (('session', ReferenceFieldListFilter), ('team__department', ReferenceFieldListFilter), 'card_type')
+
+    # alerts are derived from tallies; use the refresh_decline_alerts command to update them
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
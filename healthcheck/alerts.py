@@ -0,0 +1,129 @@
+# session-over-session decline alerts
+#
+# one query pairs every team's tally for a card with its tally in the session before,
+# through a LAG window ordered by session start date, and a DeclineAlert is kept for each
+# pair whose share of good votes fell by DECLINE_ALERT_MIN_DROP points or more. The job
+# reads the vote event log from its own consumer offset, so a run only revisits the sessions
+# that received votes since the last one, and the sessions right after them.
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+from django.utils import timezone
+
+from .events import VOTE_CONSUMER
+from .models import ConsumerOffset, DeclineAlert, HealthCheckSession, VoteEvent, VoteTally
+
+
+DECLINE_ALERT_CONSUMER = 'decline-alerts'
+
+ALERT_FIELDS = [
+    'previous_session', 'previous_good_share', 'good_share', 'previous_needs_improvement_share',
+    'needs_improvement_share', 'previous_total_votes', 'total_votes', 'updated_at',
+]
+
+
+# brings the alerts up to date with the votes; `full` recomputes every session, e.g. after
+# a session's dates changed or votes were deleted outside the event log. Returns
+# (sessions recomputed, alerts raised in them)
+def refresh_decline_alerts(full=False):
+    with transaction.atomic():
+        # as in the vote consumer, touching the offset row first keeps two runs apart
+        if not ConsumerOffset.objects.filter(name=DECLINE_ALERT_CONSUMER).update(updated_at=timezone.now()):
+            ConsumerOffset.objects.get_or_create(name=DECLINE_ALERT_CONSUMER)
+        offset = ConsumerOffset.objects.get(name=DECLINE_ALERT_CONSUMER)
+        # events only reach the tallies once the vote consumer has folded them in
+        upto = ConsumerOffset.objects.filter(name=VOTE_CONSUMER).values_list('last_event_id', flat=True).first() or 0
+
+        session_ids = list(HealthCheckSession.objects.order_by('start_date', 'id').values_list('id', flat=True))
+        if full:
+            changed = set(session_ids)
+        else:
+            changed = set(VoteEvent.objects.filter(
+                id__gt=offset.last_event_id, id__lte=upto
+            ).values_list('session_id', flat=True).distinct())
+
+        positions = {session_id: position for position, session_id in enumerate(session_ids)}
+        # a session's alerts compare it with the one before, so its votes count for the next too
+        affected = {
+            session_id
+            for changed_id in changed if changed_id in positions
+            for session_id in session_ids[positions[changed_id]:positions[changed_id] + 2]
+        }
+        alerts = find_declines(affected, session_ids) if affected else []
+
+        DeclineAlert.objects.bulk_create(
+            alerts,
+            update_conflicts=True,
+            unique_fields=['team', 'session', 'card_type'],
+            update_fields=ALERT_FIELDS,
+        )
+        raised = {(alert.team_id, alert.session_id, alert.card_type) for alert in alerts}
+        DeclineAlert.objects.filter(id__in=[
+            alert_id
+            for alert_id, *key in DeclineAlert.objects.filter(
+                session_id__in=affected
+            ).values_list('id', 'team_id', 'session_id', 'card_type')
+            if tuple(key) not in raised
+        ]).delete()
+
+        offset.last_event_id = max(offset.last_event_id, upto)
+        offset.save(update_fields=['last_event_id', 'updated_at'])
+    return len(affected), len(alerts)
+
+
+# unsaved alerts for some sessions, given every session id ordered by start date, from one
+# windowed read of their tallies and those of the sessions before them
+def find_declines(session_ids, ordered_session_ids):
+    positions = {session_id: position for position, session_id in enumerate(ordered_session_ids)}
+    previous = {
+        session_id: ordered_session_ids[positions[session_id] - 1]
+        for session_id in session_ids if positions[session_id]
+    }
+    if not previous:
+        return []
+
+    window = {
+        'partition_by': [F('team_id'), F('card_type')],
+        'order_by': [F('session__start_date').asc(), F('session_id').asc()],
+    }
+    rows = VoteTally.objects.filter(
+        session_id__in=set(previous) | set(previous.values()),
+        total_votes__gte=settings.DECLINE_ALERT_MIN_VOTES,
+    ).annotate(
+        previous_session_id=Window(Lag('session_id'), **window),
+        previous_good_count=Window(Lag('good_count'), **window),
+        previous_needs_improvement_count=Window(Lag('needs_improvement_count'), **window),
+        previous_total_votes=Window(Lag('total_votes'), **window),
+    ).values_list(
+        'team_id', 'session_id', 'card_type', 'good_count', 'needs_improvement_count', 'total_votes',
+        'previous_session_id', 'previous_good_count', 'previous_needs_improvement_count', 'previous_total_votes',
+    ).order_by()
+
+    alerts = []
+    for (team_id, session_id, card_type, good, needs_improvement, total,
+         previous_session_id, previous_good, previous_needs_improvement, previous_total) in rows:
+        # LAG finds the team's last tally, which may be older than the session before
+        if previous_session_id is None or previous.get(session_id) != previous_session_id:
+            continue
+        good_share, previous_good_share = _share(good, total), _share(previous_good, previous_total)
+        if previous_good_share - good_share < settings.DECLINE_ALERT_MIN_DROP:
+            continue
+        alerts.append(DeclineAlert(
+            team_id=team_id,
+            session_id=session_id,
+            previous_session_id=previous_session_id,
+            card_type=card_type,
+            previous_good_share=previous_good_share,
+            good_share=good_share,
+            previous_needs_improvement_share=_share(previous_needs_improvement, previous_total),
+            needs_improvement_share=_share(needs_improvement, total),
+            previous_total_votes=previous_total,
+            total_votes=total,
+        ))
+    return alerts
+
+
+def _share(count, total):
+    return round(count / total * 100, 1)
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class HealthcheckConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "healthcheck"
\ No newline at end of file
+    name = "healthcheck"
+
+    def ready(self):
+        from . import db, signals  # noqa: F401
@@ -0,0 +1,132 @@
+# admin changelist pieces for the large tables (votes, vote events, tallies)
+#
+# the stock changelist counts every matching row twice per page, pages with OFFSET and runs
+# a query per related-field filter to list its choices. Here counts stop at a cap (past it an
+# unfiltered table is estimated), the newest-first changelists page by id instead of offset,
+# and session, team and department filter choices come from the reference data cache.
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .models import Department, HealthCheckSession, Team
+from .reference import get_reference_data
+
+
+# rows counted exactly before a count is estimated
+EXACT_COUNT_LIMIT = 10000
+
+# keyset cursors: show rows older (lower id) than AFTER_VAR, or newer than BEFORE_VAR
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+# roughly how many rows a table has, without counting them: the planner's statistics on
+# PostgreSQL, the highest id elsewhere (votes and events are rarely deleted)
+def estimated_row_count(model):
+    connection = connections[model.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    return model.objects.aggregate(highest=Max('pk'))['highest'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    # `estimated` when the count is a table estimate, `capped` when it only says there are
+    # more than EXACT_COUNT_LIMIT matches
+    estimated = False
+    capped = False
+
+    @cached_property
+    def count(self):
+        counted = self.object_list[:EXACT_COUNT_LIMIT + 1].count()
+        if counted <= EXACT_COUNT_LIMIT:
+            return counted
+        if self.object_list.query.where:
+            self.capped = True
+            return EXACT_COUNT_LIMIT
+        self.estimated = True
+        return max(estimated_row_count(self.object_list.model), counted)
+
+
+# newest first by id, each page read as "id below the last one shown"; sorting by a column
+# falls back to the usual numbered pages
+class KeysetChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    # links that change filters, search or sorting start again from the newest rows
+    def get_query_string(self, new_params=None, remove=None):
+        return super().get_query_string(new_params, [*(remove or []), AFTER_VAR, BEFORE_VAR])
+
+    def _cursor(self, name):
+        try:
+            return int(self.params[name])
+        except (KeyError, ValueError):
+            return None
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.keyset = ORDER_VAR not in self.params and not (self.show_all and self.can_show_all)
+        if not self.keyset:
+            return
+
+        after = self._cursor(AFTER_VAR)
+        before = self._cursor(BEFORE_VAR)
+        ids = self.queryset.order_by().values_list('pk', flat=True)
+        if before is not None:
+            ids = list(ids.filter(pk__gt=before).order_by('pk')[:self.list_per_page + 1])
+            has_newer = len(ids) > self.list_per_page
+            ids = ids[:self.list_per_page]
+            has_older = True
+        else:
+            if after is not None:
+                ids = ids.filter(pk__lt=after)
+            ids = list(ids.order_by('-pk')[:self.list_per_page + 1])
+            has_older = len(ids) > self.list_per_page
+            ids = ids[:self.list_per_page]
+            has_newer = after is not None
+        self.result_list = self.queryset.filter(pk__in=ids).order_by('-pk')
+        self.multi_page = has_newer or has_older
+        self.newest_url = self.get_query_string() if has_newer else None
+        self.newer_url = self.get_query_string({BEFORE_VAR: max(ids)}) if has_newer and ids else None
+        self.older_url = self.get_query_string({AFTER_VAR: min(ids)}) if has_older and ids else None
+
+
+# the settings every large-table admin shares: bounded counts, no second unfiltered count
+# and no per-choice facet counts
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+
+class KeysetPaginationAdmin(LargeTableAdmin):
+    change_list_template = 'admin/healthcheck/keyset_change_list.html'
+    ordering = ('-id',)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+# a related-field filter listing its departments, teams or sessions from the reference data
+class ReferenceFieldListFilter(admin.RelatedFieldListFilter):
+    def field_choices(self, field, request, model_admin):
+        reference = get_reference_data()
+        objects = {
+            Department: reference.departments,
+            Team: reference.teams,
+            HealthCheckSession: reference.sessions,
+        }.get(field.related_model)
+        if objects is None:
+            return super().field_choices(field, request, model_admin)
+        return [(obj.pk, str(obj)) for obj in objects]
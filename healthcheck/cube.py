@@ -0,0 +1,230 @@
+# process-local count cube over every vote, so team, department and org-wide views can be
+# sliced from memory instead of running another GROUP BY
+#
+# counts[session, team, card_type, vote, progress] holds how many votes fall in each cell;
+# session_index and team_index map database ids to positions along the first two axes
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count
+
+from .models import HealthCheckSession, Team, Vote
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+CARD_CODES = [code for code, _ in Vote.CARD_TYPES]
+VOTE_CODES = [code for code, _ in Vote.VOTE_CHOICES]
+PROGRESS_CODES = [code for code, _ in Vote.PROGRESS_CHOICES]
+
+CARD_POSITIONS = {code: position for position, code in enumerate(CARD_CODES)}
+VOTE_POSITIONS = {code: position for position, code in enumerate(VOTE_CODES)}
+PROGRESS_POSITIONS = {code: position for position, code in enumerate(PROGRESS_CODES)}
+
+
+class VoteCube:
+
+    def __init__(self, session_ids=(), team_departments=None):
+        if np is None:
+            raise ImproperlyConfigured("The vote cube needs NumPy. Install it with `pip install numpy`.")
+        team_departments = team_departments or {}
+        self.session_index = {session_id: position for position, session_id in enumerate(session_ids)}
+        self.team_index = {team_id: position for position, team_id in enumerate(team_departments)}
+        # department id of each team position, 0 when the team has no department
+        self.team_department = np.array([department_id or 0 for department_id in team_departments.values()], dtype=np.int64)
+        self.counts = np.zeros(
+            (len(self.session_index), len(self.team_index), len(CARD_CODES), len(VOTE_CODES), len(PROGRESS_CODES)),
+            dtype=np.int64
+        )
+        self.loaded_at = time.monotonic()
+        self.lock = threading.RLock()
+
+    # builds a cube from the database: one grouped read of the votes plus the team and session ids
+    @classmethod
+    def load(cls):
+        cube = cls(
+            session_ids=list(HealthCheckSession.objects.order_by('id').values_list('id', flat=True)),
+            team_departments=dict(Team.objects.order_by('id').values_list('id', 'department_id')),
+        )
+        cube._add_rows(Vote.objects.all())
+        return cube
+
+    def _add_rows(self, votes):
+        rows = votes.values('session_id', 'team_id', 'card_type', 'vote', 'progress').annotate(
+            n=Count('id')
+        ).values_list('session_id', 'team_id', 'card_type', 'vote', 'progress', 'n').order_by()
+        rows = [row for row in rows if _known(*row[2:5])]
+        if not rows:
+            return
+        for session_id, team_id, _, _, _, _ in rows:
+            self._ensure(session_id, team_id)
+        np.add.at(self.counts, (
+            np.array([self.session_index[row[0]] for row in rows]),
+            np.array([self.team_index[row[1]] for row in rows]),
+            np.array([CARD_POSITIONS[row[2]] for row in rows]),
+            np.array([VOTE_POSITIONS[row[3]] for row in rows]),
+            np.array([PROGRESS_POSITIONS[row[4]] for row in rows]),
+        ), np.array([row[5] for row in rows], dtype=np.int64))
+
+    # adds positions for sessions or teams created after the cube was loaded
+    def _ensure(self, session_id=None, team_id=None, department_id=None):
+        if session_id is not None and session_id not in self.session_index:
+            self.session_index[session_id] = len(self.session_index)
+            self.counts = np.concatenate([self.counts, np.zeros((1,) + self.counts.shape[1:], dtype=np.int64)], axis=0)
+        if team_id is not None and team_id not in self.team_index:
+            if department_id is None:
+                department_id = Team.objects.filter(pk=team_id).values_list('department_id', flat=True).first()
+            self.team_index[team_id] = len(self.team_index)
+            self.team_department = np.append(self.team_department, department_id or 0)
+            shape = list(self.counts.shape)
+            shape[1] = 1
+            self.counts = np.concatenate([self.counts, np.zeros(shape, dtype=np.int64)], axis=1)
+
+    # incremental updates, fed with the (session, team, card, vote, progress) keys used by tallies
+
+    def apply_vote_change(self, old_key, new_key):
+        with self.lock:
+            for key, step in ((old_key, -1), (new_key, 1)):
+                if key is None:
+                    continue
+                session_id, team_id, card_type, vote_value, progress_value = key
+                if not _known(card_type, vote_value, progress_value):
+                    continue
+                self._ensure(session_id, team_id)
+                self.counts[
+                    self.session_index[session_id],
+                    self.team_index[team_id],
+                    CARD_POSITIONS[card_type],
+                    VOTE_POSITIONS[vote_value],
+                    PROGRESS_POSITIONS[progress_value],
+                ] += step
+
+    # re-reads the cells of some (team_id, session_id) pairs, e.g. after a bulk write
+    def refresh_pairs(self, pairs):
+        with self.lock:
+            for team_id, session_id in set(pairs):
+                self._ensure(session_id, team_id)
+                self.counts[self.session_index[session_id], self.team_index[team_id]] = 0
+                self._add_rows(Vote.objects.filter(team_id=team_id, session_id=session_id))
+
+    def set_team_department(self, team_id, department_id):
+        with self.lock:
+            self._ensure(team_id=team_id, department_id=department_id)
+            self.team_department[self.team_index[team_id]] = department_id or 0
+
+    # slices; each returns a new (card, vote, progress) array unless noted. They hold the
+    # lock, since updates change counts in place and _ensure replaces the arrays
+
+    def _session_counts(self, session_id):
+        if session_id not in self.session_index:
+            return np.zeros((len(self.team_index),) + self.counts.shape[2:], dtype=np.int64)
+        return self.counts[self.session_index[session_id]]
+
+    def team_counts(self, team_id, session_id):
+        with self.lock:
+            if team_id not in self.team_index:
+                return np.zeros(self.counts.shape[2:], dtype=np.int64)
+            return self._session_counts(session_id)[self.team_index[team_id]].copy()
+
+    def department_counts(self, department_id, session_id):
+        with self.lock:
+            return self._session_counts(session_id)[self.team_department == department_id].sum(axis=0)
+
+    def org_counts(self, session_id):
+        with self.lock:
+            return self._session_counts(session_id).sum(axis=0)
+
+    # (team, card, vote) counts for the given teams in their order; teams the cube has not
+    # seen yet count as no votes
+    def team_card_vote_counts(self, team_ids, session_id):
+        with self.lock:
+            session_counts = self._session_counts(session_id).sum(axis=3)
+            known = [(row, self.team_index[team_id]) for row, team_id in enumerate(team_ids) if team_id in self.team_index]
+        counts = np.zeros((len(team_ids),) + session_counts.shape[1:], dtype=np.int64)
+        if known:
+            rows, positions = zip(*known)
+            counts[list(rows)] = session_counts[list(positions)]
+        return counts
+
+    # {department_id: array of good/neutral/needs_improvement totals} for one session
+    def department_vote_totals(self, session_id):
+        with self.lock:
+            per_team = self._session_counts(session_id).sum(axis=(1, 3))
+            department_ids, positions = np.unique(self.team_department, return_inverse=True)
+        totals = np.zeros((len(department_ids), len(VOTE_CODES)), dtype=np.int64)
+        np.add.at(totals, positions, per_team)
+        return {
+            int(department_id): totals[position]
+            for position, department_id in enumerate(department_ids)
+            if department_id
+        }
+
+    # {department_id: (card, vote) array} for one session, departments with votes only
+    def department_card_vote_counts(self, session_id):
+        with self.lock:
+            per_team = self._session_counts(session_id).sum(axis=3)
+            department_ids, positions = np.unique(self.team_department, return_inverse=True)
+        counts = np.zeros((len(department_ids),) + per_team.shape[1:], dtype=np.int64)
+        np.add.at(counts, positions, per_team)
+        return {
+            int(department_id): counts[position]
+            for position, department_id in enumerate(department_ids)
+            if department_id and counts[position].any()
+        }
+
+    # the per-card result dicts the dashboards expect, skipping cards with no votes
+    @staticmethod
+    def results_dict(cells):
+        by_vote = cells.sum(axis=2)
+        by_progress = cells.sum(axis=1)
+        totals = by_vote.sum(axis=1)
+
+        results = {}
+        for card_position, code in enumerate(CARD_CODES):
+            if not totals[card_position]:
+                continue
+            result = {'card_type': code}
+            for vote_position, vote_value in enumerate(VOTE_CODES):
+                result[f'{vote_value}_count'] = int(by_vote[card_position, vote_position])
+            for progress_position, progress_value in enumerate(PROGRESS_CODES):
+                result[f'{progress_value}_count'] = int(by_progress[card_position, progress_position])
+            result['total_votes'] = int(totals[card_position])
+            results[code] = result
+        return results
+
+
+# votes whose card, vote or progress is not among the model's choices (e.g. rows written
+# before the choices last changed) have no cell, so the cube leaves them out
+def _known(card_type, vote_value, progress_value):
+    return card_type in CARD_POSITIONS and vote_value in VOTE_POSITIONS and progress_value in PROGRESS_POSITIONS
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+# the process-wide cube, loaded on first use and reloaded once older than VOTE_CUBE_MAX_AGE
+def get_cube():
+    global _cube
+    with _cube_lock:
+        max_age = settings.VOTE_CUBE_MAX_AGE
+        if _cube is None or (max_age is not None and time.monotonic() - _cube.loaded_at > max_age):
+            _cube = VoteCube.load()
+        return _cube
+
+
+# the cube if this process has loaded one; used to keep it current without forcing a load
+def loaded_cube():
+    return _cube
+
+
+def reset_cube():
+    global _cube
+    with _cube_lock:
+        _cube = None
@@ -0,0 +1,267 @@
+# caches dashboard summaries in Django's cache, keyed by scope and session
+#
+# every key embeds version counters for the things its result depends on; changing a
+# vote, team or session bumps the matching counters, so stale entries are never read
+# again and simply expire
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .summaries import (
+    team_summary, department_summary, department_heatmap, session_card_counts, trend_summary, org_card_counts,
+    org_overview,
+)
+
+
+KEY_PREFIX = 'hc:dash'
+
+_stats = defaultdict(int)
+_stats_lock = threading.Lock()
+
+
+def _record(kind, outcome, count=1):
+    with _stats_lock:
+        _stats[f'{kind}_{outcome}'] += count
+
+
+# hit/miss counts for this process, e.g. {'team_hits': 10, 'team_misses': 2, ...}
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _version_key(*parts):
+    return ':'.join([KEY_PREFIX, 'ver'] + [str(part) for part in parts])
+
+
+def _versions(*version_keys):
+    return _version_strings([version_keys])[0]
+
+
+# resolves several groups of version keys with one cache round trip
+def _version_strings(groups):
+    all_keys = list(dict.fromkeys(key for group in groups for key in group))
+    found = cache.get_many(all_keys)
+    missing = [key for key in all_keys if key not in found]
+    if missing:
+        # start evicted or new counters from the clock so an old version is never reused
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        found.update(cache.get_many(missing))
+    return ['.'.join(str(found.get(key, 0)) for key in group) for group in groups]
+
+
+def _bumped_key(version_key):
+    return f'{version_key}:at'
+
+
+def _bump(*version_keys):
+    for key in version_keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+    # when each counter last moved, for the summary api's Last-Modified
+    now = time.time()
+    cache.set_many({_bumped_key(key): now for key in version_keys}, timeout=None)
+
+
+# results sliced from the vote cube follow this process's cube, which may not have seen
+# other processes' votes yet; stored under the current versions they would be served to
+# every process, so they are computed each time instead (the slices are cheap)
+def _cacheable():
+    return settings.DASHBOARD_SUMMARY_SOURCE != 'cube'
+
+
+def _get_or_compute(kind, key, compute):
+    if not _cacheable():
+        return compute()
+    result = cache.get(key)
+    if result is not None:
+        _record(kind, 'hits')
+        return result
+    _record(kind, 'misses')
+    result = compute()
+    cache.set(key, result, settings.DASHBOARD_CACHE_TIMEOUT)
+    return result
+
+
+def cached_team_summary(team, session, user=None):
+    if user is None:
+        kind = 'team'
+        versions = _versions(
+            _version_key('session', session.id),
+            _version_key('team', team.id),
+            _version_key('team-session', team.id, session.id),
+        )
+        key = f'{KEY_PREFIX}:team:{team.id}:{session.id}:{versions}'
+    else:
+        kind = 'my_votes'
+        versions = _versions(
+            _version_key('session', session.id),
+            _version_key('team', team.id),
+            _version_key('user-team-session', user.id, team.id, session.id),
+        )
+        key = f'{KEY_PREFIX}:team:{team.id}:{session.id}:user:{user.id}:{versions}'
+    return _get_or_compute(kind, key, lambda: team_summary(team, session, user=user))
+
+
+def cached_department_summary(department, session):
+    # other departments' totals are part of the result, so any vote in the session counts
+    versions = _versions(
+        _version_key('session', session.id),
+        _version_key('teams'),
+        _version_key('dept-session', session.id),
+    )
+    key = f'{KEY_PREFIX}:dept:{department.id}:{session.id}:{versions}'
+    return _get_or_compute('department', key, lambda: department_summary(department, session))
+
+
+# ETag and Last-Modified for the summary api, from the version counters of the cached
+# summaries and when they last moved, so a conditional request costs two cache round trips
+# and no query. A per-process cache never sees other processes' bumps (a worker's, an
+# import's), so without a shared cache there are none and every request gets the full body
+def team_summary_validators(team, session):
+    return _summary_validators(f'team-{team.id}-{session.id}', [
+        _version_key('session', session.id),
+        _version_key('team', team.id),
+        _version_key('team-session', team.id, session.id),
+    ])
+
+
+def department_summary_validators(department, session):
+    return _summary_validators(f'dept-{department.id}-{session.id}', [
+        _version_key('session', session.id),
+        _version_key('teams'),
+        _version_key('dept-session', session.id),
+    ])
+
+
+def _summary_validators(scope, version_keys):
+    if not settings.SHARED_CACHE:
+        return None, None
+    versions = _versions(*version_keys)
+    bumped_keys = [_bumped_key(key) for key in version_keys]
+    bumped = cache.get_many(bumped_keys)
+    for key in bumped_keys:
+        if key not in bumped:
+            # never bumped, or evicted: count from now, which only ever makes it newer
+            cache.add(key, time.time(), timeout=None)
+            bumped[key] = cache.get(key, time.time())
+    last_modified = datetime.fromtimestamp(max(bumped.values()), tz=dt_timezone.utc)
+    return f'"{scope}-{versions}"', last_modified
+
+
+# the heatmap has a row per team, so any team change (a rename, move or new team) counts
+def cached_department_heatmap(department, session, teams):
+    versions = _versions(
+        _version_key('session', session.id),
+        _version_key('teams'),
+        _version_key('dept-session', session.id),
+    )
+    key = f'{KEY_PREFIX}:heatmap:{department.id}:{session.id}:{versions}'
+    return _get_or_compute('heatmap', key, lambda: department_heatmap(department, session, teams))
+
+
+# trend across sessions for a team or department; per-session results of closed sessions
+# are cached, open sessions and cache misses are computed together in one grouped query
+def cached_trend(sessions, team=None, department=None):
+    today = timezone.localdate()
+    closed = [session for session in sessions if session.end_date < today]
+
+    if team is not None:
+        scope = f'team:{team.id}'
+        groups = [(
+            _version_key('session', session.id),
+            _version_key('team', team.id),
+            _version_key('team-session', team.id, session.id),
+        ) for session in closed]
+    else:
+        scope = f'dept:{department.id}'
+        groups = [(
+            _version_key('session', session.id),
+            _version_key('teams'),
+            _version_key('dept-session', session.id),
+        ) for session in closed]
+
+    keys = {
+        session.id: f'{KEY_PREFIX}:trend:{scope}:{session.id}:{versions}'
+        for session, versions in zip(closed, _version_strings(groups))
+    }
+    counts_by_session = {}
+    found = cache.get_many(list(keys.values()))
+    for session_id, key in keys.items():
+        if key in found:
+            counts_by_session[session_id] = found[key]
+    _record('trend', 'hits', len(counts_by_session))
+    _record('trend', 'misses', len(sessions) - len(counts_by_session))
+
+    missing = [session.id for session in sessions if session.id not in counts_by_session]
+    computed = session_card_counts(missing, team=team, department=department)
+    counts_by_session.update(computed)
+    cache.set_many(
+        {keys[session_id]: counts for session_id, counts in computed.items() if session_id in keys},
+        settings.TREND_CACHE_TIMEOUT
+    )
+    return trend_summary(sessions, counts_by_session)
+
+
+# organisation overview across sessions; each session's department x card counts are cached
+# on their own, so moving the window only computes the sessions not seen yet, all of them
+# in one grouped query
+def cached_org_overview(sessions, departments):
+    if not _cacheable():
+        return org_overview(sessions, departments, org_card_counts([session.id for session in sessions]))
+    groups = [(
+        _version_key('session', session.id),
+        _version_key('teams'),
+        _version_key('dept-session', session.id),
+    ) for session in sessions]
+    keys = {
+        session.id: f'{KEY_PREFIX}:org:{session.id}:{versions}'
+        for session, versions in zip(sessions, _version_strings(groups))
+    }
+    found = cache.get_many(list(keys.values()))
+    counts_by_session = {session_id: found[key] for session_id, key in keys.items() if key in found}
+    _record('org', 'hits', len(counts_by_session))
+    _record('org', 'misses', len(sessions) - len(counts_by_session))
+
+    computed = org_card_counts([session.id for session in sessions if session.id not in counts_by_session])
+    counts_by_session.update(computed)
+    # closed sessions keep the trend timeout, since votes there are rare and still invalidate
+    today = timezone.localdate()
+    for closed in (True, False):
+        cache.set_many(
+            {keys[session.id]: computed[session.id] for session in sessions
+             if session.id in computed and (session.end_date < today) == closed},
+            settings.TREND_CACHE_TIMEOUT if closed else settings.DASHBOARD_CACHE_TIMEOUT
+        )
+    return org_overview(sessions, departments, counts_by_session)
+
+
+# invalidation, applied once the surrounding transaction commits
+
+def invalidate_votes(user_id, pairs):
+    version_keys = []
+    for team_id, session_id in set(pairs):
+        version_keys += [
+            _version_key('team-session', team_id, session_id),
+            _version_key('user-team-session', user_id, team_id, session_id),
+            _version_key('dept-session', session_id),
+        ]
+    transaction.on_commit(lambda: _bump(*dict.fromkeys(version_keys)))
+
+
+def invalidate_team(team_id):
+    transaction.on_commit(lambda: _bump(_version_key('team', team_id), _version_key('teams')))
+
+
+def invalidate_session(session_id):
+    transaction.on_commit(lambda: _bump(_version_key('session', session_id)))
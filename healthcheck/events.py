@@ -0,0 +1,199 @@
+# the append-only vote event log
+#
+# submissions are recorded as plain INSERTs into VoteEvent; an incremental consumer then
+# folds new events, in id order, into the current votes, the tallies and the dashboard
+# caches, and stores the last event it processed in ConsumerOffset so each event is applied
+# exactly once. Votes saved or deleted directly (the admin, Vote.save()/delete()) are logged
+# too. Past tallies of a session are rebuilt from its events up to a point in time.
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import dashboard_cache
+from .cube import loaded_cube
+from .models import ConsumerOffset, Team, Vote, VoteEvent
+from .tallies import refresh_tallies
+
+
+VOTE_CONSUMER = 'votes'
+
+
+# records a user's vote entries (as cleaned by votes.clean_vote_entries) in one INSERT; with
+# the inline consumer they are folded into the votes once the transaction commits
+def record_vote_events(user, entries):
+    now = timezone.now()
+    events = [
+        VoteEvent(
+            user=user,
+            team_id=entry['team_id'],
+            session_id=entry['session_id'],
+            card_type=entry['card_type'],
+            vote=entry['vote'],
+            progress=entry['progress'],
+            comments=entry.get('comments'),
+            created_at=now,
+        )
+        for entry in entries
+    ]
+    return append_vote_events(events)
+
+
+# appends unsaved VoteEvent objects to the log in one INSERT, for submissions and imports
+def append_vote_events(events):
+    with transaction.atomic():
+        VoteEvent.objects.bulk_create(events)
+        if settings.VOTE_EVENT_CONSUMER == 'inline':
+            # a failure leaves the events for the next submission or consume_vote_events
+            transaction.on_commit(consume_vote_events, robust=True)
+    return events
+
+
+# logs a vote that was saved or deleted without going through the log, so past tallies and
+# decline alerts see the change; consuming the event leaves the vote as it already is
+def record_vote_change(vote, deleted=False):
+    return append_vote_events([VoteEvent(
+        user_id=vote.user_id,
+        team_id=vote.team_id,
+        session_id=vote.session_id,
+        card_type=vote.card_type,
+        vote=vote.vote,
+        progress=vote.progress,
+        comments=vote.comments,
+        deleted=deleted,
+    )])
+
+
+# processes every event after the stored offset, batch by batch; returns how many
+def consume_vote_events(batch_size=1000):
+    consumed = 0
+    while True:
+        count = _consume_batch(batch_size)
+        consumed += count
+        if count < batch_size:
+            return consumed
+
+
+def _consume_batch(batch_size):
+    with transaction.atomic():
+        # touching the offset row first takes the write lock (SQLite) or the row lock
+        # (PostgreSQL), so two consumers never fold the same events
+        if not ConsumerOffset.objects.filter(name=VOTE_CONSUMER).update(updated_at=timezone.now()):
+            ConsumerOffset.objects.get_or_create(name=VOTE_CONSUMER)
+        offset = ConsumerOffset.objects.get(name=VOTE_CONSUMER)
+        events = list(VoteEvent.objects.filter(id__gt=offset.last_event_id).order_by('id')[:batch_size])
+        if not events:
+            return 0
+
+        # the newest event for a card wins, by created_at and then id: imported events keep
+        # their original time, so they can be older than events that are already applied
+        latest = {}
+        for event in sorted(events, key=lambda event: (event.created_at, event.id)):
+            latest[_event_key(event)] = event
+        applied = _applied_times(latest, offset.last_event_id)
+        latest = {
+            key: event for key, event in latest.items()
+            if key not in applied or applied[key] <= event.created_at
+        }
+        saved = [event for event in latest.values() if not event.deleted]
+        removed = [event for event in latest.values() if event.deleted]
+
+        team_departments = dict(Team.objects.filter(
+            id__in={event.team_id for event in saved}
+        ).values_list('id', 'department_id'))
+        Vote.objects.bulk_create(
+            [
+                Vote(
+                    user_id=event.user_id,
+                    team_id=event.team_id,
+                    session_id=event.session_id,
+                    department_id=team_departments.get(event.team_id),
+                    card_type=event.card_type,
+                    vote=event.vote,
+                    progress=event.progress,
+                    comments=event.comments,
+                )
+                for event in saved
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'team', 'session', 'card_type'],
+            update_fields=['vote', 'progress', 'comments', 'department', 'updated_at'],
+        )
+        # a deletion is logged once the vote is gone, but an older event consumed since may
+        # have brought it back
+        for event in removed:
+            for vote in Vote.objects.filter(
+                user_id=event.user_id, team_id=event.team_id,
+                session_id=event.session_id, card_type=event.card_type,
+            ):
+                vote._from_event_log = True
+                vote.delete()
+
+        pairs_by_user = {}
+        for user_id, team_id, session_id, _ in latest:
+            pairs_by_user.setdefault(user_id, set()).add((team_id, session_id))
+        pairs = set().union(*pairs_by_user.values())
+        refresh_tallies(pairs)
+        for user_id, user_pairs in pairs_by_user.items():
+            dashboard_cache.invalidate_votes(user_id, user_pairs)
+        cube = loaded_cube()
+        if cube is not None:
+            transaction.on_commit(lambda: cube.refresh_pairs(pairs))
+
+        offset.last_event_id = events[-1].id
+        offset.save(update_fields=['last_event_id', 'updated_at'])
+    return len(events)
+
+
+def _event_key(event):
+    return (event.user_id, event.team_id, event.session_id, event.card_type)
+
+
+# the time of the newest consumed event for each of `keys` that has one
+def _applied_times(keys, last_event_id):
+    rows = VoteEvent.objects.filter(
+        id__lte=last_event_id,
+        user_id__in={key[0] for key in keys},
+        session_id__in={key[2] for key in keys},
+    ).values('user_id', 'team_id', 'session_id', 'card_type').annotate(latest=Max('created_at'))
+    applied = {}
+    for row in rows:
+        key = (row['user_id'], row['team_id'], row['session_id'], row['card_type'])
+        if key in keys:
+            applied[key] = row['latest']
+    return applied
+
+
+# events not yet folded into the votes
+def pending_vote_events():
+    offset = ConsumerOffset.objects.filter(name=VOTE_CONSUMER).values_list('last_event_id', flat=True).first()
+    return VoteEvent.objects.filter(id__gt=offset or 0).count()
+
+
+# per-card results of a session as they stood at `at`, in the shape of tallies.card_results,
+# optionally limited to some teams; only the session's events up to `at` are read, through
+# the (session, created_at) index
+def card_results_at(session, at, team_ids=None):
+    events = VoteEvent.objects.filter(session=session, created_at__lte=at)
+    if team_ids is not None:
+        events = events.filter(team_id__in=team_ids)
+    # each voter's newest event for a card, by created_at and then id as in the consumer;
+    # imported events keep their original time, so ids alone do not order them
+    latest_ids = events.annotate(position=Window(
+        RowNumber(),
+        partition_by=[F('user_id'), F('team_id'), F('card_type')],
+        order_by=[F('created_at').desc(), F('id').desc()],
+    )).filter(position=1).values('id')
+
+    rows = VoteEvent.objects.filter(id__in=latest_ids, deleted=False).values('card_type').annotate(
+        good_count=Count(Case(When(vote='good', then=1))),
+        neutral_count=Count(Case(When(vote='neutral', then=1))),
+        needs_improvement_count=Count(Case(When(vote='needs_improvement', then=1))),
+        improving_count=Count(Case(When(progress='improving', then=1))),
+        stable_count=Count(Case(When(progress='stable', then=1))),
+        declining_count=Count(Case(When(progress='declining', then=1))),
+        total_votes=Count('id'),
+    ).order_by('card_type')
+    return {row['card_type']: row for row in rows}
@@ -6,6 +6,8 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, PasswordChangeForm
 from django.contrib.auth.models import User
 from .models import UserProfile, Team, TeamMembership, Department
+from .reference import get_reference_data
+from .importing import IMPORT_COLUMNS, IMPORT_FORMATS
 
 class CustomUserCreationForm(UserCreationForm):
     first_name = forms.CharField(required=True, max_length=30)
@@ -39,6 +41,15 @@ class CustomUserCreationForm(UserCreationForm):
         self.fields['department'].widget.attrs.update({'class': 'input-field'})
         self.fields['department'].label = "Primary Department"
 
+        # options come from the reference data cache; the querysets only validate the choice
+        reference = get_reference_data()
+        self.fields['team'].choices = [('', self.fields['team'].empty_label)] + [
+            (team.id, str(team)) for team in reference.teams
+        ]
+        self.fields['department'].choices = [('', self.fields['department'].empty_label)] + [
+            (department.id, str(department)) for department in reference.departments
+        ]
+
     def clean(self):
         cleaned_data = super().clean()
         role = cleaned_data.get("role")
@@ -119,3 +130,12 @@ class ProfileUpdateForm(forms.ModelForm):
             'readonly': True,
             'class': 'input-field disabled-field',
         })
+
+# admin upload of one CSV or NDJSON file for importing.Importer
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[(kind, kind.title()) for kind in IMPORT_COLUMNS])
+    file = forms.FileField(help_text="CSV, or NDJSON for .ndjson and .jsonl files.")
+    format = forms.ChoiceField(
+        choices=[('', 'From the file name')] + [(name, name.upper()) for name in IMPORT_FORMATS],
+        required=False
+    )
@@ -0,0 +1,374 @@
+# imports departments, teams, sessions, team memberships and votes from CSV or NDJSON, for
+# bringing earlier health check rounds into the system
+#
+# files are read row by row and written in batched transactions. Names are resolved through
+# lookup maps loaded once per import, and bad rows are reported without stopping the rest.
+# Votes are appended to the vote event log like any submission, so tallies, dashboard caches
+# and the comment index follow; the vote columns match the vote export, so an export of one
+# installation can be imported into another.
+
+import csv
+import io
+import json
+from datetime import datetime, time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import access, reference
+from .events import append_vote_events
+from .models import Department, HealthCheckSession, Team, TeamMembership, Vote, VoteEvent
+from .votes import CARD_TYPE_VALUES, PROGRESS_VALUES, VOTE_VALUES
+
+
+# in the order they must be imported, since later kinds refer to earlier ones by name
+IMPORT_COLUMNS = {
+    'departments': ['name'],
+    'teams': ['name', 'department'],
+    'sessions': ['name', 'start_date', 'end_date'],
+    'memberships': ['username', 'team', 'department'],
+    'votes': [
+        'username', 'team', 'department', 'session', 'session_start_date',
+        'card_type', 'vote', 'progress', 'comments', 'updated_at',
+    ],
+}
+IMPORT_FORMATS = ['csv', 'ndjson']
+
+# the model whose add permission an import of each kind needs
+IMPORT_MODELS = {
+    'departments': Department,
+    'teams': Team,
+    'sessions': HealthCheckSession,
+    'memberships': TeamMembership,
+    'votes': Vote,
+}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+# the format of a file from its name: .ndjson/.jsonl files are NDJSON, anything else CSV
+def format_for(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def _clean(value):
+    return '' if value is None else str(value).strip()
+
+
+# yields (row number, row, error) for each row of a text file, with missing columns as ''
+def read_rows(file, file_format, columns):
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, {column: _clean(row.get(column)) for column in columns}, None
+        return
+
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "not valid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "not a JSON object"
+            continue
+        yield number, {column: _clean(row.get(column)) for column in columns}, None
+
+
+# an uploaded file (bytes) as text, without reading it into memory
+def text_stream(binary_file):
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def _parse_date(value, column):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ImportRowError(f"{column} must be a date (YYYY-MM-DD), not {value!r}")
+    return parsed
+
+
+def _parse_timestamp(value):
+    try:
+        parsed = parse_datetime(value) or datetime.combine(_parse_date(value, 'updated_at'), time())
+    except (ValueError, ImportRowError):
+        raise ImportRowError(f"updated_at must be a date or date and time, not {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+# departments, teams, sessions, users and memberships by the names the files use, loaded
+# the first time an import needs them and extended as rows are imported
+class _Lookups:
+    def __init__(self):
+        self._departments = None
+        self._teams = None
+        self._teams_by_name = None
+        self._sessions = None
+        self._sessions_by_name = None
+        self._users = None
+        self._memberships = None
+
+    @property
+    def departments(self):
+        if self._departments is None:
+            self._departments = {department.name: department for department in Department.objects.all()}
+        return self._departments
+
+    # {(department id or None, name): team}
+    @property
+    def teams(self):
+        self._load_teams()
+        return self._teams
+
+    @property
+    def teams_by_name(self):
+        self._load_teams()
+        return self._teams_by_name
+
+    def _load_teams(self):
+        if self._teams is None:
+            self._teams = {}
+            self._teams_by_name = {}
+            for team in Team.objects.all():
+                self.add_team(team)
+
+    def add_team(self, team):
+        self._teams[(team.department_id, team.name)] = team
+        self._teams_by_name.setdefault(team.name, []).append(team)
+
+    # {(name, start date): session}
+    @property
+    def sessions(self):
+        self._load_sessions()
+        return self._sessions
+
+    @property
+    def sessions_by_name(self):
+        self._load_sessions()
+        return self._sessions_by_name
+
+    def _load_sessions(self):
+        if self._sessions is None:
+            self._sessions = {}
+            self._sessions_by_name = {}
+            for session in HealthCheckSession.objects.all():
+                self.add_session(session)
+
+    def add_session(self, session):
+        self._sessions[(session.name, session.start_date)] = session
+        self._sessions_by_name.setdefault(session.name, []).append(session)
+
+    @property
+    def users(self):
+        if self._users is None:
+            self._users = dict(User.objects.values_list('username', 'id'))
+        return self._users
+
+    @property
+    def memberships(self):
+        if self._memberships is None:
+            self._memberships = set(TeamMembership.objects.values_list('user_id', 'team_id'))
+        return self._memberships
+
+    def department(self, name):
+        department = self.departments.get(name)
+        if department is None:
+            raise ImportRowError(f"unknown department {name!r}")
+        return department
+
+    # a team by department and name; the department may be left out when no other team has
+    # the same name
+    def team(self, name, department_name):
+        if not name:
+            raise ImportRowError("team is required")
+        if department_name:
+            team = self.teams.get((self.department(department_name).id, name))
+            if team is None:
+                raise ImportRowError(f"unknown team {name!r} in department {department_name!r}")
+            return team
+        matches = self.teams_by_name.get(name, [])
+        if len(matches) != 1:
+            raise ImportRowError(
+                f"unknown team {name!r}" if not matches else f"team {name!r} exists in several departments; give its department"
+            )
+        return matches[0]
+
+    # a session by name and start date; the start date may be left out when the name is unique
+    def session(self, name, start_date):
+        if not name:
+            raise ImportRowError("session is required")
+        if start_date:
+            session = self.sessions.get((name, _parse_date(start_date, 'session_start_date')))
+            if session is None:
+                raise ImportRowError(f"unknown session {name!r} starting {start_date}")
+            return session
+        matches = self.sessions_by_name.get(name, [])
+        if len(matches) != 1:
+            raise ImportRowError(
+                f"unknown session {name!r}" if not matches else f"several sessions are called {name!r}; give session_start_date"
+            )
+        return matches[0]
+
+    def user_id(self, username):
+        if not username:
+            raise ImportRowError("username is required")
+        _check_length(username, User, 'username')
+        user_id = self.users.get(username)
+        if user_id is None:
+            raise ImportRowError(f"unknown user {username!r}")
+        return user_id
+
+
+# a value longer than its column is reported against its row: PostgreSQL would otherwise
+# fail the whole batch's bulk_create with a DataError (SQLite does not check lengths)
+def _check_length(value, model, field, column=None):
+    max_length = model._meta.get_field(field).max_length
+    if len(value) > max_length:
+        raise ImportRowError(f"{column or field} is longer than {max_length} characters")
+
+
+# each takes a row and returns an unsaved object to create, or None when it already exists
+def _department(row, lookups):
+    if not row['name']:
+        raise ImportRowError("name is required")
+    _check_length(row['name'], Department, 'name')
+    if row['name'] in lookups.departments:
+        return None
+    department = Department(name=row['name'])
+    lookups.departments[department.name] = department
+    return department
+
+
+def _team(row, lookups):
+    if not row['name']:
+        raise ImportRowError("name is required")
+    _check_length(row['name'], Team, 'name')
+    department = lookups.department(row['department']) if row['department'] else None
+    if (department.id if department else None, row['name']) in lookups.teams:
+        return None
+    team = Team(name=row['name'], department=department)
+    lookups.add_team(team)
+    return team
+
+
+def _session(row, lookups):
+    if not row['name']:
+        raise ImportRowError("name is required")
+    _check_length(row['name'], HealthCheckSession, 'name')
+    start_date = _parse_date(row['start_date'], 'start_date')
+    end_date = _parse_date(row['end_date'], 'end_date')
+    if end_date < start_date:
+        raise ImportRowError("end_date is before start_date")
+    if (row['name'], start_date) in lookups.sessions:
+        return None
+    session = HealthCheckSession(name=row['name'], start_date=start_date, end_date=end_date)
+    lookups.add_session(session)
+    return session
+
+
+def _membership(row, lookups):
+    user_id = lookups.user_id(row['username'])
+    team = lookups.team(row['team'], row['department'])
+    if (user_id, team.id) in lookups.memberships:
+        return None
+    lookups.memberships.add((user_id, team.id))
+    return TeamMembership(user_id=user_id, team_id=team.id)
+
+
+# votes become vote events dated by updated_at (the time of the import without one); for
+# the same user, team, session and card the newest row wins, or the later row on a tie, and
+# a row older than the current vote does not replace it
+def _vote(row, lookups):
+    user_id = lookups.user_id(row['username'])
+    team = lookups.team(row['team'], row['department'])
+    session = lookups.session(row['session'], row['session_start_date'])
+    for column, values in (('card_type', CARD_TYPE_VALUES), ('vote', VOTE_VALUES), ('progress', PROGRESS_VALUES)):
+        if row[column] not in values:
+            raise ImportRowError(f"unknown {column} {row[column]!r}")
+    return VoteEvent(
+        user_id=user_id,
+        team_id=team.id,
+        session_id=session.id,
+        card_type=row['card_type'],
+        vote=row['vote'],
+        progress=row['progress'],
+        comments=row['comments'],
+        created_at=_parse_timestamp(row['updated_at']) if row['updated_at'] else timezone.now(),
+    )
+
+
+def _save_departments(objects):
+    Department.objects.bulk_create(objects)
+    # bulk_create skips the signals that would normally do this
+    reference.invalidate()
+
+
+def _save_teams(objects):
+    Team.objects.bulk_create(objects)
+    reference.invalidate()
+
+
+def _save_sessions(objects):
+    HealthCheckSession.objects.bulk_create(objects)
+    reference.invalidate()
+
+
+def _save_memberships(objects):
+    TeamMembership.objects.bulk_create(objects)
+    for user_id in {membership.user_id for membership in objects}:
+        access.invalidate(user_id)
+
+
+IMPORTERS = {
+    'departments': (_department, _save_departments),
+    'teams': (_team, _save_teams),
+    'sessions': (_session, _save_sessions),
+    'memberships': (_membership, _save_memberships),
+    'votes': (_vote, append_vote_events),
+}
+
+
+class Importer:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.lookups = _Lookups()
+
+    # imports one file of `kind`; returns {'created', 'skipped', 'errors': [(row number, message)]}
+    def run(self, kind, file, file_format):
+        resolve, save = IMPORTERS[kind]
+        result = {'created': 0, 'skipped': 0, 'errors': []}
+        pending = []
+        for number, row, error in read_rows(file, file_format, IMPORT_COLUMNS[kind]):
+            if error is None:
+                try:
+                    obj = resolve(row, self.lookups)
+                except ImportRowError as row_error:
+                    error = str(row_error)
+            if error is not None:
+                result['errors'].append((number, error))
+                continue
+            if obj is None:
+                result['skipped'] += 1
+                continue
+            pending.append(obj)
+            if len(pending) >= self.batch_size:
+                result['created'] += self._save(save, pending)
+                pending = []
+        if pending:
+            result['created'] += self._save(save, pending)
+        return result
+
+    def _save(self, save, objects):
+        with transaction.atomic():
+            save(objects)
+        return len(objects)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+
+from healthcheck.models import Team, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy each vote's team department onto Vote.department. Migration 0008 does this "
+        "already; run it to repair votes written around that column, e.g. by raw SQL. "
+        "Works through the table in id ranges, one short transaction per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Vote ids per UPDATE (default 5000).")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        max_id = Vote.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        team_department = Subquery(Team.objects.filter(pk=OuterRef('team_id')).values('department_id')[:1])
+
+        updated = 0
+        for start in range(0, max_id, batch_size):
+            with transaction.atomic():
+                updated += Vote.objects.filter(
+                    id__gt=start,
+                    id__lte=start + batch_size
+                ).update(department_id=team_department)
+            self.stdout.write(f"  ids {start + 1}-{min(start + batch_size, max_id)} done")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled department on {updated} votes."))
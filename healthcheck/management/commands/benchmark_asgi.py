@@ -0,0 +1,149 @@
+import asyncio
+import queue
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from healthcheck.models import UserProfile
+from healthcheck.synthetic import create_org
+
+from .benchmark_views import BENCHMARK_CACHES, SIZES
+
+
+def summarise(latencies, wall, errors):
+    latencies = sorted(latencies)
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': p95,
+        'throughput': len(latencies) / wall,
+    }
+
+
+# sync views through the WSGI handler, one test client per worker thread, the way a
+# threaded WSGI server would serve them
+def run_wsgi(user, url, requests, concurrency):
+    # logged in up front: concurrent logins would race on the session table
+    clients = queue.SimpleQueue()
+    for _ in range(concurrency):
+        client = Client()
+        client.force_login(user)
+        clients.put(client)
+    local = threading.local()
+
+    def request(_):
+        if not hasattr(local, 'client'):
+            local.client = clients.get()
+        start = time.perf_counter()
+        status = local.client.get(url).status_code
+        return (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(request, range(requests)))
+    wall = time.perf_counter() - start
+    return summarise([ms for ms, _ in results], wall, sum(status != 200 for _, status in results))
+
+
+# async views through the ASGI handler, `concurrency` requests in flight on one event loop
+def run_asgi(user, url, requests, concurrency):
+    clients = []
+    for _ in range(concurrency):
+        client = AsyncClient()
+        client.force_login(user)
+        clients.append(client)
+
+    async def worker(client, count, results):
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get(url)
+            results.append(((time.perf_counter() - start) * 1000, response.status_code))
+
+    async def main():
+        results = []
+        shares = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+        await asyncio.gather(*[worker(client, count, results) for client, count in zip(clients, shares)])
+        return results
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    wall = time.perf_counter() - start
+    return summarise([ms for ms, _ in results], wall, sum(status != 200 for _, status in results))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency and throughput of the sync dashboard views under WSGI with the async "
+        "views under ASGI, at a given concurrency, on a synthetic organisation in a test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=list(SIZES), default='medium')
+        parser.add_argument('--requests', type=int, default=200, help="Requests per view and path.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--cold', action='store_true',
+                            help="Clear the dashboard cache before each view and path instead of warming it.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, options):
+        # committed rather than rolled back, as worker threads use their own connections
+        start = time.perf_counter()
+        org = create_org(seed=options['seed'], label='asgi-bench', **SIZES[options['size']])
+        self.stdout.write(
+            f"{options['size']}: {len(org['teams'])} teams, {org['users']} members, "
+            f"{len(org['sessions'])} sessions, {org['votes']} votes (seeded in {time.perf_counter() - start:.1f}s)"
+        )
+
+        engineer = User.objects.get(username='asgi-bench_user1')
+        leader = User.objects.create(username='asgi-bench_leader')
+        UserProfile.objects.create(user=leader, role='departmentLeader', department=org['departments'][0])
+        team = org['teams'][0]
+        session = org['sessions'][-1]
+        team_query = f"?team={team.id}&session={session.id}"
+        department_query = f"?department={team.department_id}&session={session.id}"
+        views = [
+            ('team_dashboard', engineer, reverse('team_dashboard') + team_query,
+             reverse('team_dashboard_async') + team_query),
+            ('department_dashboard', leader, reverse('department_dashboard') + department_query,
+             reverse('department_dashboard_async') + department_query),
+        ]
+
+        self.stdout.write(
+            f"\n{options['requests']} requests per path, concurrency {options['concurrency']}\n"
+            f"{'view':<22} {'path':<5} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8} {'errors':>6}"
+        )
+        for name, user, wsgi_url, asgi_url in views:
+            for path, runner, url in [('wsgi', run_wsgi, wsgi_url), ('asgi', run_asgi, asgi_url)]:
+                cache.clear()
+                if not options['cold']:
+                    runner(user, url, 1, 1)
+                result = runner(user, url, options['requests'], options['concurrency'])
+                self.stdout.write(
+                    f"{name:<22} {path:<5} {result['mean_ms']:>8.2f} {result['p50_ms']:>8.2f} "
+                    f"{result['p95_ms']:>8.2f} {result['throughput']:>8.1f} {result['errors']:>6}"
+                )
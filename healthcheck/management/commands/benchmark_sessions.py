@@ -0,0 +1,187 @@
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from healthcheck.models import TeamMembership, Vote
+from healthcheck.synthetic import create_org
+
+from .benchmark_views import BENCHMARK_CACHES, SIZES
+
+
+PASSWORD = 'session-bench'
+
+# a fast hasher, so the rush measures session and vote writes rather than password hashing
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+# counts the statements that read and write django_session, from every thread
+class _SessionQueries:
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            kind = 'reads' if sql.lstrip().upper().startswith('SELECT') else 'writes'
+            with self.lock:
+                self.counts[kind] += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a vote rush, with users logging in, opening the card form and submitting "
+        "votes in parallel, against a test database. Reports throughput, latency, 'database "
+        "is locked' errors and django_session reads and writes. With --storages, each session "
+        "storage mode (HEALTHCHECK_SESSION_STORAGE) is run in its own process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--storages', nargs='+', choices=list(settings.SESSION_ENGINES),
+                            help="Session storage modes to compare; defaults to the current one.")
+        parser.add_argument('--size', choices=list(SIZES), default='small')
+        parser.add_argument('--users', type=int, default=200, help="Users taking part in the rush.")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['threads'] < 1:
+            raise CommandError("--users and --threads must be at least 1.")
+        if options['storages']:
+            for storage in options['storages']:
+                self.run_storage_process(storage, options)
+            return
+
+        setup_test_environment()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # a file, not the default in-memory database, so locking behaves as in production
+            test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        caches = {
+            **BENCHMARK_CACHES,
+            'sessions': {**settings.CACHES['sessions'], 'LOCATION': tempfile.mkdtemp()},
+        }
+        try:
+            with override_settings(CACHES=caches, PASSWORD_HASHERS=FAST_HASHERS):
+                self.run(options)
+        finally:
+            close_old_connections()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_storage_process(self, storage, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_sessions',
+            '--size', options['size'],
+            '--users', str(options['users']),
+            '--threads', str(options['threads']),
+            '--seed', str(options['seed']),
+        ]
+        self.stdout.write(f"\n== session storage {storage} ==")
+        self.stdout.flush()
+        result = subprocess.run(command, env={**os.environ, 'HEALTHCHECK_SESSION_STORAGE': storage})
+        if result.returncode:
+            self.stderr.write(f"session storage {storage} failed with exit code {result.returncode}")
+
+    def run(self, options):
+        org = create_org(seed=options['seed'], label='session-bench', **SIZES[options['size']])
+        memberships = list(TeamMembership.objects.filter(
+            team__in=org['teams']
+        ).values_list('user__username', 'team_id'))
+        User.objects.filter(username__in=[username for username, _ in memberships]).update(
+            password=make_password(PASSWORD)
+        )
+
+        rng = random.Random(options['seed'])
+        jobs = []
+        for _ in range(options['users']):
+            username, team_id = rng.choice(memberships)
+            data = {'team': team_id, 'session': rng.choice(org['sessions']).id}
+            for code, _ in Vote.CARD_TYPES:
+                data[f'vote_{code}'] = rng.choice(['good', 'neutral', 'needs_improvement'])
+                data[f'progress_{code}'] = rng.choice(['improving', 'stable', 'declining'])
+            jobs.append((username, data))
+
+        login_url = reverse('login')
+        card_form_url = reverse('card_form')
+
+        # one user's visit: log in, open the card form, vote and land on the team dashboard
+        def visit(job):
+            username, data = job
+            client = Client()
+            start = time.perf_counter()
+            try:
+                response = client.post(login_url, {'username': username, 'password': PASSWORD})
+                if response.status_code != 302:
+                    outcome = 'login failed'
+                elif client.get(card_form_url).status_code != 200:
+                    outcome = 'card form failed'
+                elif client.post(card_form_url, data, follow=True).status_code != 200:
+                    outcome = 'vote failed'
+                else:
+                    outcome = 'ok'
+            except OperationalError as error:
+                outcome = 'locked' if 'locked' in str(error) else 'db error'
+            finally:
+                close_old_connections()
+            return outcome, (time.perf_counter() - start) * 1000
+
+        session_queries = _SessionQueries()
+        connection_created.connect(session_queries.install)
+        for existing in connections.all(initialized_only=True):
+            session_queries.install(existing)
+
+        # failed visits are counted below rather than logged one by one
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                results = list(pool.map(visit, jobs))
+        finally:
+            request_logger.setLevel(level)
+            connection_created.disconnect(session_queries.install)
+        wall = time.perf_counter() - start
+
+        latencies = sorted(ms for outcome, ms in results if outcome == 'ok')
+        outcomes = Counter(outcome for outcome, _ in results)
+        self.stdout.write(
+            f"session storage {settings.SESSION_STORAGE}, profile {settings.DATABASE_PROFILE}, "
+            f"{options['threads']} threads, {options['users']} users in {wall:.1f}s"
+        )
+        self.stdout.write(f"  outcomes: {', '.join(f'{name} {count}' for name, count in sorted(outcomes.items()))}")
+        if latencies:
+            p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(
+                f"  {len(latencies) / wall:.1f} visits/s, p50 {statistics.median(latencies):.1f} ms, "
+                f"p95 {p95:.1f} ms"
+            )
+        self.stdout.write(
+            f"  django_session: {session_queries.counts['writes']} writes, "
+            f"{session_queries.counts['reads']} reads, {Session.objects.count()} rows"
+        )
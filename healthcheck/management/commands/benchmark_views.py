@@ -0,0 +1,245 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import (
+    CaptureQueriesContext, modify_settings, override_settings, setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from healthcheck.cube import reset_cube
+from healthcheck.models import UserProfile, Vote
+from healthcheck.synthetic import create_org
+
+
+SIZES = {
+    'small': {'departments': 2, 'teams': 10, 'members_per_team': 5, 'sessions': 5},
+    'medium': {'departments': 5, 'teams': 50, 'members_per_team': 8, 'sessions': 20},
+    'large': {'departments': 10, 'teams': 200, 'members_per_team': 10, 'sessions': 50},
+}
+
+# keeps the benchmark's cache.clear() calls away from the real dashboard cache
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'healthcheck-benchmark',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'healthcheck-benchmark-sessions',
+    },
+}
+
+# timing changes smaller than this are noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+
+class Rollback(Exception):
+    pass
+
+
+# (name, role, method, url, data) for every request the suite makes
+def view_requests(org):
+    team = org['teams'][0]
+    session = org['sessions'][-1]
+    card_form_data = {'team': team.id, 'session': session.id}
+    for code, _ in Vote.CARD_TYPES:
+        card_form_data[f'vote_{code}'] = 'good'
+        card_form_data[f'progress_{code}'] = 'stable'
+    return [
+        ('home', 'engineer', 'get', reverse('home'), None),
+        ('card_form', 'engineer', 'get', reverse('card_form'), None),
+        ('card_form_submit', 'engineer', 'post', reverse('card_form'), card_form_data),
+        ('team_dashboard', 'engineer', 'get',
+         f"{reverse('team_dashboard')}?team={team.id}&session={session.id}", None),
+        ('team_dashboard_my_votes', 'engineer', 'get',
+         f"{reverse('team_dashboard')}?team={team.id}&session={session.id}&my_votes_only=1", None),
+        ('department_dashboard', 'departmentLeader', 'get',
+         f"{reverse('department_dashboard')}?department={team.department_id}&session={session.id}", None),
+        ('trends', 'engineer', 'get', f"{reverse('trends')}?team={team.id}", None),
+    ]
+
+
+# on_commit callbacks (such as the inline vote event consumer) are run and timed as part of
+# the request, as they would be after a real commit; the benchmark data is rolled back instead
+def timed_request(client, method, url, data):
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+            b''.join(response) if response.streaming else response.content
+        elapsed = (time.perf_counter() - start) * 1000
+    return response.status_code, elapsed, len(queries)
+
+
+def peak_memory(client, method, url, data):
+    tracemalloc.start()
+    try:
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            getattr(client, method)(url, data) if data else getattr(client, method)(url)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic organisations of several sizes into a test database, drive the main views "
+        "through the test client and record wall time, SQL query count and peak memory per view. "
+        "Results can be written to JSON and compared with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+        parser.add_argument('--repeat', type=int, default=5, help="Warm requests timed per view.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write results to this JSON file.")
+        parser.add_argument('--compare', help="Earlier results file to check for regressions.")
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help="Flag views whose warm time grows by more than this factor.")
+        parser.add_argument('--without-request-metrics', action='store_true',
+                            help="Run without RequestMetricsMiddleware, to measure its overhead.")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    previous = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Could not read {options['compare']}: {error}")
+
+        results = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+                'request_metrics': not options['without_request_metrics'],
+            },
+            'sizes': {},
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        middleware = {}
+        if options['without_request_metrics']:
+            middleware = {'remove': ['healthcheck.middleware.RequestMetricsMiddleware']}
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES), modify_settings(MIDDLEWARE=middleware):
+                for size in options['sizes']:
+                    results['sizes'][size] = self.run_size(size, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if previous is not None:
+            regressions = self.compare(previous, results, options['threshold'])
+            if regressions:
+                raise CommandError(f"{regressions} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def run_size(self, size, options):
+        result = {}
+        try:
+            with transaction.atomic():
+                result = self.measure(size, options)
+                raise Rollback
+        except Rollback:
+            pass
+        reset_cube()
+        return result
+
+    def measure(self, size, options):
+        start = time.perf_counter()
+        org = create_org(seed=options['seed'], label=f'bench-{size}', **SIZES[size])
+        self.stdout.write(
+            f"\n{size}: {len(org['teams'])} teams, {org['users']} members, {len(org['sessions'])} sessions, "
+            f"{org['votes']} votes (seeded in {time.perf_counter() - start:.1f}s)"
+        )
+
+        engineer = User.objects.get(username=f'bench-{size}_user1')
+        leader = User.objects.create(username=f'bench-{size}_leader')
+        UserProfile.objects.create(user=leader, role='departmentLeader', department=org['departments'][0])
+        clients = {'engineer': Client(), 'departmentLeader': Client()}
+        clients['engineer'].force_login(engineer)
+        clients['departmentLeader'].force_login(leader)
+
+        views = {}
+        self.stdout.write(
+            f"{'view':<25} {'status':>6} {'cold ms':>9} {'warm ms':>9} {'queries':>8} {'peak KiB':>9}"
+        )
+        for name, role, method, url, data in view_requests(org):
+            client = clients[role]
+            cache.clear()
+            status, cold_ms, cold_queries = timed_request(client, method, url, data)
+            timings = []
+            for _ in range(options['repeat']):
+                status, elapsed, queries = timed_request(client, method, url, data)
+                timings.append(elapsed)
+            peak = peak_memory(client, method, url, data)
+            views[name] = {
+                'status': status,
+                'cold_ms': round(cold_ms, 3),
+                'cold_queries': cold_queries,
+                'warm_ms': round(statistics.median(timings), 3),
+                'queries': queries,
+                'peak_kib': round(peak / 1024, 1),
+            }
+            self.stdout.write(
+                f"{name:<25} {status:>6} {cold_ms:>9.2f} {views[name]['warm_ms']:>9.2f} "
+                f"{queries:>8} {views[name]['peak_kib']:>9.1f}"
+            )
+
+        return {
+            'org': {
+                'departments': len(org['departments']),
+                'teams': len(org['teams']),
+                'members': org['users'],
+                'sessions': len(org['sessions']),
+                'votes': org['votes'],
+            },
+            'views': views,
+        }
+
+    def compare(self, previous, current, threshold):
+        regressions = 0
+        self.stdout.write(f"\n{'size':<7} {'view':<25} {'warm ms':>19} {'queries':>9}")
+        for size, size_result in current['sizes'].items():
+            old_views = previous.get('sizes', {}).get(size, {}).get('views', {})
+            for name, metrics in size_result['views'].items():
+                old = old_views.get(name)
+                if old is None:
+                    continue
+                slower = (metrics['warm_ms'] > old['warm_ms'] * threshold
+                          and metrics['warm_ms'] - old['warm_ms'] > NOISE_FLOOR_MS)
+                more_queries = metrics['queries'] > old['queries']
+                line = (
+                    f"{size:<7} {name:<25} {old['warm_ms']:>8.2f} -> {metrics['warm_ms']:>8.2f} "
+                    f"{old['queries']:>3} -> {metrics['queries']:<3}"
+                )
+                if slower or more_queries:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line + " REGRESSION"))
+                else:
+                    self.stdout.write(line)
+        return regressions
@@ -0,0 +1,142 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Case, When
+
+from healthcheck.cube import VoteCube
+from healthcheck.models import Vote, VoteTally
+from healthcheck.synthetic import create_org
+from healthcheck.tallies import card_results
+
+
+class Rollback(Exception):
+    pass
+
+
+def orm_team(team_id, session_id):
+    return {row['card_type']: row for row in Vote.objects.filter(
+        team_id=team_id,
+        session_id=session_id
+    ).values('card_type').annotate(
+        good_count=Count(Case(When(vote='good', then=1))),
+        neutral_count=Count(Case(When(vote='neutral', then=1))),
+        needs_improvement_count=Count(Case(When(vote='needs_improvement', then=1))),
+        improving_count=Count(Case(When(progress='improving', then=1))),
+        stable_count=Count(Case(When(progress='stable', then=1))),
+        declining_count=Count(Case(When(progress='declining', then=1))),
+        total_votes=Count('id')
+    ).order_by('card_type')}
+
+
+def orm_department(department_id, session_id):
+    return {row['card_type']: row for row in Vote.objects.filter(
+        department_id=department_id,
+        session_id=session_id
+    ).values('card_type').annotate(
+        good_count=Count(Case(When(vote='good', then=1))),
+        neutral_count=Count(Case(When(vote='neutral', then=1))),
+        needs_improvement_count=Count(Case(When(vote='needs_improvement', then=1))),
+        improving_count=Count(Case(When(progress='improving', then=1))),
+        stable_count=Count(Case(When(progress='stable', then=1))),
+        declining_count=Count(Case(When(progress='declining', then=1))),
+        total_votes=Count('id')
+    ).order_by('card_type')}
+
+
+def timed(function, samples):
+    timings = []
+    results = []
+    for args in samples:
+        start = time.perf_counter()
+        results.append(function(*args))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, results
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare dashboard numbers from the raw Vote table, the VoteTally rollup and the "
+        "in-memory vote cube on a synthetic organisation. All data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=10)
+        parser.add_argument('--teams', type=int, default=200)
+        parser.add_argument('--members', type=int, default=5, help="Members per team.")
+        parser.add_argument('--sessions', type=int, default=50)
+        parser.add_argument('--participation', type=float, default=0.7)
+        parser.add_argument('--samples', type=int, default=200, help="Lookups timed per path.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def run(self, options):
+        start = time.perf_counter()
+        org = create_org(
+            departments=options['departments'],
+            teams=options['teams'],
+            members_per_team=options['members'],
+            sessions=options['sessions'],
+            participation=options['participation'],
+            seed=options['seed'],
+            label='cube-benchmark',
+        )
+        self.stdout.write(
+            f"Seeded {len(org['teams'])} teams, {org['users']} members, {len(org['sessions'])} sessions, "
+            f"{org['votes']} votes in {time.perf_counter() - start:.1f}s"
+        )
+
+        start = time.perf_counter()
+        cube = VoteCube.load()
+        self.stdout.write(
+            f"Cube loaded in {(time.perf_counter() - start) * 1000:.0f} ms, "
+            f"shape {cube.counts.shape}, {cube.counts.nbytes / 1024 / 1024:.1f} MiB"
+        )
+
+        rng = random.Random(options['seed'])
+        team_samples = [
+            (rng.choice(org['teams']).id, rng.choice(org['sessions']).id)
+            for _ in range(options['samples'])
+        ]
+        department_samples = [
+            (rng.choice(org['departments']).id, rng.choice(org['sessions']).id)
+            for _ in range(options['samples'])
+        ]
+
+        paths = [
+            ('team', 'raw votes', orm_team, team_samples),
+            ('team', 'tallies', lambda team_id, session_id: card_results(
+                VoteTally.objects.filter(team_id=team_id, session_id=session_id)), team_samples),
+            ('team', 'cube', lambda team_id, session_id: cube.results_dict(
+                cube.team_counts(team_id, session_id)), team_samples),
+            ('department', 'raw votes', orm_department, department_samples),
+            ('department', 'tallies', lambda department_id, session_id: card_results(
+                VoteTally.objects.filter(team__department_id=department_id, session_id=session_id)), department_samples),
+            ('department', 'cube', lambda department_id, session_id: cube.results_dict(
+                cube.department_counts(department_id, session_id)), department_samples),
+        ]
+
+        self.stdout.write(f"\n{'view':<11} {'source':<10} {'mean ms':>9} {'p95 ms':>9}")
+        reference = {}
+        for view, source, function, samples in paths:
+            timings, results = timed(function, samples)
+            comparable = [
+                {card: {field: value for field, value in result.items() if field != 'card_type'}
+                 for card, result in sample_result.items()}
+                for sample_result in results
+            ]
+            if view not in reference:
+                reference[view] = comparable
+            elif comparable != reference[view]:
+                self.stdout.write(self.style.ERROR(f"{view}/{source} results differ from raw votes"))
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(f"{view:<11} {source:<10} {statistics.mean(timings):>9.3f} {p95:>9.3f}")
@@ -0,0 +1,145 @@
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Sum
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from healthcheck.events import pending_vote_events
+from healthcheck.models import TeamMembership, Vote, VoteTally
+from healthcheck.synthetic import create_org
+
+from .benchmark_views import BENCHMARK_CACHES, SIZES
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire parallel card form submissions at a test database and report throughput, latency "
+        "and 'database is locked' errors. With --profiles, each database profile "
+        "(HEALTHCHECK_DB_PROFILE) is run in its own process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=list(settings.DATABASE_PROFILES),
+                            help="Profiles to compare; defaults to the current one.")
+        parser.add_argument('--size', choices=list(SIZES), default='small')
+        parser.add_argument('--submissions', type=int, default=300)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['submissions'] < 1 or options['threads'] < 1:
+            raise CommandError("--submissions and --threads must be at least 1.")
+        if options['profiles']:
+            for profile in options['profiles']:
+                self.run_profile_process(profile, options)
+            return
+
+        setup_test_environment()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # a file, not the default in-memory database, so locking behaves as in production
+            test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                self.run(options)
+        finally:
+            close_old_connections()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_profile_process(self, profile, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_vote_writes',
+            '--size', options['size'],
+            '--submissions', str(options['submissions']),
+            '--threads', str(options['threads']),
+            '--seed', str(options['seed']),
+        ]
+        self.stdout.write(f"\n== profile {profile} ==")
+        self.stdout.flush()
+        result = subprocess.run(command, env={**os.environ, 'HEALTHCHECK_DB_PROFILE': profile})
+        if result.returncode:
+            self.stderr.write(f"profile {profile} failed with exit code {result.returncode}")
+
+    def run(self, options):
+        org = create_org(seed=options['seed'], label='write-bench', **SIZES[options['size']])
+        memberships = list(TeamMembership.objects.filter(
+            team__in=org['teams']
+        ).values_list('user_id', 'team_id'))
+        users = User.objects.in_bulk([user_id for user_id, _ in memberships])
+
+        rng = random.Random(options['seed'])
+        jobs = []
+        for _ in range(options['submissions']):
+            user_id, team_id = rng.choice(memberships)
+            data = {'team': team_id, 'session': rng.choice(org['sessions']).id}
+            for code, _ in Vote.CARD_TYPES:
+                data[f'vote_{code}'] = rng.choice(['good', 'neutral', 'needs_improvement'])
+                data[f'progress_{code}'] = rng.choice(['improving', 'stable', 'declining'])
+            # logged in up front so only the submissions compete for the database
+            client = Client()
+            client.force_login(users[user_id])
+            jobs.append((client, data))
+
+        url = reverse('card_form')
+
+        def submit(job):
+            client, data = job
+            start = time.perf_counter()
+            try:
+                response = client.post(url, data)
+                outcome = 'ok' if response.status_code == 302 else f'http {response.status_code}'
+            except OperationalError as error:
+                outcome = 'locked' if 'locked' in str(error) else 'db error'
+            finally:
+                # a real server releases (or keeps, with CONN_MAX_AGE) the connection per request
+                close_old_connections()
+            return outcome, (time.perf_counter() - start) * 1000
+
+        # failed submissions are counted below rather than logged one by one
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                results = list(pool.map(submit, jobs))
+        finally:
+            request_logger.setLevel(level)
+        wall = time.perf_counter() - start
+
+        latencies = sorted(ms for outcome, ms in results if outcome == 'ok')
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        tallied = VoteTally.objects.filter(team__in=org['teams']).aggregate(total=Sum('total_votes'))['total']
+        counted = Vote.objects.filter(team__in=org['teams']).count()
+
+        self.stdout.write(
+            f"profile {settings.DATABASE_PROFILE} ({connection.vendor}), {options['threads']} threads, "
+            f"{options['submissions']} submissions in {wall:.1f}s"
+        )
+        self.stdout.write(f"  outcomes: {', '.join(f'{name} {count}' for name, count in sorted(outcomes.items()))}")
+        if latencies:
+            p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(
+                f"  {len(latencies) / wall:.1f} submissions/s, p50 {statistics.median(latencies):.1f} ms, "
+                f"p95 {p95:.1f} ms"
+            )
+        pending = pending_vote_events()
+        style = self.style.SUCCESS if tallied == counted and not pending else self.style.ERROR
+        self.stdout.write(style(f"  tallies {tallied} / votes {counted}, {pending} vote events not yet consumed"))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from healthcheck.events import consume_vote_events, pending_vote_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold new vote events into the votes, tallies and dashboard caches, from the stored "
+        "consumer offset. Run with --follow when HEALTHCHECK_VOTE_CONSUMER=worker; with the "
+        "inline consumer it only catches up on events a failed submission left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events per transaction (default 1000).")
+        parser.add_argument('--follow', action='store_true', help="Keep polling for new events.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --follow.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        if not options['follow']:
+            self.stdout.write(f"{pending_vote_events()} pending events.")
+            consumed = consume_vote_events(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Consumed {consumed} vote events."))
+            return
+
+        try:
+            while True:
+                consumed = consume_vote_events(options['batch_size'])
+                if consumed:
+                    self.stdout.write(f"consumed {consumed} vote events")
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcheck.models import Department
+from healthcheck.synthetic import create_org_structure, generate_votes, write_votes
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic organisation of departments, teams, members, sessions and votes "
+        "for load testing. Output is reproducible for a given --seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=10)
+        parser.add_argument('--teams', type=int, default=200)
+        parser.add_argument('--members', type=int, default=5, help="Members per team.")
+        parser.add_argument('--sessions', type=int, default=50)
+        parser.add_argument('--participation', type=float, default=0.7,
+                            help="Chance that a member votes in a session (0-1).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Votes appended to the vote event log and consumed per batch.")
+        parser.add_argument('--label', default='synthetic',
+                            help="Prefix for generated names; must not already be in use.")
+
+    def handle(self, *args, **options):
+        if min(options['departments'], options['teams'], options['members'], options['sessions']) < 1:
+            raise CommandError("--departments, --teams, --members and --sessions must be at least 1.")
+        if not 0 <= options['participation'] <= 1:
+            raise CommandError("--participation must be between 0 and 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if Department.objects.filter(name__startswith=f"{options['label']} Department ").exists():
+            raise CommandError(f"Synthetic data labelled '{options['label']}' already exists; pick another --label.")
+
+        start = time.perf_counter()
+        org = create_org_structure(
+            departments=options['departments'],
+            teams=options['teams'],
+            members_per_team=options['members'],
+            sessions=options['sessions'],
+            label=options['label'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - start
+        rows = len(org['departments']) + len(org['teams']) + len(org['sessions']) + org['users'] * 3
+        self.stdout.write(
+            f"Created {len(org['departments'])} departments, {len(org['teams'])} teams, "
+            f"{len(org['sessions'])} sessions and {org['users']} members "
+            f"({rows} rows, {rows / elapsed:,.0f} rows/s)"
+        )
+
+        expected = len(org['memberships']) * len(org['sessions']) * 10 * options['participation']
+        every = max(1, int(expected // 10))
+        reported = [0]
+
+        def progress(written, elapsed):
+            if written - reported[0] >= every:
+                reported[0] = written
+                self.stdout.write(f"  {written:,} votes ({written / elapsed:,.0f} rows/s)")
+
+        votes_start = time.perf_counter()
+        votes = write_votes(
+            generate_votes(
+                org['memberships'],
+                [session.id for session in org['sessions']],
+                options['participation'],
+                random.Random(options['seed']),
+                batch_size=options['batch_size'],
+            ),
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - votes_start
+        self.stdout.write(f"Wrote {votes:,} votes in {elapsed:.1f}s ({votes / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - start:.1f}s"))
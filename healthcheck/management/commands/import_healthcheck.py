@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcheck.importing import IMPORT_COLUMNS, IMPORT_FORMATS, Importer, format_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Import departments, teams, sessions, team memberships and votes from CSV or NDJSON "
+        "files, in that order. Rows are streamed and written in batched transactions; rows "
+        "that cannot be imported are reported and skipped. Users must already exist (see "
+        "provision_users)."
+    )
+
+    def add_arguments(self, parser):
+        for kind, columns in IMPORT_COLUMNS.items():
+            parser.add_argument(f'--{kind}', metavar='FILE', help=f"Columns: {', '.join(columns)}.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help="File format; by default .ndjson and .jsonl files are NDJSON and others CSV.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per transaction (default 1000).")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        files = [(kind, options[kind]) for kind in IMPORT_COLUMNS if options[kind]]
+        if not files:
+            raise CommandError(f"Give at least one of {', '.join(f'--{kind}' for kind in IMPORT_COLUMNS)}.")
+
+        importer = Importer(batch_size=options['batch_size'])
+        for kind, path in files:
+            start = time.perf_counter()
+            try:
+                with open(path, newline='', encoding='utf-8-sig') as file:
+                    result = importer.run(kind, file, options['format'] or format_for(path))
+            except (OSError, UnicodeDecodeError) as error:
+                raise CommandError(f"Could not read {path}: {error}")
+
+            for number, message in result['errors']:
+                self.stderr.write(f"{path} row {number}: {message}")
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind}: imported {result['created']}, skipped {result['skipped']} existing, "
+                f"{len(result['errors'])} errors in {elapsed:.1f}s"
+            ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcheck.models import Team
+from healthcheck.provisioning import PROVISION_COLUMNS, generated_users, provision_users, read_user_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users with their profile and team membership in bulk, from a CSV file or "
+        "generated engineers for every team. Existing usernames are skipped."
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--csv', help=f"CSV file with columns: {', '.join(PROVISION_COLUMNS)}.")
+        source.add_argument('--per-team', type=int, help="Generate this many engineers for every team.")
+        parser.add_argument('--prefix', default='eng', help="Username prefix for generated engineers.")
+        parser.add_argument('--password',
+                            help="Initial password shared by all new users. Without it, accounts "
+                                 "get an unusable password and need a reset before first login.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        start = time.perf_counter()
+        if options['csv']:
+            try:
+                with open(options['csv'], newline='', encoding='utf-8-sig') as file:
+                    rows = list(read_user_csv(file))
+            except OSError as error:
+                raise CommandError(f"Could not read {options['csv']}: {error}")
+        else:
+            if options['per_team'] < 1:
+                raise CommandError("--per-team must be at least 1.")
+            rows = list(generated_users(Team.objects.select_related('department').order_by('id'), options['per_team'], options['prefix']))
+
+        result = provision_users(rows, password=options['password'], batch_size=options['batch_size'])
+
+        for number, username, message in result['errors']:
+            self.stderr.write(f"Row {number} ({username or 'no username'}): {message}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} users, skipped {result['skipped']} existing, "
+            f"{len(result['errors'])} errors in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from healthcheck.search import comment_index_available, rebuild_comment_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the SQLite full-text index over vote comments, recreating its table and "
+        "triggers if they are missing. migrate restores the triggers after a migration that "
+        "rebuilds the Vote table; run this after altering the table by other means."
+    )
+
+    def handle(self, *args, **options):
+        if not comment_index_available():
+            raise CommandError("The comment index is SQLite only; other databases search comments with LIKE.")
+        with transaction.atomic():
+            indexed = rebuild_comment_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} vote comments."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from healthcheck.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the VoteTally rollup table from the Vote table. "
+        "Run after bulk edits that bypass Vote.save(), e.g. QuerySet.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', type=int, action='append', dest='teams', help="Only rebuild this team id (repeatable).")
+        parser.add_argument('--session', type=int, action='append', dest='sessions', help="Only rebuild this session id (repeatable).")
+
+    def handle(self, *args, **options):
+        rows = rebuild_tallies(team_ids=options['teams'], session_ids=options['sessions'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} tally rows."))
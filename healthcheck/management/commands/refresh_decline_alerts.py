@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from healthcheck.alerts import refresh_decline_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Raise decline alerts for team cards whose share of good votes fell sharply since the "
+        "session before. Only sessions with new votes since the last run, and the sessions "
+        "after them, are recomputed; run it after consume_vote_events, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Recompute every session, e.g. after session dates changed or votes were deleted.",
+        )
+
+    def handle(self, *args, **options):
+        sessions, alerts = refresh_decline_alerts(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {sessions} sessions: {alerts} decline alerts."))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from healthcheck.events import card_results_at
+from healthcheck.models import HealthCheckSession, Team, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Print a session's per-card vote counts as they stood at a point in time, rebuilt from "
+        "the vote event log."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', type=int, required=True, help="Session id.")
+        parser.add_argument('--at', required=True, help="Point in time, e.g. 2025-03-01T12:00 (server time zone).")
+        parser.add_argument('--team', type=int, action='append', dest='teams', help="Only this team id (repeatable).")
+
+    def handle(self, *args, **options):
+        try:
+            session = HealthCheckSession.objects.get(id=options['session'])
+        except HealthCheckSession.DoesNotExist:
+            raise CommandError(f"Session {options['session']} does not exist.")
+        try:
+            at = parse_datetime(options['at'])
+        except ValueError:
+            at = None
+        if at is None:
+            raise CommandError("--at must be a date and time, e.g. 2025-03-01T12:00.")
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        if options['teams'] and Team.objects.filter(id__in=options['teams']).count() != len(set(options['teams'])):
+            raise CommandError("Unknown team id.")
+
+        results = card_results_at(session, at, team_ids=options['teams'])
+        self.stdout.write(f"{session.name} as of {at:%Y-%m-%d %H:%M}")
+        self.stdout.write(
+            f"{'card':<28} {'good':>6} {'neutral':>8} {'needs imp':>10} "
+            f"{'improving':>10} {'stable':>7} {'declining':>10} {'total':>6}"
+        )
+        for code, name in Vote.CARD_TYPES:
+            row = results.get(code)
+            if row is None:
+                continue
+            self.stdout.write(
+                f"{name:<28} {row['good_count']:>6} {row['neutral_count']:>8} {row['needs_improvement_count']:>10} "
+                f"{row['improving_count']:>10} {row['stable_count']:>7} {row['declining_count']:>10} {row['total_votes']:>6}"
+            )
@@ -0,0 +1,82 @@
+# per-process request metrics, aggregated by URL name and rendered in the Prometheus text
+# format; fed by RequestMetricsMiddleware
+
+import threading
+from bisect import bisect_left
+
+from .dashboard_cache import cache_stats
+
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+
+HISTOGRAMS = [
+    ('healthcheck_request_duration_seconds', 'Wall time spent in the view and middleware.', DURATION_BUCKETS),
+    ('healthcheck_request_sql_duration_seconds', 'Time spent executing SQL per request.', DURATION_BUCKETS),
+    ('healthcheck_request_queries', 'SQL queries executed per request.', QUERY_BUCKETS),
+]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # one slot per bucket plus +Inf; cumulated when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def record_request(view, duration, sql_duration, queries):
+    with _lock:
+        if view not in _histograms:
+            _histograms[view] = [Histogram(buckets) for _, _, buckets in HISTOGRAMS]
+        for histogram, value in zip(_histograms[view], (duration, sql_duration, queries)):
+            histogram.observe(value)
+
+
+def reset_metrics():
+    with _lock:
+        _histograms.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    with _lock:
+        snapshot = {
+            view: [(list(histogram.counts), histogram.sum) for histogram in histograms]
+            for view, histograms in _histograms.items()
+        }
+    lines = []
+    for index, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view in sorted(snapshot):
+            counts, total = snapshot[view][index]
+            view_label = f'view="{_label(view)}"'
+            cumulative = 0
+            for bound, count in zip(buckets + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{view_label},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{view_label}}} {_number(total)}')
+            lines.append(f'{name}_count{{{view_label}}} {cumulative}')
+
+    lines.append('# HELP healthcheck_dashboard_cache_total Dashboard cache lookups by kind and outcome.')
+    lines.append('# TYPE healthcheck_dashboard_cache_total counter')
+    for stat, count in sorted(cache_stats().items()):
+        kind, _, outcome = stat.rpartition('_')
+        lines.append(f'healthcheck_dashboard_cache_total{{kind="{_label(kind)}",outcome="{_label(outcome)}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,128 @@
+import threading
+import time
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.functional import SimpleLazyObject
+
+from .access import aget_access_scope, get_access_scope
+from .metrics import record_request
+
+
+# the timer of the request being handled; sync_to_async copies it into worker threads, so
+# queries an async view runs elsewhere are still counted against its request
+_current_timer = ContextVar('request_query_timer', default=None)
+
+
+# counts and times the SQL statements of one request, possibly from several threads
+class _QueryTimer:
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.duration += duration
+
+
+# execute wrapper installed on every database connection; a no-op outside a request
+def _time_query(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.add(time.perf_counter() - start)
+
+
+def _install_query_timer(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+# records wall time, SQL count and SQL time of each request, adds them as a Server-Timing
+# header and feeds the per-URL-name histograms served by the metrics view. Streaming
+# responses are measured up to the point the view returns. Works under WSGI and ASGI.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_query_timer, dispatch_uid='healthcheck_query_timer')
+        for connection in connections.all(initialized_only=True):
+            _install_query_timer(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        token = _current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        return self._finish(request, response, time.perf_counter() - start, timer)
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        token = _current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        return self._finish(request, response, time.perf_counter() - start, timer)
+
+    def _finish(self, request, response, duration, timer):
+        match = request.resolver_match
+        record_request(match.view_name if match else 'unmatched', duration, timer.duration, timer.queries)
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={timer.duration * 1000:.1f};desc="{timer.queries} queries"'
+        )
+        return response
+
+
+async def _aaccess_scope(request):
+    if not hasattr(request, '_aaccess_scope'):
+        request._aaccess_scope = await aget_access_scope(await request.auser())
+    return request._aaccess_scope
+
+
+# attaches the user's AccessScope (role, own department, teams and what they may see) as
+# request.access_scope, resolved on first use, and as the coroutine request.aaccess_scope()
+# for async views; not request.scope, which ASGIRequest keeps for the ASGI connection dict
+# it reads the scheme from; must come after AuthenticationMiddleware
+class AccessScopeMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._attach(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._attach(request)
+        return await self.get_response(request)
+
+    def _attach(self, request):
+        request.access_scope = SimpleLazyObject(lambda: get_access_scope(request.user))
+        request.aaccess_scope = partial(_aaccess_scope, request)
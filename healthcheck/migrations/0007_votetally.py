@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Case, When
+
+
+def populate_tallies(apps, schema_editor):
+    Vote = apps.get_model('healthcheck', 'Vote')
+    VoteTally = apps.get_model('healthcheck', 'VoteTally')
+    aggregation = Vote.objects.values('session_id', 'team_id', 'card_type').annotate(
+        good=Count(Case(When(vote='good', then=1))),
+        neutral=Count(Case(When(vote='neutral', then=1))),
+        needs_improvement=Count(Case(When(vote='needs_improvement', then=1))),
+        improving=Count(Case(When(progress='improving', then=1))),
+        stable=Count(Case(When(progress='stable', then=1))),
+        declining=Count(Case(When(progress='declining', then=1))),
+        total=Count('id')
+    ).order_by()
+    VoteTally.objects.bulk_create([
+        VoteTally(
+            session_id=row['session_id'],
+            team_id=row['team_id'],
+            card_type=row['card_type'],
+            good_count=row['good'],
+            neutral_count=row['neutral'],
+            needs_improvement_count=row['needs_improvement'],
+            improving_count=row['improving'],
+            stable_count=row['stable'],
+            declining_count=row['declining'],
+            total_votes=row['total'],
+        )
+        for row in aggregation
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcheck', '0006_alter_vote_card_type_alter_vote_vote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_type', models.CharField(choices=[('code_quality', 'Code Quality'), ('requirements_clarity', 'Requirements Clarity'), ('testing_coverage', 'Testing Coverage'), ('deployment_process', 'Deployment Process'), ('tooling_infrastructure', 'Tooling & Infrastructure'), ('team_collaboration', 'Team Collaboration'), ('delivery_predictability', 'Delivery Predictability'), ('stakeholder_communication', 'Stakeholder Communication'), ('knowledge_sharing', 'Knowledge Sharing'), ('workload_balance', 'Workload Balance')], max_length=30)),
+                ('good_count', models.PositiveIntegerField(default=0)),
+                ('neutral_count', models.PositiveIntegerField(default=0)),
+                ('needs_improvement_count', models.PositiveIntegerField(default=0)),
+                ('improving_count', models.PositiveIntegerField(default=0)),
+                ('stable_count', models.PositiveIntegerField(default=0)),
+                ('declining_count', models.PositiveIntegerField(default=0)),
+                ('total_votes', models.PositiveIntegerField(default=0)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='healthcheck.healthchecksession')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='healthcheck.team')),
+            ],
+            options={
+                'unique_together': {('session', 'team', 'card_type')},
+            },
+        ),
+        migrations.RunPython(populate_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+# copies each vote's team department onto the new column in id ranges, so the department
+# dashboards can read it as soon as the migration has run
+def backfill_vote_departments(apps, schema_editor):
+    Team = apps.get_model('healthcheck', 'Team')
+    Vote = apps.get_model('healthcheck', 'Vote')
+
+    max_id = Vote.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    team_department = Subquery(Team.objects.filter(pk=OuterRef('team_id')).values('department_id')[:1])
+    for start in range(0, max_id, 5000):
+        Vote.objects.filter(id__gt=start, id__lte=start + 5000).update(department_id=team_department)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcheck', '0007_votetally'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='department',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='votes', to='healthcheck.department'),
+        ),
+        migrations.RunPython(backfill_vote_departments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['team', 'session', 'card_type', 'vote', 'progress'], name='vote_team_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['department', 'session', 'card_type', 'vote', 'progress'], name='vote_dept_session_idx'),
+        ),
+    ]
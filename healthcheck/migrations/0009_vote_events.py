@@ -0,0 +1,66 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# one event per existing vote, at the time it was last changed, so the log starts out in
+# step with the Vote table; the consumer's offset is set past them
+def backfill_vote_events(apps, schema_editor):
+    Vote = apps.get_model('healthcheck', 'Vote')
+    VoteEvent = apps.get_model('healthcheck', 'VoteEvent')
+    ConsumerOffset = apps.get_model('healthcheck', 'ConsumerOffset')
+
+    batch = []
+    columns = ('user_id', 'team_id', 'session_id', 'card_type', 'vote', 'progress', 'comments')
+    votes = Vote.objects.order_by('updated_at', 'id').values_list(*columns, 'updated_at')
+    for *values, updated_at in votes.iterator(chunk_size=2000):
+        batch.append(VoteEvent(**dict(zip(columns, values)), created_at=updated_at))
+        if len(batch) == 2000:
+            VoteEvent.objects.bulk_create(batch)
+            batch = []
+    VoteEvent.objects.bulk_create(batch)
+
+    last_event = VoteEvent.objects.order_by('-id').first()
+    ConsumerOffset.objects.create(name='votes', last_event_id=last_event.id if last_event else 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcheck', '0008_vote_department_and_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumerOffset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_type', models.CharField(choices=[('code_quality', 'Code Quality'), ('requirements_clarity', 'Requirements Clarity'), ('testing_coverage', 'Testing Coverage'), ('deployment_process', 'Deployment Process'), ('tooling_infrastructure', 'Tooling & Infrastructure'), ('team_collaboration', 'Team Collaboration'), ('delivery_predictability', 'Delivery Predictability'), ('stakeholder_communication', 'Stakeholder Communication'), ('knowledge_sharing', 'Knowledge Sharing'), ('workload_balance', 'Workload Balance')], max_length=30)),
+                ('vote', models.CharField(choices=[('good', 'Good'), ('neutral', 'Neutral'), ('needs_improvement', 'Needs Improvement')], max_length=30)),
+                ('progress', models.CharField(choices=[('improving', 'Improving'), ('stable', 'Stable'), ('declining', 'Declining')], max_length=20)),
+                ('comments', models.TextField(blank=True, null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_events', to='healthcheck.healthchecksession')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='healthcheck.team')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['session', 'created_at'], name='voteevent_session_time_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_vote_events, migrations.RunPython.noop),
+    ]
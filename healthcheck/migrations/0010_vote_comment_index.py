@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+# the FTS5 index over vote comments and the triggers keeping it in step, as they stood when
+# this migration was written; only rows with a comment are indexed
+INDEX_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS healthcheck_vote_fts USING fts5(
+        comments, content='healthcheck_vote', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS healthcheck_vote_fts_insert AFTER INSERT ON healthcheck_vote
+    WHEN new.comments <> '' BEGIN
+        INSERT INTO healthcheck_vote_fts(rowid, comments) VALUES (new.id, new.comments);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS healthcheck_vote_fts_delete AFTER DELETE ON healthcheck_vote
+    WHEN old.comments <> '' BEGIN
+        INSERT INTO healthcheck_vote_fts(healthcheck_vote_fts, rowid, comments) VALUES ('delete', old.id, old.comments);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS healthcheck_vote_fts_update AFTER UPDATE OF comments ON healthcheck_vote
+    WHEN old.comments IS NOT new.comments BEGIN
+        INSERT INTO healthcheck_vote_fts(healthcheck_vote_fts, rowid, comments)
+            SELECT 'delete', old.id, old.comments WHERE old.comments <> '';
+        INSERT INTO healthcheck_vote_fts(rowid, comments)
+            SELECT new.id, new.comments WHERE new.comments <> '';
+    END""",
+    "INSERT INTO healthcheck_vote_fts(rowid, comments) SELECT id, comments FROM healthcheck_vote WHERE comments <> ''",
+    "INSERT INTO healthcheck_vote_fts(healthcheck_vote_fts) VALUES ('optimize')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS healthcheck_vote_fts_insert",
+    "DROP TRIGGER IF EXISTS healthcheck_vote_fts_delete",
+    "DROP TRIGGER IF EXISTS healthcheck_vote_fts_update",
+    "DROP TABLE IF EXISTS healthcheck_vote_fts",
+]
+
+
+def _run(schema_editor, statements):
+    # FTS5 exists on SQLite only; other databases search comments with LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_index(apps, schema_editor):
+    _run(schema_editor, INDEX_SQL)
+
+
+def drop_index(apps, schema_editor):
+    _run(schema_editor, DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcheck', '0009_vote_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
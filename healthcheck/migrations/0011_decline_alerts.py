@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcheck', '0010_vote_comment_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeclineAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_type', models.CharField(choices=[('code_quality', 'Code Quality'), ('requirements_clarity', 'Requirements Clarity'), ('testing_coverage', 'Testing Coverage'), ('deployment_process', 'Deployment Process'), ('tooling_infrastructure', 'Tooling & Infrastructure'), ('team_collaboration', 'Team Collaboration'), ('delivery_predictability', 'Delivery Predictability'), ('stakeholder_communication', 'Stakeholder Communication'), ('knowledge_sharing', 'Knowledge Sharing'), ('workload_balance', 'Workload Balance')], max_length=30)),
+                ('previous_good_share', models.FloatField()),
+                ('good_share', models.FloatField()),
+                ('previous_needs_improvement_share', models.FloatField()),
+                ('needs_improvement_share', models.FloatField()),
+                ('previous_total_votes', models.PositiveIntegerField()),
+                ('total_votes', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('previous_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='healthcheck.healthchecksession')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='decline_alerts', to='healthcheck.healthchecksession')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='decline_alerts', to='healthcheck.team')),
+            ],
+            options={
+                'unique_together': {('team', 'session', 'card_type')},
+            },
+        ),
+    ]
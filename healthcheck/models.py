@@ -2,7 +2,8 @@
 # Oliver Bryan, Smaran Holkar, Aaron Madhok, Michael Robinson, Ibrahim Warsame 
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -57,6 +58,11 @@ class Team(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # votes copy the team's department, and are re-pointed in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class HealthCheckSession(models.Model):
     name = models.CharField(max_length=100)
     start_date = models.DateField()
@@ -112,6 +118,17 @@ class Vote(models.Model):
     
     # vote is linked to a health check session
     session = models.ForeignKey(HealthCheckSession, on_delete=models.CASCADE)
+
+    # copy of team.department so department queries need no join; kept in sync on save
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.SET_NULL,
+        related_name='votes',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
     card_type = models.CharField(max_length=30, choices=CARD_TYPES)
     vote = models.CharField(max_length=30, choices=VOTE_CHOICES)
     progress = models.CharField(max_length=20, choices=PROGRESS_CHOICES)
@@ -121,7 +138,94 @@ class Vote(models.Model):
 
     class Meta:
         unique_together = ['user', 'team', 'session', 'card_type']
+        # covering indexes for the per-team and per-department session breakdowns
+        indexes = [
+            models.Index(fields=['team', 'session', 'card_type', 'vote', 'progress'], name='vote_team_session_idx'),
+            models.Index(fields=['department', 'session', 'card_type', 'vote', 'progress'], name='vote_dept_session_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.team.name} - {self.card_type} - {self.vote}"
-    
\ No newline at end of file
+
+    def save(self, *args, **kwargs):
+        self.department_id = self.team.department_id
+        # the tally signals run inside this transaction so counts never drift
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class VoteTally(models.Model):
+    # pre-summed vote counts per session, team and card, kept in step with Vote
+    session = models.ForeignKey(HealthCheckSession, on_delete=models.CASCADE, related_name='tallies')
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='tallies')
+    card_type = models.CharField(max_length=30, choices=Vote.CARD_TYPES)
+    good_count = models.PositiveIntegerField(default=0)
+    neutral_count = models.PositiveIntegerField(default=0)
+    needs_improvement_count = models.PositiveIntegerField(default=0)
+    improving_count = models.PositiveIntegerField(default=0)
+    stable_count = models.PositiveIntegerField(default=0)
+    declining_count = models.PositiveIntegerField(default=0)
+    total_votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['session', 'team', 'card_type']
+
+    def __str__(self):
+        return f"{self.team.name} - {self.session.name} - {self.card_type} ({self.total_votes})"
+    
+
+class VoteEvent(models.Model):
+    # append-only log of every vote submission; Vote holds the current state derived from it
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    session = models.ForeignKey(HealthCheckSession, on_delete=models.CASCADE, related_name='vote_events')
+    card_type = models.CharField(max_length=30, choices=Vote.CARD_TYPES)
+    vote = models.CharField(max_length=30, choices=Vote.VOTE_CHOICES)
+    progress = models.CharField(max_length=20, choices=Vote.PROGRESS_CHOICES)
+    comments = models.TextField(blank=True, null=True)
+    # the vote was deleted, e.g. in the admin; vote and progress repeat its last values
+    deleted = models.BooleanField(default=False)
+    # not auto_now_add, so events backfilled from existing votes keep their original time
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # a session's events up to a point in time, for reconstructing past tallies
+            models.Index(fields=['session', 'created_at'], name='voteevent_session_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.team.name} - {self.card_type} - {self.vote} @ {self.created_at}"
+
+
+class ConsumerOffset(models.Model):
+    # id of the last vote event each incremental consumer has processed
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
+
+
+class DeclineAlert(models.Model):
+    # a team's card whose share of good votes fell sharply since the session before (by start
+    # date); kept up to date by the refresh_decline_alerts command
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='decline_alerts')
+    session = models.ForeignKey(HealthCheckSession, on_delete=models.CASCADE, related_name='decline_alerts')
+    previous_session = models.ForeignKey(HealthCheckSession, on_delete=models.CASCADE, related_name='+')
+    card_type = models.CharField(max_length=30, choices=Vote.CARD_TYPES)
+    # percentages of each session's votes on the card
+    previous_good_share = models.FloatField()
+    good_share = models.FloatField()
+    previous_needs_improvement_share = models.FloatField()
+    needs_improvement_share = models.FloatField()
+    previous_total_votes = models.PositiveIntegerField()
+    total_votes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['team', 'session', 'card_type']
+
+    def __str__(self):
+        return f"{self.team.name} - {self.session.name} - {self.card_type}: {self.previous_good_share}% -> {self.good_share}% good"
@@ -0,0 +1,142 @@
+# creates users with their profile and team membership in bulk, for onboarding whole
+# organisations from a CSV file or a generated list
+
+import csv
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Department, Team, TeamMembership, UserProfile
+
+
+PROVISION_COLUMNS = ['username', 'email', 'first_name', 'last_name', 'role', 'team', 'department']
+ROLE_VALUES = {code for code, _ in UserProfile.ROLES}
+NO_TEAM_ROLES = ['seniorManager', 'departmentLeader']
+
+
+def read_user_csv(file):
+    for row in csv.DictReader(file):
+        yield {column: (row.get(column) or '').strip() for column in PROVISION_COLUMNS}
+
+
+# N engineers per team, named like populate_engineers.py (eng1, eng2, ...)
+def generated_users(teams, per_team, prefix='eng'):
+    number = 0
+    for team in teams:
+        for _ in range(per_team):
+            number += 1
+            yield {
+                'username': f"{prefix}{number}",
+                'email': f"{prefix}{number}@{prefix}{number}.com",
+                'first_name': f"{prefix.title()}{number}",
+                'last_name': 'User',
+                'role': 'engineer',
+                'team': team.name,
+                # team names repeat across departments, so each row names the team's department
+                'department': team.department.name if team.department_id else '',
+            }
+
+
+# a team by name within the row's department, or by name alone when no other team has it
+def _team(name, department, teams, teams_by_name):
+    if department:
+        team = teams.get((department.id, name))
+        if team is None and name in teams_by_name:
+            return None, f"team '{name}' does not belong to department '{department.name}'"
+        return team, None
+    matches = teams_by_name.get(name, [])
+    if len(matches) > 1:
+        return None, f"team '{name}' exists in several departments; give its department"
+    return (matches[0] if matches else None), None
+
+
+# checks one row against the same rules as CustomUserCreationForm; returns
+# (team, department, error) with teams and departments looked up by name
+def _resolve(row, teams, teams_by_name, departments):
+    if not row['username']:
+        return None, None, "username is required"
+    role = row['role'] or 'engineer'
+    if role not in ROLE_VALUES:
+        return None, None, f"unknown role '{role}'"
+
+    team = department = None
+    if row['department'] and role != 'seniorManager':
+        department = departments.get(row['department'])
+        if department is None:
+            return None, None, f"unknown department '{row['department']}'"
+    if role not in NO_TEAM_ROLES:
+        team, error = _team(row['team'], department, teams, teams_by_name)
+        if error:
+            return None, None, error
+        if team is None:
+            return None, None, f"unknown team '{row['team']}'" if row['team'] else "team is required for this role"
+    if role == 'departmentLeader' and department is None:
+        return None, None, "department is required for this role"
+    return team, department, None
+
+
+def _existing_usernames(usernames, batch_size):
+    existing = set()
+    for start in range(0, len(usernames), batch_size):
+        existing.update(User.objects.filter(
+            username__in=usernames[start:start + batch_size]
+        ).values_list('username', flat=True))
+    return existing
+
+
+# password is hashed once and shared by every new account; without one the accounts get an
+# unusable password and need a reset before first login. Existing usernames are skipped.
+# Returns {'created', 'skipped', 'errors': [(row_number, username, message)]}.
+def provision_users(rows, password=None, batch_size=1000):
+    rows = list(rows)
+    teams = {}
+    teams_by_name = {}
+    for team in Team.objects.select_related('department'):
+        teams[(team.department_id, team.name)] = team
+        teams_by_name.setdefault(team.name, []).append(team)
+    departments = {department.name: department for department in Department.objects.all()}
+    existing = _existing_usernames([row['username'] for row in rows if row['username']], batch_size)
+    password_hash = make_password(password or None)
+
+    result = {'created': 0, 'skipped': 0, 'errors': []}
+    pending = []
+    for number, row in enumerate(rows, start=1):
+        if row['username'] in existing:
+            result['skipped'] += 1
+            continue
+        team, department, error = _resolve(row, teams, teams_by_name, departments)
+        if error:
+            result['errors'].append((number, row['username'], error))
+            continue
+        existing.add(row['username'])
+        pending.append((row, team, department))
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=row['username'],
+                    email=row['email'],
+                    first_name=row['first_name'],
+                    last_name=row['last_name'],
+                    password=password_hash,
+                )
+                for row, _, _ in batch
+            ])
+            UserProfile.objects.bulk_create([
+                UserProfile(
+                    user_id=user.id,
+                    role=row['role'] or 'engineer',
+                    department_id=department.id if department else None,
+                )
+                for user, (row, _, department) in zip(users, batch)
+            ])
+            TeamMembership.objects.bulk_create([
+                TeamMembership(user_id=user.id, team_id=team.id)
+                for user, (_, team, _) in zip(users, batch)
+                if team is not None
+            ])
+        result['created'] += len(batch)
+    return result
@@ -0,0 +1,122 @@
+# process-wide cache of slow-changing reference data: departments with their teams, health
+# check sessions and the card catalogue
+#
+# the data lives in Django's cache under a version counter that Department, Team and
+# HealthCheckSession signals bump on commit; each process also keeps the current version in
+# memory, so a request normally costs one cache lookup and no queries. The cached model
+# instances are shared between requests and must not be modified.
+
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Department, HealthCheckSession, Team, Vote
+
+
+VERSION_KEY = 'hc:ref:ver'
+DATA_KEY = 'hc:ref:data'
+
+_memo = (None, None, 0)
+_memo_lock = threading.Lock()
+
+
+def _by_id(objects, object_id):
+    try:
+        return objects.get(int(object_id))
+    except (TypeError, ValueError):
+        return None
+
+
+class ReferenceData:
+    def __init__(self, departments, teams, sessions):
+        self.departments = departments
+        self.teams = teams
+        self.sessions = sessions
+        self.cards = Vote.CARD_TYPES
+        self.department_by_id = {department.id: department for department in departments}
+        self.team_by_id = {team.id: team for team in teams}
+        self.session_by_id = {session.id: session for session in sessions}
+        self.teams_by_department = {}
+        for team in teams:
+            if team.department_id is not None:
+                self.teams_by_department.setdefault(team.department_id, []).append(team)
+        # {department id: [{'id', 'name'}, ...]} as used by the registration page's team picker
+        self.teams_by_department_json = json.dumps({
+            str(department_id): [{'id': team.id, 'name': team.name} for team in department_teams]
+            for department_id, department_teams in self.teams_by_department.items()
+        })
+
+    # departments by name, teams by name with their department, sessions newest first
+    @classmethod
+    def load(cls):
+        return cls(
+            list(Department.objects.order_by('name', 'id')),
+            list(Team.objects.select_related('department').order_by('name', 'id')),
+            list(HealthCheckSession.objects.order_by('-start_date', '-id')),
+        )
+
+    # lookups by (possibly string) id; None when unknown or not a number
+    def department(self, department_id):
+        return _by_id(self.department_by_id, department_id)
+
+    def team(self, team_id):
+        return _by_id(self.team_by_id, team_id)
+
+    def session(self, session_id):
+        return _by_id(self.session_by_id, session_id)
+
+    def department_teams(self, department_id):
+        return self.teams_by_department.get(department_id, [])
+
+    @property
+    def latest_session(self):
+        return self.sessions[0] if self.sessions else None
+
+    @property
+    def sessions_oldest_first(self):
+        return self.sessions[::-1]
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from the clock so a lost counter never comes back to an old version
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_reference_data():
+    global _memo
+    version = _version()
+    with _memo_lock:
+        memo_version, data, loaded_at = _memo
+    # the memo expires with the cached copy, so a per-process cache still picks up changes
+    # made by other processes, whose bumps it never sees
+    if memo_version == version and time.monotonic() - loaded_at < settings.REFERENCE_CACHE_TIMEOUT:
+        return data
+
+    key = f'{DATA_KEY}:{version}'
+    data = cache.get(key)
+    if data is None:
+        data = ReferenceData.load()
+        cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+    with _memo_lock:
+        _memo = (version, data, time.monotonic())
+    return data
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+# called when departments, teams or sessions change, including bulk writes that skip signals
+def invalidate():
+    transaction.on_commit(_bump)
@@ -0,0 +1,155 @@
+# full-text search over vote comments
+#
+# on SQLite the comments are indexed in an FTS5 table over healthcheck_vote, kept in step by
+# triggers, so saves, deletes, bulk upserts and raw updates are all covered without any
+# Python code on the write path. Matches are ranked with bm25 and come with a snippet.
+# Other databases fall back to a case-insensitive LIKE, unranked.
+
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Vote
+
+
+VOTE_TABLE = Vote._meta.db_table
+INDEX_TABLE = 'healthcheck_vote_fts'
+
+# snippet highlight markers, swapped for <mark> tags once the text has been escaped
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+SNIPPET_CHARS = 120
+
+# only rows with a comment are indexed, so the index stays small while most votes have none
+INDEX_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(
+        comments, content='{VOTE_TABLE}', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_insert AFTER INSERT ON {VOTE_TABLE}
+    WHEN new.comments <> '' BEGIN
+        INSERT INTO {INDEX_TABLE}(rowid, comments) VALUES (new.id, new.comments);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_delete AFTER DELETE ON {VOTE_TABLE}
+    WHEN old.comments <> '' BEGIN
+        INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, comments) VALUES ('delete', old.id, old.comments);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_update AFTER UPDATE OF comments ON {VOTE_TABLE}
+    WHEN old.comments IS NOT new.comments BEGIN
+        INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, comments)
+            SELECT 'delete', old.id, old.comments WHERE old.comments <> '';
+        INSERT INTO {INDEX_TABLE}(rowid, comments)
+            SELECT new.id, new.comments WHERE new.comments <> '';
+    END""",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {INDEX_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {INDEX_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {INDEX_TABLE}_update",
+    f"DROP TABLE IF EXISTS {INDEX_TABLE}",
+]
+
+
+def comment_index_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+# True when the index table exists but some of its triggers do not, as after a migration that
+# rebuilt the vote table: Django recreates a table to alter it on SQLite, dropping its triggers
+def comment_index_missing_triggers(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE tbl_name IN (%s, %s)", [INDEX_TABLE, VOTE_TABLE]
+        )
+        found = {name for kind, name in cursor.fetchall() if kind in ('table', 'trigger')}
+    triggers = {f'{INDEX_TABLE}_insert', f'{INDEX_TABLE}_delete', f'{INDEX_TABLE}_update'}
+    return INDEX_TABLE in found and not triggers <= found
+
+
+# creates the index table and its triggers where missing, then reindexes every comment;
+# returns how many votes have one. Django rebuilds a table to alter it on SQLite, which drops
+# its triggers, so this is also what restores them after such a migration
+def rebuild_comment_index(using=connection):
+    with using.cursor() as cursor:
+        for statement in INDEX_SQL:
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}(rowid, comments) "
+            f"SELECT id, comments FROM {VOTE_TABLE} WHERE comments <> ''"
+        )
+        indexed = cursor.rowcount
+        cursor.execute(f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def drop_comment_index(using=connection):
+    with using.cursor() as cursor:
+        for statement in DROP_SQL:
+            cursor.execute(statement)
+
+
+def _words(query):
+    return re.findall(r'\w+', query or '')
+
+
+# the words of a search as an FTS5 query matching all of them; each is quoted so operators
+# and punctuation in the input are taken literally, and the last also matches as a prefix
+def match_expression(query):
+    terms = [f'"{word}"' for word in _words(query)]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+# ids of the votes whose comments match, as a subquery for id__in
+def matching_vote_ids(query):
+    return RawSQL(f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s", [match_expression(query)])
+
+
+# the votes among `votes` whose comments match every word of `query`, best match first; on
+# SQLite each carries its bm25 `rank` (lower is better) and a `snippet` of the comment
+def search_comments(votes, query):
+    words = _words(query)
+    if not words:
+        return votes.none()
+    if not comment_index_available():
+        condition = Q()
+        for word in words:
+            condition &= Q(comments__icontains=word)
+        return votes.filter(condition).order_by('-updated_at', '-id')
+
+    return votes.extra(
+        select={
+            'rank': f'bm25({INDEX_TABLE})',
+            'snippet': f"snippet({INDEX_TABLE}, 0, %s, %s, '…', %s)",
+        },
+        select_params=[MARK_START, MARK_END, SNIPPET_TOKENS],
+        tables=[INDEX_TABLE],
+        where=[f'{INDEX_TABLE}.rowid = {VOTE_TABLE}.id', f'{INDEX_TABLE} MATCH %s'],
+        params=[match_expression(query)],
+    ).order_by('rank', '-id')
+
+
+# a found vote's comment around the matched words as HTML, with the words in <mark> tags
+def comment_snippet(vote, query):
+    snippet = getattr(vote, 'snippet', None)
+    if snippet is None:
+        snippet = _marked_excerpt(vote.comments or '', _words(query))
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+# the LIKE fallback's stand-in for snippet(): an excerpt around the first matched word
+def _marked_excerpt(text, words):
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE) if words else None
+    match = pattern.search(text) if pattern else None
+    start = max(0, match.start() - SNIPPET_CHARS // 2) if match else 0
+    excerpt = text[start:start + SNIPPET_CHARS]
+    if pattern:
+        excerpt = pattern.sub(lambda found: f'{MARK_START}{found.group()}{MARK_END}', excerpt)
+    return ('…' if start else '') + excerpt + ('…' if start + SNIPPET_CHARS < len(text) else '')
@@ -0,0 +1,130 @@
+# signal handlers that keep derived data in step with the core models
+
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import access, dashboard_cache, reference
+from .events import record_vote_change
+from .cube import loaded_cube
+from .models import Department, HealthCheckSession, Team, TeamMembership, UserProfile, Vote
+from .search import comment_index_available, comment_index_missing_triggers, rebuild_comment_index
+from .tallies import vote_tally_key, apply_vote_change
+
+
+# applies a change to this process's vote cube, if loaded, once the transaction commits
+def _update_cube(change):
+    def apply():
+        cube = loaded_cube()
+        if cube is not None:
+            change(cube)
+    transaction.on_commit(apply)
+
+
+# remembers what an existing vote counted towards before it is overwritten
+@receiver(pre_save, sender=Vote)
+def remember_previous_vote(sender, instance, raw=False, **kwargs):
+    instance._previous_tally_key = None
+    if raw or instance.pk is None:
+        return
+    previous = Vote.objects.filter(pk=instance.pk).values_list(
+        'session_id', 'team_id', 'card_type', 'vote', 'progress'
+    ).first()
+    instance._previous_tally_key = previous
+
+
+@receiver(post_save, sender=Vote)
+def update_tallies_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_tally_key', None)
+    current = vote_tally_key(instance)
+    apply_vote_change(previous, current)
+    _update_cube(lambda cube: cube.apply_vote_change(previous, current))
+
+    pairs = [(instance.team_id, instance.session_id)]
+    if previous:
+        pairs.append((previous[1], previous[0]))
+    dashboard_cache.invalidate_votes(instance.user_id, pairs)
+    record_vote_change(instance)
+
+
+@receiver(post_delete, sender=Vote)
+def update_tallies_on_delete(sender, instance, origin=None, **kwargs):
+    previous = vote_tally_key(instance)
+    apply_vote_change(previous, None)
+    _update_cube(lambda cube: cube.apply_vote_change(previous, None))
+    dashboard_cache.invalidate_votes(instance.user_id, [(instance.team_id, instance.session_id)])
+    # votes deleted along with their user, team or session take their events with them
+    deleting_votes = isinstance(origin, Vote) or getattr(origin, 'model', None) is Vote
+    if deleting_votes and not getattr(instance, '_from_event_log', False):
+        record_vote_change(instance, deleted=True)
+
+
+# remembers a team's department so its votes can follow it to a new one
+@receiver(pre_save, sender=Team)
+def remember_previous_department(sender, instance, raw=False, **kwargs):
+    instance._previous_department_id = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_department_id = Team.objects.filter(pk=instance.pk).values_list(
+        'department_id', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Team)
+def sync_vote_departments(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    if instance._previous_department_id != instance.department_id:
+        # updated_at moves too, as the votes changed
+        Vote.objects.filter(team=instance).update(
+            department_id=instance.department_id,
+            updated_at=timezone.now()
+        )
+        _update_cube(lambda cube: cube.set_team_department(instance.id, instance.department_id))
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def invalidate_team_dashboards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dashboard_cache.invalidate_team(instance.id)
+
+
+@receiver(post_save, sender=HealthCheckSession)
+@receiver(post_delete, sender=HealthCheckSession)
+def invalidate_session_dashboards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dashboard_cache.invalidate_session(instance.id)
+
+
+# fixture loads (raw) change reference data too, so they invalidate it as well
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+@receiver(post_save, sender=HealthCheckSession)
+@receiver(post_delete, sender=HealthCheckSession)
+def invalidate_reference_data(sender, instance, **kwargs):
+    reference.invalidate()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def invalidate_access_scope(sender, instance, **kwargs):
+    access.invalidate(instance.user_id)
+
+
+# restores the comment index triggers, and reindexes, when a migration rebuilt the vote table
+# on SQLite and so dropped them
+@receiver(post_migrate)
+def restore_comment_index_triggers(sender, using='default', **kwargs):
+    if sender.name != 'healthcheck':
+        return
+    connection = connections[using]
+    if comment_index_available(connection) and comment_index_missing_triggers(connection):
+        rebuild_comment_index(connection)
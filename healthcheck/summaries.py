@@ -0,0 +1,379 @@
+# dashboard summaries: turns tally rows into the plain dicts the templates and charts use
+
+from django.conf import settings
+from django.db.models import Count, Case, When, Sum
+
+from .cube import CARD_CODES, CARD_POSITIONS, VOTE_POSITIONS, get_cube
+from .models import Department, Vote, VoteTally
+from .tallies import TALLY_FIELDS, card_results
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# one row per card type, with the card's result dict or None when nobody voted on it
+def card_display_data(results_dict):
+    return [
+        {'code': code, 'name': name, 'result': results_dict.get(code)}
+        for code, name in Vote.CARD_TYPES
+    ]
+
+
+# chart labels and stacked percentage datasets for a list of card display rows
+def chart_data(display_data):
+    chart_labels, chart_good_perc, chart_neutral_perc, chart_needsimp_perc = [], [], [], []
+
+    for item in display_data:
+        current_result = item['result']
+        chart_labels.append(item['name'])
+        if current_result and current_result.get('total_votes', 0) > 0:
+            total = float(current_result['total_votes'])
+            good = current_result.get('good_count', 0)
+            neutral = current_result.get('neutral_count', 0)
+            good_perc = round((good / total) * 100, 1)
+            neutral_perc = round((neutral / total) * 100, 1)
+            needs_imp_perc = round(100.0 - good_perc - neutral_perc, 1)
+            chart_good_perc.append(good_perc)
+            chart_neutral_perc.append(neutral_perc)
+            chart_needsimp_perc.append(needs_imp_perc)
+        else:
+            chart_good_perc.append(0); chart_neutral_perc.append(0); chart_needsimp_perc.append(0)
+
+    chart_datasets = [
+        {'label': '% Good', 'data': chart_good_perc, 'backgroundColor': '#28a745'},
+        {'label': '% Neutral', 'data': chart_neutral_perc, 'backgroundColor': '#ffc107'},
+        {'label': '% Needs Improvement', 'data': chart_needsimp_perc, 'backgroundColor': '#dc3545'},
+    ]
+    return chart_labels, chart_datasets
+
+
+# per-card results for one team and session, optionally limited to one user's votes
+def team_summary(team, session, user=None):
+    if user is not None:
+        # a user's own votes are few, so these are still counted from the raw table
+        vote_aggregation = Vote.objects.filter(
+            team=team,
+            session=session,
+            user=user
+        ).values('card_type').annotate(
+            good_count=Count(Case(When(vote='good', then=1))),
+            neutral_count=Count(Case(When(vote='neutral', then=1))),
+            needs_improvement_count=Count(Case(When(vote='needs_improvement', then=1))),
+            improving_count=Count(Case(When(progress='improving', then=1))),
+            stable_count=Count(Case(When(progress='stable', then=1))),
+            declining_count=Count(Case(When(progress='declining', then=1))),
+            total_votes=Count('id')
+        ).order_by('card_type')
+        results_dict = {item['card_type']: item for item in vote_aggregation}
+    elif settings.DASHBOARD_SUMMARY_SOURCE == 'cube':
+        cube = get_cube()
+        results_dict = cube.results_dict(cube.team_counts(team.id, session.id))
+    else:
+        results_dict = card_results(VoteTally.objects.filter(team=team, session=session))
+
+    return {'display_data': card_display_data(results_dict)}
+
+
+# per-card results for one department plus vote totals for every other department
+def department_summary(department, session):
+    if settings.DASHBOARD_SUMMARY_SOURCE == 'cube':
+        own_results, other_totals = _department_results_from_cube(department, session)
+    else:
+        own_results, other_totals = _department_results_from_tallies(department, session)
+
+    display_data = card_display_data(own_results)
+    chart_labels, chart_datasets = chart_data(display_data)
+    return {
+        'display_data': display_data,
+        'chart_labels': chart_labels,
+        'chart_datasets': chart_datasets,
+        'other_departments': [
+            {'department_name': name, 'summary': summary}
+            for name, summary in other_totals.items()
+        ],
+    }
+
+
+# both halves of the department summary from a single query grouped by department and card
+def _department_results_from_tallies(department, session):
+    rows = VoteTally.objects.filter(
+        session=session,
+        team__department__isnull=False
+    ).values(
+        'team__department_id', 'team__department__name', 'card_type'
+    ).annotate(
+        **{f'sum_{field}': Sum(field) for field in TALLY_FIELDS}
+    ).order_by('team__department__name', 'card_type')
+
+    own_results = {}
+    other_totals = {}
+    for row in rows:
+        if not row['sum_total_votes']:
+            continue
+        if row['team__department_id'] == department.id:
+            result = {'card_type': row['card_type']}
+            for field in TALLY_FIELDS:
+                result[field] = row[f'sum_{field}']
+            own_results[row['card_type']] = result
+            continue
+
+        summary = other_totals.setdefault(row['team__department__name'], _empty_department_totals())
+        summary['total_good'] += row['sum_good_count']
+        summary['total_neutral'] += row['sum_neutral_count']
+        summary['total_needs_improvement'] += row['sum_needs_improvement_count']
+        summary['total_dept_votes'] += row['sum_total_votes']
+
+    return own_results, other_totals
+
+
+def _department_results_from_cube(department, session):
+    cube = get_cube()
+    own_results = cube.results_dict(cube.department_counts(department.id, session.id))
+
+    totals = cube.department_vote_totals(session.id)
+    other_totals = {}
+    for department_id, name in Department.objects.filter(
+        id__in=[department_id for department_id, vote_totals in totals.items() if vote_totals.sum()]
+    ).exclude(id=department.id).order_by('name').values_list('id', 'name'):
+        good, neutral, needs_improvement = (int(total) for total in totals[department_id])
+        other_totals[name] = {
+            'total_good': good,
+            'total_neutral': neutral,
+            'total_needs_improvement': needs_improvement,
+            'total_dept_votes': good + neutral + needs_improvement,
+        }
+    return own_results, other_totals
+
+
+def _empty_department_totals():
+    return {
+        'total_good': 0,
+        'total_neutral': 0,
+        'total_needs_improvement': 0,
+        'total_dept_votes': 0,
+    }
+
+
+# good/neutral/needs-improvement counts per session and card for a team or a department,
+# from one query grouped by session and card: {session_id: {card_type: counts}}
+def session_card_counts(session_ids, team=None, department=None):
+    results = {session_id: {} for session_id in session_ids}
+    if not session_ids:
+        return results
+
+    tallies = VoteTally.objects.filter(session_id__in=session_ids)
+    if team is not None:
+        tallies = tallies.filter(team=team)
+    else:
+        tallies = tallies.filter(team__department=department)
+
+    rows = tallies.values('session_id', 'card_type').annotate(
+        good_count=Sum('good_count'),
+        neutral_count=Sum('neutral_count'),
+        needs_improvement_count=Sum('needs_improvement_count'),
+        total=Sum('total_votes'),
+    ).order_by()
+    for row in rows:
+        results[row['session_id']][row['card_type']] = {
+            'good_count': row['good_count'],
+            'neutral_count': row['neutral_count'],
+            'needs_improvement_count': row['needs_improvement_count'],
+            'total_votes': row['total'],
+        }
+    return results
+
+
+# good/neutral/needs-improvement counts per session, department and card across the whole
+# organisation, from one query grouped by all three: {session_id: {department_id: {card_type: counts}}}
+def org_card_counts(session_ids):
+    results = {session_id: {} for session_id in session_ids}
+    if not session_ids:
+        return results
+
+    if settings.DASHBOARD_SUMMARY_SOURCE == 'cube':
+        cube = get_cube()
+        for session_id in session_ids:
+            for department_id, cells in cube.department_card_vote_counts(session_id).items():
+                results[session_id][department_id] = {
+                    code: _vote_counts(*(int(count) for count in cells[position]))
+                    for position, code in enumerate(CARD_CODES) if cells[position].any()
+                }
+        return results
+
+    rows = VoteTally.objects.filter(
+        session_id__in=session_ids,
+        team__department__isnull=False
+    ).values('session_id', 'team__department_id', 'card_type').annotate(
+        good_count=Sum('good_count'),
+        neutral_count=Sum('neutral_count'),
+        needs_improvement_count=Sum('needs_improvement_count'),
+    ).order_by()
+    for row in rows:
+        counts = _vote_counts(row['good_count'], row['neutral_count'], row['needs_improvement_count'])
+        if counts['total_votes']:
+            results[row['session_id']].setdefault(row['team__department_id'], {})[row['card_type']] = counts
+    return results
+
+
+def _vote_counts(good, neutral, needs_improvement):
+    return {
+        'good_count': good,
+        'neutral_count': neutral,
+        'needs_improvement_count': needs_improvement,
+        'total_votes': good + neutral + needs_improvement,
+    }
+
+
+def _percentage(count, total):
+    return round(count / total * 100, 1) if total else None
+
+
+# good-vote share of every team of a department on every card for one session, from a single
+# read of the department's tallies (or a slice of the vote cube) pivoted into a teams x cards
+# grid, with per-team and per-card totals; `teams` fixes the row order. Shares are
+# percentages, None where nobody voted
+def department_heatmap(department, session, teams):
+    team_ids = [team.id for team in teams]
+    if settings.DASHBOARD_SUMMARY_SOURCE == 'cube':
+        counts = get_cube().team_card_vote_counts(team_ids, session.id)
+        good, total = counts[:, :, VOTE_POSITIONS['good']], counts.sum(axis=2)
+    else:
+        rows = VoteTally.objects.filter(
+            session=session, team__department=department
+        ).values_list('team_id', 'card_type', 'good_count', 'total_votes').order_by()
+        good, total = _pivot_tallies(rows, team_ids)
+
+    if np is not None:
+        good, total = np.asarray(good), np.asarray(total)
+        cell_shares = _shares(good, total)
+        team_good, team_total = good.sum(axis=1).tolist(), total.sum(axis=1).tolist()
+        card_good, card_total = good.sum(axis=0).tolist(), total.sum(axis=0).tolist()
+        total = total.tolist()
+    else:
+        cell_shares = [[_percentage(*cell) for cell in zip(*pair)] for pair in zip(good, total)]
+        team_good, team_total = [sum(row) for row in good], [sum(row) for row in total]
+        card_good, card_total = [sum(column) for column in zip(*good)], [sum(column) for column in zip(*total)]
+
+    return {
+        'cards': [
+            {'code': code, 'name': name, 'good_share': _percentage(card_good[position], card_total[position]),
+             'total_votes': card_total[position]}
+            for position, (code, name) in enumerate(Vote.CARD_TYPES)
+        ],
+        'teams': [
+            {
+                'id': team.id,
+                'name': team.name,
+                'good_share': _percentage(team_good[row], team_total[row]),
+                'total_votes': team_total[row],
+                'cells': [
+                    {'good_share': share, 'total_votes': votes}
+                    for share, votes in zip(cell_shares[row], total[row])
+                ],
+            }
+            for row, team in enumerate(teams)
+        ],
+    }
+
+
+# (good, total) teams x cards grids from (team_id, card_type, good, total) tally rows; tallies
+# are unique per team, session and card, so each row fills one cell
+def _pivot_tallies(rows, team_ids):
+    team_positions = {team_id: position for position, team_id in enumerate(team_ids)}
+    rows = [row for row in rows if row[0] in team_positions and row[1] in CARD_POSITIONS]
+    if np is None:
+        good = [[0] * len(CARD_CODES) for _ in team_ids]
+        total = [[0] * len(CARD_CODES) for _ in team_ids]
+        for team_id, card_type, good_count, total_votes in rows:
+            good[team_positions[team_id]][CARD_POSITIONS[card_type]] = good_count
+            total[team_positions[team_id]][CARD_POSITIONS[card_type]] = total_votes
+        return good, total
+
+    good = np.zeros((len(team_ids), len(CARD_CODES)), dtype=np.int64)
+    total = np.zeros_like(good)
+    if rows:
+        team_column, card_column, good_column, total_column = zip(*rows)
+        cells = (
+            np.fromiter(map(team_positions.__getitem__, team_column), dtype=np.int64, count=len(rows)),
+            np.fromiter(map(CARD_POSITIONS.__getitem__, card_column), dtype=np.int64, count=len(rows)),
+        )
+        good[cells] = good_column
+        total[cells] = total_column
+    return good, total
+
+
+# percentages of good in total to one decimal, as nested lists with None for empty cells
+def _shares(good, total):
+    shares = np.round(np.divide(good * 100.0, total, out=np.zeros(good.shape), where=total > 0), 1)
+    return np.where(total > 0, shares, None).tolist()
+
+
+# per-card percentage series across sessions (ordered by start_date), ready for JSON and
+# Chart.js; a session with no votes on a card shows up as None
+def trend_summary(sessions, counts_by_session):
+    cards = []
+    for code, name in Vote.CARD_TYPES:
+        card = {'code': code, 'name': name, 'good': [], 'neutral': [], 'needs_improvement': [], 'total_votes': []}
+        for session in sessions:
+            counts = counts_by_session.get(session.id, {}).get(code)
+            total = counts['total_votes'] if counts else 0
+            card['total_votes'].append(total)
+            card['good'].append(_percentage(counts['good_count'], total) if counts else None)
+            card['neutral'].append(_percentage(counts['neutral_count'], total) if counts else None)
+            card['needs_improvement'].append(_percentage(counts['needs_improvement_count'], total) if counts else None)
+        cards.append(card)
+
+    return {
+        'sessions': [
+            {
+                'id': session.id,
+                'name': session.name,
+                'start_date': session.start_date.isoformat(),
+                'end_date': session.end_date.isoformat(),
+            }
+            for session in sessions
+        ],
+        'cards': cards,
+    }
+
+
+# good-vote shares of every department on every card across sessions (ordered by
+# start_date), plus each department's share over all cards; lists run parallel to
+# `sessions`, with None where nobody voted
+def org_overview(sessions, departments, counts_by_session):
+    rows = []
+    for department in departments:
+        per_session = [counts_by_session.get(session.id, {}).get(department.id, {}) for session in sessions]
+        cards = []
+        for code, _ in Vote.CARD_TYPES:
+            card_counts = [counts.get(code) for counts in per_session]
+            cards.append({
+                'code': code,
+                'good': [_percentage(counts['good_count'], counts['total_votes']) if counts else None for counts in card_counts],
+                'total_votes': [counts['total_votes'] if counts else 0 for counts in card_counts],
+            })
+        good = [sum(counts['good_count'] for counts in session_counts.values()) for session_counts in per_session]
+        total = [sum(counts['total_votes'] for counts in session_counts.values()) for session_counts in per_session]
+        rows.append({
+            'id': department.id,
+            'name': department.name,
+            'good': [_percentage(*pair) for pair in zip(good, total)],
+            'total_votes': total,
+            'cards': cards,
+        })
+
+    return {
+        'sessions': [
+            {
+                'id': session.id,
+                'name': session.name,
+                'start_date': session.start_date.isoformat(),
+                'end_date': session.end_date.isoformat(),
+            }
+            for session in sessions
+        ],
+        'cards': [{'code': code, 'name': name} for code, name in Vote.CARD_TYPES],
+        'departments': rows,
+    }
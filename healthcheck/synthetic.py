@@ -0,0 +1,134 @@
+# builds synthetic organisations (departments, teams, members, sessions, votes) for
+# benchmarks and load tests
+
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import reference
+from .events import consume_vote_events
+from .models import Department, HealthCheckSession, Team, TeamMembership, UserProfile, Vote, VoteEvent
+
+
+CARD_CODES = [code for code, _ in Vote.CARD_TYPES]
+VOTE_CODES = [code for code, _ in Vote.VOTE_CHOICES]
+PROGRESS_CODES = [code for code, _ in Vote.PROGRESS_CHOICES]
+
+
+# departments, teams, sessions and members with one TeamMembership each, in one transaction;
+# returns the created objects plus (user_id, team_id, department_id) for every membership
+def create_org_structure(departments=10, teams=200, members_per_team=5, sessions=50,
+                         label='synthetic', batch_size=5000):
+    with transaction.atomic():
+        department_objs = Department.objects.bulk_create([
+            Department(name=f"{label} Department {number}")
+            for number in range(1, departments + 1)
+        ])
+        team_objs = Team.objects.bulk_create([
+            Team(name=f"{label} Team {number}", department=department_objs[number % departments])
+            for number in range(1, teams + 1)
+        ])
+        session_objs = HealthCheckSession.objects.bulk_create([
+            HealthCheckSession(
+                name=f"{label} Session {number}",
+                start_date=date(2020, 1, 6) + timedelta(weeks=2 * number),
+                end_date=date(2020, 1, 10) + timedelta(weeks=2 * number),
+            )
+            for number in range(1, sessions + 1)
+        ])
+
+        # accounts get an unusable password, so no hashing is needed
+        users = User.objects.bulk_create([
+            User(username=f"{label}_user{number}", password=make_password(None))
+            for number in range(1, teams * members_per_team + 1)
+        ], batch_size=batch_size)
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user.id, role='engineer')
+            for user in users
+        ], batch_size=batch_size)
+        memberships = [
+            (user.id, team_objs[index // members_per_team].id, team_objs[index // members_per_team].department_id)
+            for index, user in enumerate(users)
+        ]
+        TeamMembership.objects.bulk_create([
+            TeamMembership(user_id=user_id, team_id=team_id)
+            for user_id, team_id, _ in memberships
+        ], batch_size=batch_size)
+        # bulk_create skips the signals that would normally do this
+        reference.invalidate()
+
+    return {
+        'departments': department_objs,
+        'teams': team_objs,
+        'sessions': session_objs,
+        'users': len(users),
+        'memberships': memberships,
+    }
+
+
+# yields lists of unsaved vote events; a member takes part in a session with probability
+# `participation` and then votes on every card, like a real card form submission.
+# Votes only go to the team of each (user_id, team_id, department_id) membership.
+def generate_votes(memberships, session_ids, participation, rng, batch_size=5000):
+    batch = []
+    for session_id in session_ids:
+        for user_id, team_id, _ in memberships:
+            if rng.random() >= participation:
+                continue
+            for card_type in CARD_CODES:
+                batch.append(VoteEvent(
+                    user_id=user_id,
+                    team_id=team_id,
+                    session_id=session_id,
+                    card_type=card_type,
+                    vote=rng.choice(VOTE_CODES),
+                    progress=rng.choice(PROGRESS_CODES),
+                ))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+# appends generated votes to the vote event log, one INSERT per batch, and consumes each
+# batch straight away whichever consumer is configured, so the votes, tallies and past
+# tallies all include them; `progress(written, elapsed_seconds)` is called after each batch
+def write_votes(batches, progress=None):
+    written = 0
+    start = time.perf_counter()
+    for batch in batches:
+        VoteEvent.objects.bulk_create(batch)
+        consume_vote_events(batch_size=len(batch))
+        written += len(batch)
+        if progress:
+            progress(written, time.perf_counter() - start)
+    return written
+
+
+# creates a whole organisation with votes
+def create_org(departments=10, teams=200, members_per_team=5, sessions=50, participation=0.7,
+               seed=0, label='synthetic', batch_size=5000, progress=None):
+    org = create_org_structure(
+        departments=departments,
+        teams=teams,
+        members_per_team=members_per_team,
+        sessions=sessions,
+        label=label,
+        batch_size=batch_size,
+    )
+    org['votes'] = write_votes(
+        generate_votes(
+            org['memberships'],
+            [session.id for session in org['sessions']],
+            participation,
+            random.Random(seed),
+            batch_size=batch_size,
+        ),
+        progress=progress,
+    )
+    return org
@@ -0,0 +1,124 @@
+# helpers for the VoteTally rollup table used by the dashboards
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Case, When, F, Q, Sum
+
+from .models import Vote, VoteTally
+
+
+# count columns on VoteTally, in the order the dashboards display them
+TALLY_FIELDS = [
+    'good_count',
+    'neutral_count',
+    'needs_improvement_count',
+    'improving_count',
+    'stable_count',
+    'declining_count',
+    'total_votes',
+]
+
+
+# the tally row and count columns a single vote contributes to
+def vote_tally_key(vote):
+    return (vote.session_id, vote.team_id, vote.card_type, vote.vote, vote.progress)
+
+
+# adjusts tally rows for one vote going from old_key to new_key (either may be None)
+def apply_vote_change(old_key, new_key):
+    if old_key == new_key:
+        return
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for key, step in ((old_key, -1), (new_key, 1)):
+        if key is None:
+            continue
+        session_id, team_id, card_type, vote_value, progress_value = key
+        row_deltas = deltas[(session_id, team_id, card_type)]
+        row_deltas[f'{vote_value}_count'] += step
+        row_deltas[f'{progress_value}_count'] += step
+        row_deltas['total_votes'] += step
+
+    with transaction.atomic():
+        for (session_id, team_id, card_type), row_deltas in deltas.items():
+            changes = {field: F(field) + step for field, step in row_deltas.items() if step}
+            if not changes:
+                continue
+            rows = VoteTally.objects.filter(session_id=session_id, team_id=team_id, card_type=card_type)
+            # only an added vote may create a row; removals during cascades must not recreate one
+            if any(step > 0 for step in row_deltas.values()):
+                VoteTally.objects.get_or_create(session_id=session_id, team_id=team_id, card_type=card_type)
+            rows.update(**changes)
+
+
+# recounts tally rows from the Vote table, optionally limited to some teams and sessions
+def rebuild_tallies(team_ids=None, session_ids=None):
+    votes = Vote.objects.all()
+    tallies = VoteTally.objects.all()
+    if team_ids is not None:
+        votes = votes.filter(team_id__in=team_ids)
+        tallies = tallies.filter(team_id__in=team_ids)
+    if session_ids is not None:
+        votes = votes.filter(session_id__in=session_ids)
+        tallies = tallies.filter(session_id__in=session_ids)
+    return _recount(votes, tallies)
+
+
+# recounts tally rows for specific (team_id, session_id) pairs, e.g. after a bulk write
+def refresh_tallies(pairs):
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    scope = Q()
+    for team_id, session_id in pairs:
+        scope |= Q(team_id=team_id, session_id=session_id)
+    return _recount(Vote.objects.filter(scope), VoteTally.objects.filter(scope))
+
+
+def _recount(votes, tallies):
+    aggregation = votes.values('session_id', 'team_id', 'card_type').annotate(
+        good=Count(Case(When(vote='good', then=1))),
+        neutral=Count(Case(When(vote='neutral', then=1))),
+        needs_improvement=Count(Case(When(vote='needs_improvement', then=1))),
+        improving=Count(Case(When(progress='improving', then=1))),
+        stable=Count(Case(When(progress='stable', then=1))),
+        declining=Count(Case(When(progress='declining', then=1))),
+        total=Count('id')
+    ).order_by()
+
+    with transaction.atomic():
+        tallies.delete()
+        created = VoteTally.objects.bulk_create([
+            VoteTally(
+                session_id=row['session_id'],
+                team_id=row['team_id'],
+                card_type=row['card_type'],
+                good_count=row['good'],
+                neutral_count=row['neutral'],
+                needs_improvement_count=row['needs_improvement'],
+                improving_count=row['improving'],
+                stable_count=row['stable'],
+                declining_count=row['declining'],
+                total_votes=row['total'],
+            )
+            for row in aggregation
+        ], batch_size=500)
+    return len(created)
+
+
+# per-card results for a tally queryset, summed across teams, keyed by card_type
+def card_results(tallies):
+    rows = tallies.values('card_type').annotate(
+        **{f'sum_{field}': Sum(field) for field in TALLY_FIELDS}
+    ).order_by('card_type')
+
+    results = {}
+    for row in rows:
+        if not row['sum_total_votes']:
+            continue
+        result = {'card_type': row['card_type']}
+        for field in TALLY_FIELDS:
+            result[field] = row[f'sum_{field}']
+        results[row['card_type']] = result
+    return results
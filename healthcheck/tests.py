@@ -1,2 +0,0 @@
-from django.test import TestCase
-
@@ -0,0 +1,127 @@
+# shared fixtures for the healthcheck tests: two departments with teams (one team name used
+# in both), two sessions and a user of each role
+
+from contextlib import nullcontext
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Case, Count, When
+from django.test import TestCase, TransactionTestCase
+
+from healthcheck.cube import reset_cube
+from healthcheck.models import Department, HealthCheckSession, Team, TeamMembership, UserProfile, Vote, VoteTally
+from healthcheck.tallies import TALLY_FIELDS
+from healthcheck.votes import upsert_votes
+
+
+CARD_CODES = [code for code, _ in Vote.CARD_TYPES]
+
+
+def make_user(username, role=None, department=None, teams=(), **extra):
+    # no password: the tests log in with force_login, and hashing one is slow
+    user = User.objects.create_user(username=username, **extra)
+    if role:
+        UserProfile.objects.create(user=user, role=role, department=department)
+    for team in teams:
+        TeamMembership.objects.create(user=user, team=team)
+    return user
+
+
+class HealthcheckFixtures:
+
+    @classmethod
+    def create_fixtures(cls):
+        cls.engineering = Department.objects.create(name='Engineering')
+        cls.sales = Department.objects.create(name='Sales')
+        cls.team = Team.objects.create(name='Team 1', department=cls.engineering)
+        cls.other_team = Team.objects.create(name='Team 2', department=cls.engineering)
+        cls.sales_team = Team.objects.create(name='Team 1', department=cls.sales)
+        cls.previous_session = HealthCheckSession.objects.create(
+            name='January', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31)
+        )
+        cls.session = HealthCheckSession.objects.create(
+            name='February', start_date=date(2025, 2, 1), end_date=date(2025, 2, 28)
+        )
+        cls.engineer = make_user('engineer', 'engineer', teams=[cls.team])
+        cls.team_leader = make_user('teamleader', 'teamLeader', teams=[cls.team])
+        cls.sales_engineer = make_user('salesengineer', 'engineer', teams=[cls.sales_team])
+        cls.department_leader = make_user('deptleader', 'departmentLeader', department=cls.engineering)
+        cls.senior_manager = make_user('senior', 'seniorManager')
+
+    def setUp(self):
+        # ids repeat from test to test, so nothing cached by an earlier test may be read
+        cache.clear()
+        reset_cube()
+
+    # runs what is queued with transaction.on_commit() at the end of the block
+    def committing(self):
+        raise NotImplementedError
+
+    # submits votes as the card form and votes api do, running the inline consumer and the
+    # cache invalidation that follow the commit
+    def vote(self, user, team, session, votes, progress='stable', comments=None):
+        entries = [
+            {
+                'team_id': team.id,
+                'session_id': session.id,
+                'card_type': card_type,
+                'vote': vote,
+                'progress': progress,
+                'comments': comments,
+            }
+            for card_type, vote in votes.items()
+        ]
+        with self.committing():
+            upsert_votes(user, entries)
+
+    def tally(self, team, session, card_type):
+        return VoteTally.objects.filter(team=team, session=session, card_type=card_type).first()
+
+    # every non-empty tally row matches a recount of the votes, and no votes lack a row
+    def assertTalliesMatchVotes(self):
+        counted = {
+            (row['session_id'], row['team_id'], row['card_type']): (
+                row['good'], row['neutral'], row['needs_improvement'],
+                row['improving'], row['stable'], row['declining'], row['total'],
+            )
+            for row in Vote.objects.values('session_id', 'team_id', 'card_type').annotate(
+                good=Count(Case(When(vote='good', then=1))),
+                neutral=Count(Case(When(vote='neutral', then=1))),
+                needs_improvement=Count(Case(When(vote='needs_improvement', then=1))),
+                improving=Count(Case(When(progress='improving', then=1))),
+                stable=Count(Case(When(progress='stable', then=1))),
+                declining=Count(Case(When(progress='declining', then=1))),
+                total=Count('id'),
+            ).order_by()
+        }
+        tallied = {
+            row[:3]: row[3:]
+            for row in VoteTally.objects.filter(total_votes__gt=0).values_list(
+                'session_id', 'team_id', 'card_type', *TALLY_FIELDS
+            )
+        }
+        self.assertEqual(tallied, counted)
+
+
+class HealthcheckTestCase(HealthcheckFixtures, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def committing(self):
+        return self.captureOnCommitCallbacks(execute=True)
+
+
+# for code that queries from other threads: their connections only see committed rows,
+# so the fixtures are committed, and flushed after each test
+class HealthcheckTransactionTestCase(HealthcheckFixtures, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_fixtures()
+
+    # every statement commits straight away, and its on_commit() callbacks run with it
+    def committing(self):
+        return nullcontext()
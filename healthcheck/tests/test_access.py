@@ -0,0 +1,167 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+
+from healthcheck.access import get_access_scope
+from healthcheck.models import Team, TeamMembership, Vote
+
+from .base import HealthcheckTestCase, make_user
+
+
+def ids(objects):
+    return {obj.id for obj in objects}
+
+
+class AccessScopeTests(HealthcheckTestCase):
+
+    def test_engineer(self):
+        scope = get_access_scope(self.engineer)
+
+        self.assertEqual(ids(scope.dashboard_teams()), {self.team.id, self.other_team.id})
+        self.assertEqual(scope.dashboard_departments(), [])
+        self.assertEqual(ids(scope.votable_teams), {self.team.id, self.other_team.id})
+        self.assertEqual(scope.comment_search_teams(), [])
+        self.assertEqual(scope.decline_alert_departments(), [])
+        self.assertTrue(scope.can_vote)
+
+    def test_team_leader_searches_their_own_teams(self):
+        scope = get_access_scope(self.team_leader)
+
+        self.assertEqual(ids(scope.comment_search_teams()), {self.team.id})
+
+    def test_department_leader(self):
+        scope = get_access_scope(self.department_leader)
+
+        self.assertEqual(ids(scope.dashboard_teams()), {self.team.id, self.other_team.id})
+        self.assertEqual(ids(scope.dashboard_departments()), {self.engineering.id, self.sales.id})
+        self.assertEqual(ids(scope.comment_search_teams()), {self.team.id, self.other_team.id})
+        self.assertEqual(ids(scope.decline_alert_departments()), {self.engineering.id})
+        self.assertEqual(scope.votable_teams, [])
+        self.assertFalse(scope.can_vote)
+
+    def test_department_leader_without_a_department(self):
+        scope = get_access_scope(make_user('nodept', 'departmentLeader'))
+
+        self.assertEqual(scope.dashboard_teams(), [])
+        self.assertEqual(scope.dashboard_departments(), [])
+        self.assertEqual(scope.decline_alert_departments(), [])
+
+    def test_senior_manager_sees_everything(self):
+        loose_team = Team.objects.create(name='No department')
+        scope = get_access_scope(self.senior_manager)
+
+        self.assertEqual(
+            ids(scope.dashboard_teams()), {self.team.id, self.other_team.id, self.sales_team.id, loose_team.id}
+        )
+        self.assertEqual(ids(scope.decline_alert_departments()), {self.engineering.id, self.sales.id})
+        self.assertFalse(scope.can_vote)
+
+    def test_user_without_a_profile(self):
+        scope = get_access_scope(make_user('noprofile'))
+
+        self.assertFalse(scope.has_profile)
+        self.assertEqual(scope.dashboard_teams(), [])
+        self.assertFalse(scope.can_vote)
+
+
+class ScopedViewTests(HealthcheckTestCase):
+
+    def test_team_summary_of_another_department_is_not_found(self):
+        self.client.force_login(self.engineer)
+        url = reverse('team_summary_api')
+
+        self.assertEqual(self.client.get(url, {'team': self.other_team.id}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'team': self.sales_team.id}).status_code, 404)
+
+    def test_engineers_have_no_department_summary(self):
+        self.client.force_login(self.engineer)
+
+        response = self.client.get(reverse('department_summary_api'), {'department': self.engineering.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_department_leader_sees_any_department_summary(self):
+        self.client.force_login(self.department_leader)
+
+        response = self.client.get(reverse('department_summary_api'), {'department': self.sales.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['department']['name'], 'Sales')
+
+    def test_comment_search_is_limited_to_the_users_teams(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'}, comments='flaky pipeline')
+        self.vote(self.sales_engineer, self.sales_team, self.session, {'code_quality': 'good'}, comments='flaky pipeline')
+        self.client.force_login(self.team_leader)
+
+        response = self.client.get(reverse('comment_search_api'), {'q': 'pipeline'})
+        self.assertEqual([result['team']['id'] for result in response.json()['results']], [self.team.id])
+        response = self.client.get(reverse('comment_search_api'), {'q': 'pipeline', 'team': self.sales_team.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_engineers_cannot_search_comments(self):
+        self.client.force_login(self.engineer)
+
+        self.assertEqual(self.client.get(reverse('comment_search_api'), {'q': 'pipeline'}).status_code, 403)
+
+    def test_decline_alerts_need_a_leader(self):
+        self.client.force_login(self.engineer)
+        self.assertNotEqual(self.client.get(reverse('decline_alerts')).status_code, 200)
+
+        self.client.force_login(self.department_leader)
+        self.assertEqual(self.client.get(reverse('decline_alerts')).status_code, 200)
+
+
+class AccessScopeCacheTests(HealthcheckTestCase):
+
+    def test_new_membership_is_seen(self):
+        self.assertEqual(get_access_scope(self.engineer).team_ids, {self.team.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            TeamMembership.objects.create(user=self.engineer, team=self.sales_team)
+
+        self.assertEqual(get_access_scope(self.engineer).team_ids, {self.team.id, self.sales_team.id})
+
+    def test_role_change_is_seen(self):
+        self.assertTrue(get_access_scope(self.engineer).can_vote)
+        profile = self.engineer.userprofile
+        profile.role = 'seniorManager'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        self.assertFalse(get_access_scope(self.engineer).can_vote)
+
+
+# the scope must not shadow ASGIRequest.scope, the connection dict the csrf origin check
+# reads the scheme from
+class AsgiRequestTests(HealthcheckTestCase):
+
+    async def apost_vote(self, origin):
+        client = AsyncClient(enforce_csrf_checks=True)
+        await client.aforce_login(self.engineer)
+        token = 'a' * 32
+        client.cookies['csrftoken'] = token
+        return await client.post(
+            reverse('votes_api'),
+            json.dumps({'votes': [{
+                'team': self.team.id, 'session': self.session.id, 'card_type': 'code_quality', 'vote': 'good', 'progress': 'stable',
+            }]}),
+            content_type='application/json',
+            headers={'Origin': origin, 'X-CSRFToken': token},
+        )
+
+    # the handler's database work runs on this thread, inside the test's transaction
+    def post_vote(self, origin):
+        with self.captureOnCommitCallbacks(execute=True):
+            return async_to_sync(self.apost_vote)(origin)
+
+    def test_post_from_the_same_origin(self):
+        response = self.post_vote('http://testserver')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Vote.objects.filter(user=self.engineer).count(), 1)
+        self.assertTalliesMatchVotes()
+
+    def test_post_from_another_origin_is_forbidden(self):
+        response = self.post_vote('http://elsewhere.example')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Vote.objects.exists())
@@ -0,0 +1,123 @@
+from datetime import date
+
+from django.test import override_settings
+from django.urls import reverse
+
+from healthcheck.alerts import refresh_decline_alerts
+from healthcheck.events import consume_vote_events
+from healthcheck.models import DeclineAlert, HealthCheckSession
+
+from .base import HealthcheckTestCase, make_user
+
+
+@override_settings(DECLINE_ALERT_MIN_DROP=25, DECLINE_ALERT_MIN_VOTES=3)
+class DeclineAlertTests(HealthcheckTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.members = [make_user(f'member{index}', 'engineer', teams=[cls.team]) for index in range(4)]
+        cls.sales_members = [make_user(f'seller{index}', 'engineer', teams=[cls.sales_team]) for index in range(3)]
+
+    # each member votes in turn; `votes` holds one vote per member
+    def votes(self, session, votes, card_type='code_quality', members=None, team=None):
+        for member, vote in zip(members or self.members, votes):
+            self.vote(member, team or self.team, session, {card_type: vote})
+
+    def alerts(self):
+        return set(DeclineAlert.objects.values_list('team_id', 'session_id', 'card_type'))
+
+    def test_sharp_drop_raises_an_alert(self):
+        self.votes(self.previous_session, ['good', 'good', 'good', 'neutral'])
+        self.votes(self.session, ['good', 'needs_improvement', 'needs_improvement', 'neutral'])
+
+        self.assertEqual(refresh_decline_alerts(), (2, 1))
+        alert = DeclineAlert.objects.get()
+        self.assertEqual((alert.team, alert.session, alert.previous_session), (self.team, self.session, self.previous_session))
+        self.assertEqual((alert.previous_good_share, alert.good_share), (75.0, 25.0))
+        self.assertEqual((alert.previous_needs_improvement_share, alert.needs_improvement_share), (0.0, 50.0))
+        self.assertEqual((alert.previous_total_votes, alert.total_votes), (4, 4))
+
+    @override_settings(DECLINE_ALERT_MIN_DROP=30)
+    def test_small_drops_and_few_votes_are_ignored(self):
+        self.votes(self.previous_session, ['good', 'good', 'good', 'good'])
+        self.votes(self.session, ['good', 'good', 'good', 'neutral'])
+        self.votes(self.previous_session, ['good', 'good'], 'testing_coverage')
+        self.votes(self.session, ['neutral', 'neutral'], 'testing_coverage')
+
+        refresh_decline_alerts()
+        self.assertEqual(self.alerts(), set())
+
+    def test_compares_with_the_session_before_by_start_date(self):
+        earlier = HealthCheckSession.objects.create(name='December', start_date=date(2024, 12, 1), end_date=date(2024, 12, 31))
+        self.votes(earlier, ['good', 'good', 'good'])
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'])
+
+        refresh_decline_alerts()
+        # the team skipped January, so February has nothing to be compared with
+        self.assertEqual(self.alerts(), set())
+
+    def test_runs_are_incremental(self):
+        self.votes(self.previous_session, ['good', 'good', 'good'])
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'])
+        refresh_decline_alerts()
+        created_at = DeclineAlert.objects.get().created_at
+
+        self.assertEqual(refresh_decline_alerts(), (0, 0))
+        self.votes(self.previous_session, ['neutral', 'neutral', 'neutral'], members=self.sales_members, team=self.sales_team)
+        self.assertEqual(refresh_decline_alerts(), (2, 1))
+        self.assertEqual(DeclineAlert.objects.get().created_at, created_at)
+
+    def test_recovered_cards_lose_their_alert(self):
+        self.votes(self.previous_session, ['good', 'good', 'good'])
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'])
+        refresh_decline_alerts()
+
+        self.votes(self.session, ['good', 'good', 'good'])
+        refresh_decline_alerts()
+        self.assertEqual(self.alerts(), set())
+
+    def test_a_change_in_the_earlier_session_rechecks_the_next(self):
+        self.votes(self.previous_session, ['neutral', 'neutral', 'neutral'])
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'])
+        refresh_decline_alerts()
+
+        self.votes(self.previous_session, ['good', 'good', 'good'])
+        refresh_decline_alerts()
+        self.assertEqual(self.alerts(), {(self.team.id, self.session.id, 'code_quality')})
+
+    @override_settings(VOTE_EVENT_CONSUMER='worker')
+    def test_waits_for_the_vote_consumer(self):
+        self.votes(self.previous_session, ['good', 'good', 'good'])
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'])
+
+        self.assertEqual(refresh_decline_alerts(), (0, 0))
+        consume_vote_events()
+        self.assertEqual(refresh_decline_alerts(), (2, 1))
+
+    def test_full_run_picks_up_changed_session_dates(self):
+        self.votes(self.previous_session, ['neutral', 'neutral', 'neutral'])
+        self.votes(self.session, ['good', 'good', 'good'])
+        refresh_decline_alerts()
+        self.assertEqual(self.alerts(), set())
+
+        HealthCheckSession.objects.filter(id=self.previous_session.id).update(start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+        self.assertEqual(refresh_decline_alerts(), (0, 0))
+        refresh_decline_alerts(full=True)
+        self.assertEqual(self.alerts(), {(self.team.id, self.previous_session.id, 'code_quality')})
+
+    def test_leaders_see_their_departments_alerts(self):
+        self.votes(self.previous_session, ['good', 'good', 'good'])
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'])
+        self.votes(self.previous_session, ['good', 'good', 'good'], members=self.sales_members, team=self.sales_team)
+        self.votes(self.session, ['neutral', 'neutral', 'neutral'], members=self.sales_members, team=self.sales_team)
+        refresh_decline_alerts()
+        self.assertEqual(len(self.alerts()), 2)
+
+        self.client.force_login(self.department_leader)
+        response = self.client.get(reverse('decline_alerts'))
+        self.assertEqual([row['team'].id for row in response.context['rows']], [self.team.id])
+
+        self.client.force_login(self.senior_manager)
+        response = self.client.get(reverse('decline_alerts'), {'department': self.sales.id})
+        self.assertEqual([row['team'].id for row in response.context['rows']], [self.sales_team.id])
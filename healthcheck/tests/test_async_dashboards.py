@@ -0,0 +1,73 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.messages import get_messages
+from django.test import AsyncClient
+from django.urls import reverse
+
+from .base import HealthcheckTransactionTestCase
+
+
+# the summaries are computed in worker threads, on connections of their own
+class AsyncDashboardTests(HealthcheckTransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good', 'testing_coverage': 'neutral'})
+        self.vote(self.sales_engineer, self.sales_team, self.session, {'code_quality': 'needs_improvement'})
+
+    # the page from the async view, served through the ASGI handler
+    def aget(self, user, name, params):
+        async def get():
+            client = AsyncClient()
+            await client.aforce_login(user)
+            return await client.get(reverse(name), params)
+
+        return async_to_sync(get)()
+
+    def get(self, user, name, params):
+        self.client.force_login(user)
+        return self.client.get(reverse(name), params)
+
+    def test_team_dashboard_matches_the_sync_view(self):
+        params = {'team': self.team.id, 'session': self.session.id}
+        response = self.aget(self.engineer, 'team_dashboard_async', params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['selected_team'], self.team)
+        self.assertEqual(
+            response.context['display_data'],
+            self.get(self.engineer, 'team_dashboard', params).context['display_data'],
+        )
+
+    def test_my_votes_only(self):
+        self.vote(self.team_leader, self.team, self.session, {'code_quality': 'good'})
+        params = {'team': self.team.id, 'session': self.session.id, 'my_votes_only': '1'}
+        response = self.aget(self.engineer, 'team_dashboard_async', params)
+
+        code_quality = next(row['result'] for row in response.context['display_data'] if row['code'] == 'code_quality')
+        self.assertEqual(code_quality['total_votes'], 1)
+
+    def test_team_outside_the_scope_is_not_summarised(self):
+        with mock.patch('healthcheck.views.cached_team_summary') as summary:
+            response = self.aget(self.engineer, 'team_dashboard_async', {'team': self.sales_team.id, 'session': self.session.id})
+
+        summary.assert_not_called()
+        self.assertEqual(response.context['display_data'], [])
+        self.assertEqual([str(message) for message in get_messages(response.asgi_request)], ["Invalid team or session selected."])
+
+    def test_department_dashboard_matches_the_sync_view(self):
+        params = {'department': self.sales.id, 'session': self.session.id}
+        response = self.aget(self.department_leader, 'department_dashboard_async', params)
+        expected = self.get(self.department_leader, 'department_dashboard', params).context
+
+        self.assertEqual(response.status_code, 200)
+        for name in ['viewed_department', 'own_dept_display_data', 'other_department_summaries', 'chart_datasets_json']:
+            self.assertEqual(response.context[name], expected[name])
+
+    def test_engineers_are_sent_home_before_any_summary(self):
+        with mock.patch('healthcheck.views.cached_department_summary') as summary:
+            response = self.aget(self.engineer, 'department_dashboard_async', {'department': self.engineering.id})
+
+        summary.assert_not_called()
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
@@ -0,0 +1,79 @@
+import json
+import threading
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from healthcheck.cube import reset_cube
+from healthcheck.events import pending_vote_events
+from healthcheck.models import Department, HealthCheckSession, Team, Vote, VoteTally
+
+from .base import CARD_CODES, make_user
+
+
+@skipUnless(
+    settings.DATABASE_PROFILE == 'sqlite-concurrent',
+    "run with HEALTHCHECK_DB_PROFILE=sqlite-concurrent",
+)
+class ParallelSubmissionTests(TransactionTestCase):
+    THREADS = 8
+    ROUNDS = 5
+
+    def setUp(self):
+        cache.clear()
+        reset_cube()
+        department = Department.objects.create(name='Engineering')
+        self.teams = [Team.objects.create(name=f'Team {index}', department=department) for index in range(2)]
+        self.session = HealthCheckSession.objects.create(name='February', start_date='2025-02-01', end_date='2025-02-28')
+        self.users = [
+            make_user(f'engineer{index}', 'engineer', teams=[self.teams[index % 2]])
+            for index in range(self.THREADS)
+        ]
+
+    # each user submits every card ROUNDS times, all users at once through the votes api
+    def submit(self, user, team, start, errors):
+        try:
+            client = Client()
+            client.force_login(user)
+            start.wait()
+            for round_number in range(self.ROUNDS):
+                vote = ['good', 'neutral', 'needs_improvement'][round_number % 3]
+                response = client.post(reverse('votes_api'), json.dumps({'votes': [
+                    {'team': team.id, 'session': self.session.id, 'card_type': card_type, 'vote': vote, 'progress': 'stable'}
+                    for card_type in CARD_CODES
+                ]}), content_type='application/json')
+                if response.status_code != 200:
+                    errors.append(f"{user.username}: HTTP {response.status_code}")
+        except Exception as error:
+            errors.append(f"{user.username}: {error!r}")
+        finally:
+            connection.close()
+
+    def test_parallel_submissions_wait_for_the_write_lock(self):
+        errors = []
+        start = threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self.submit, args=(user, self.teams[index % 2], start, errors))
+            for index, user in enumerate(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([error for error in errors if 'database is locked' in error], [])
+        self.assertEqual(errors, [])
+        self.assertEqual(pending_vote_events(), 0)
+        self.assertEqual(Vote.objects.count(), self.THREADS * len(CARD_CODES))
+        self.assertEqual(VoteTally.objects.aggregate(total=Sum('total_votes'))['total'], Vote.objects.count())
+        # the last round was a neutral vote on every card
+        final_vote = ['good', 'neutral', 'needs_improvement'][(self.ROUNDS - 1) % 3]
+        self.assertEqual(set(Vote.objects.values_list('vote', flat=True)), {final_vote})
+        for team in self.teams:
+            for tally in VoteTally.objects.filter(team=team, session=self.session):
+                self.assertEqual(tally.total_votes, Vote.objects.filter(team=team, card_type=tally.card_type).count())
@@ -0,0 +1,68 @@
+from healthcheck import dashboard_cache
+
+from .base import HealthcheckTestCase
+
+
+def card_result(summary, card_type):
+    return next(row['result'] for row in summary['display_data'] if row['code'] == card_type)
+
+
+class DashboardCacheTests(HealthcheckTestCase):
+
+    def test_team_summary_follows_votes(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        self.assertEqual(card_result(dashboard_cache.cached_team_summary(self.team, self.session), 'code_quality')['good_count'], 1)
+        misses = dashboard_cache.cache_stats()['team_misses']
+
+        self.vote(self.team_leader, self.team, self.session, {'code_quality': 'good'})
+        summary = dashboard_cache.cached_team_summary(self.team, self.session)
+        self.assertEqual(card_result(summary, 'code_quality')['good_count'], 2)
+        self.assertEqual(dashboard_cache.cache_stats()['team_misses'], misses + 1)
+
+    def test_cached_summary_is_reused_until_a_vote(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        dashboard_cache.cached_team_summary(self.team, self.session)
+        hits = dashboard_cache.cache_stats().get('team_hits', 0)
+
+        with self.assertNumQueries(0):
+            dashboard_cache.cached_team_summary(self.team, self.session)
+        self.assertEqual(dashboard_cache.cache_stats()['team_hits'], hits + 1)
+
+    def test_own_votes_follow_the_user(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        mine = dashboard_cache.cached_team_summary(self.team, self.session, user=self.engineer)
+        self.assertEqual(card_result(mine, 'code_quality')['good_count'], 1)
+
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'neutral'})
+        mine = dashboard_cache.cached_team_summary(self.team, self.session, user=self.engineer)
+        self.assertEqual(card_result(mine, 'code_quality')['neutral_count'], 1)
+
+    def test_department_summary_follows_other_departments_votes(self):
+        dashboard_cache.cached_department_summary(self.engineering, self.session)
+        self.vote(self.sales_engineer, self.sales_team, self.session, {'code_quality': 'good'})
+
+        summary = dashboard_cache.cached_department_summary(self.engineering, self.session)
+        self.assertEqual(summary['other_departments'][0]['department_name'], 'Sales')
+        self.assertEqual(summary['other_departments'][0]['summary']['total_good'], 1)
+
+    def test_department_summary_follows_team_moves(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        self.assertIsNotNone(card_result(dashboard_cache.cached_department_summary(self.engineering, self.session), 'code_quality'))
+
+        self.team.department = self.sales
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+
+        self.assertIsNone(card_result(dashboard_cache.cached_department_summary(self.engineering, self.session), 'code_quality'))
+        self.assertEqual(card_result(dashboard_cache.cached_department_summary(self.sales, self.session), 'code_quality')['good_count'], 1)
+
+    def test_closed_session_trend_follows_votes(self):
+        sessions = [self.previous_session, self.session]
+        dashboard_cache.cached_trend(sessions, team=self.team)
+        self.vote(self.engineer, self.team, self.previous_session, {'code_quality': 'good'})
+
+        trend = dashboard_cache.cached_trend(sessions, team=self.team)
+        self.assertEqual(trend, dashboard_cache.trend_summary(
+            sessions, dashboard_cache.session_card_counts([session.id for session in sessions], team=self.team)
+        ))
+        self.assertNotEqual(trend, dashboard_cache.trend_summary(sessions, {}))
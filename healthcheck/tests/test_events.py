@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from healthcheck.events import (
+    VOTE_CONSUMER, _consume_batch, append_vote_events, card_results_at, consume_vote_events, pending_vote_events,
+)
+from healthcheck.models import ConsumerOffset, Vote, VoteEvent
+
+from .base import HealthcheckTestCase
+
+
+class VoteEventTests(HealthcheckTestCase):
+
+    def event(self, vote, card_type='code_quality', user=None, ago=None, **fields):
+        return VoteEvent(
+            user=user or self.engineer,
+            team=self.team,
+            session=self.session,
+            card_type=card_type,
+            vote=vote,
+            progress='stable',
+            created_at=timezone.now() - ago if ago else timezone.now(),
+            **fields,
+        )
+
+    def current(self, card_type='code_quality', user=None):
+        return Vote.objects.filter(user=user or self.engineer, card_type=card_type).values_list('vote', flat=True).first()
+
+    def offset(self):
+        return ConsumerOffset.objects.get(name=VOTE_CONSUMER).last_event_id
+
+    def test_inline_consumer_applies_submissions(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good', 'testing_coverage': 'neutral'})
+
+        self.assertEqual(self.current(), 'good')
+        self.assertEqual(pending_vote_events(), 0)
+        self.assertEqual(self.offset(), VoteEvent.objects.latest('id').id)
+        self.assertTalliesMatchVotes()
+
+    @override_settings(VOTE_EVENT_CONSUMER='worker')
+    def test_worker_mode_waits_for_the_consumer(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good', 'testing_coverage': 'neutral'})
+        self.assertIsNone(self.current())
+        self.assertEqual(pending_vote_events(), 2)
+
+        self.assertEqual(consume_vote_events(), 2)
+        self.assertEqual(self.current(), 'good')
+        self.assertEqual(consume_vote_events(), 0)
+        self.assertTalliesMatchVotes()
+
+    @override_settings(VOTE_EVENT_CONSUMER='worker')
+    def test_consumer_works_in_batches_from_its_offset(self):
+        for vote in ['good', 'neutral', 'needs_improvement', 'good', 'neutral']:
+            self.vote(self.engineer, self.team, self.session, {'code_quality': vote})
+
+        self.assertEqual(_consume_batch(2), 2)
+        self.assertEqual(self.current(), 'neutral')
+        self.assertEqual(pending_vote_events(), 3)
+        self.assertEqual(consume_vote_events(batch_size=2), 3)
+        self.assertEqual(self.current(), 'neutral')
+        self.assertTalliesMatchVotes()
+
+    def test_older_imported_event_does_not_overwrite_a_newer_vote(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        with self.captureOnCommitCallbacks(execute=True):
+            append_vote_events([self.event('needs_improvement', ago=timedelta(days=30))])
+
+        self.assertEqual(pending_vote_events(), 0)
+        self.assertEqual(self.current(), 'good')
+
+    def test_newest_event_in_a_batch_wins_by_time(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            append_vote_events([
+                self.event('neutral', ago=timedelta(days=1)),
+                self.event('good', ago=timedelta(days=2)),
+            ])
+
+        self.assertEqual(self.current(), 'neutral')
+        self.assertTalliesMatchVotes()
+
+    def test_direct_saves_and_deletes_are_logged(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        vote = Vote.objects.get(user=self.engineer)
+        vote.vote = 'neutral'
+        with self.captureOnCommitCallbacks(execute=True):
+            vote.save()
+        self.assertEqual(VoteEvent.objects.latest('id').vote, 'neutral')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            vote.delete()
+        self.assertTrue(VoteEvent.objects.latest('id').deleted)
+        self.assertEqual(pending_vote_events(), 0)
+        self.assertIsNone(self.current())
+        self.assertTalliesMatchVotes()
+
+    def test_cascade_deletes_are_not_logged(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engineer.delete()
+
+        self.assertFalse(VoteEvent.objects.exists())
+
+    @override_settings(VOTE_EVENT_CONSUMER='worker')
+    def test_pending_submission_does_not_bring_back_a_deleted_vote(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        consume_vote_events()
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'neutral'})
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.filter(user=self.engineer).delete()
+
+        self.assertEqual(_consume_batch(1), 1)
+        self.assertEqual(self.current(), 'neutral')
+        consume_vote_events()
+        self.assertIsNone(self.current())
+        self.assertTalliesMatchVotes()
+
+
+class CardResultsAtTests(HealthcheckTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.before = now - timedelta(days=10)
+        self.middle = now - timedelta(days=5)
+        events = [
+            (self.engineer, 'good', now - timedelta(days=9)),
+            (self.team_leader, 'good', now - timedelta(days=8)),
+            (self.engineer, 'needs_improvement', now - timedelta(days=2)),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            append_vote_events([
+                VoteEvent(user=user, team=self.team, session=self.session, card_type='code_quality',
+                          vote=vote, progress='stable', created_at=created_at)
+                for user, vote, created_at in events
+            ])
+
+    def counts(self, at):
+        result = card_results_at(self.session, at).get('code_quality')
+        return (result['good_count'], result['needs_improvement_count']) if result else None
+
+    def test_results_as_they_stood(self):
+        self.assertIsNone(self.counts(self.before))
+        self.assertEqual(self.counts(self.middle), (2, 0))
+        self.assertEqual(self.counts(timezone.now()), (1, 1))
+
+    def test_late_import_of_an_older_event_is_ordered_by_time(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            append_vote_events([VoteEvent(
+                user=self.team_leader, team=self.team, session=self.session, card_type='code_quality',
+                vote='neutral', progress='stable', created_at=self.before,
+            )])
+
+        self.assertEqual(self.counts(self.middle), (2, 0))
+
+    def test_deleted_votes_drop_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.get(user=self.team_leader).delete()
+
+        self.assertEqual(self.counts(self.middle), (2, 0))
+        self.assertEqual(self.counts(timezone.now()), (0, 1))
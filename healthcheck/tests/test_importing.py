@@ -0,0 +1,115 @@
+import io
+from datetime import date
+
+from django.utils import timezone
+
+from healthcheck.importing import Importer
+from healthcheck.models import Department, HealthCheckSession, Team, TeamMembership, Vote, VoteEvent
+from healthcheck.reference import get_reference_data
+
+from .base import HealthcheckTestCase
+
+
+class ImporterTests(HealthcheckTestCase):
+
+    def run_import(self, kind, text, file_format='csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Importer(batch_size=2).run(kind, io.StringIO(text), file_format)
+
+    def test_departments_and_teams(self):
+        result = self.run_import('departments', "name\nEngineering\nFinance\n\n")
+        self.assertEqual((result['created'], result['skipped'], result['errors']), (1, 1, []))
+
+        result = self.run_import('teams', "name,department\nTeam 1,Finance\nTeam 1,Engineering\nLoose,\nTeam 9,Nowhere\n")
+        self.assertEqual((result['created'], result['skipped']), (2, 1))
+        self.assertEqual(result['errors'], [(5, "unknown department 'Nowhere'")])
+        self.assertTrue(Team.objects.filter(name='Team 1', department__name='Finance').exists())
+        self.assertTrue(Team.objects.filter(name='Loose', department=None).exists())
+        # bulk_create skips the signals, so the importer invalidates the reference data itself
+        self.assertIn('Finance', {department.name for department in get_reference_data().departments})
+
+    def test_over_long_names_are_row_errors(self):
+        long_name = 'x' * 101
+        result = self.run_import('departments', f"name\nFinance\n{long_name}\nLegal\n")
+        self.assertEqual((result['created'], result['errors']), (2, [(3, "name is longer than 100 characters")]))
+
+        result = self.run_import('teams', f"name,department\n{long_name},Finance\n")
+        self.assertEqual(result['errors'], [(2, "name is longer than 100 characters")])
+        result = self.run_import('sessions', f"name,start_date,end_date\n{long_name},2025-03-01,2025-03-31\n")
+        self.assertEqual(result['errors'], [(2, "name is longer than 100 characters")])
+        result = self.run_import('memberships', f"username,team,department\n{'u' * 151},Team 2,\n")
+        self.assertEqual(result['errors'], [(2, "username is longer than 150 characters")])
+
+    def test_sessions(self):
+        result = self.run_import('sessions', (
+            "name,start_date,end_date\n"
+            "March,2025-03-01,2025-03-31\n"
+            "February,2025-02-01,2025-02-28\n"
+            "April,2025-04-30,2025-04-01\n"
+            "May,05/01/2025,2025-05-31\n"
+        ))
+
+        self.assertEqual((result['created'], result['skipped']), (1, 1))
+        self.assertEqual(result['errors'], [
+            (4, "end_date is before start_date"),
+            (5, "start_date must be a date (YYYY-MM-DD), not '05/01/2025'"),
+        ])
+        self.assertEqual(HealthCheckSession.objects.get(name='March').end_date, date(2025, 3, 31))
+
+    def test_memberships_need_the_department_of_a_shared_team_name(self):
+        result = self.run_import('memberships', (
+            "username,team,department\n"
+            "senior,Team 2,\n"
+            "senior,Team 1,\n"
+            "senior,Team 1,Sales\n"
+            "engineer,Team 1,Engineering\n"
+            "nobody,Team 2,\n"
+        ))
+
+        self.assertEqual((result['created'], result['skipped']), (2, 1))
+        self.assertEqual(result['errors'], [
+            (3, "team 'Team 1' exists in several departments; give its department"),
+            (6, "unknown user 'nobody'"),
+        ])
+        self.assertEqual(
+            set(TeamMembership.objects.filter(user=self.senior_manager).values_list('team', flat=True)),
+            {self.other_team.id, self.sales_team.id},
+        )
+
+    def test_votes_go_through_the_event_log(self):
+        result = self.run_import('votes', (
+            "username,team,department,session,session_start_date,card_type,vote,progress,comments,updated_at\n"
+            "engineer,Team 1,Engineering,February,,code_quality,good,stable,Fine,2025-02-10T09:00:00\n"
+            "engineer,Team 1,Engineering,February,2025-02-01,testing_coverage,neutral,improving,,2025-02-10\n"
+            "engineer,Team 1,Engineering,February,,code_quality,needs_improvement,stable,,2025-02-11T09:00:00\n"
+            "engineer,Team 1,Engineering,February,,code_quality,bogus,stable,,\n"
+            "engineer,Team 1,Engineering,Never,,code_quality,good,stable,,\n"
+        ))
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['errors'], [(5, "unknown vote 'bogus'"), (6, "unknown session 'Never'")])
+        self.assertEqual(VoteEvent.objects.count(), 3)
+        event = VoteEvent.objects.earliest('id')
+        self.assertEqual(timezone.localtime(event.created_at).isoformat()[:19], '2025-02-10T09:00:00')
+        self.assertEqual(
+            dict(Vote.objects.filter(user=self.engineer).values_list('card_type', 'vote')),
+            {'code_quality': 'needs_improvement', 'testing_coverage': 'neutral'},
+        )
+        self.assertTalliesMatchVotes()
+
+    def test_older_imported_votes_do_not_replace_current_ones(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        result = self.run_import('votes', (
+            '{"username": "engineer", "team": "Team 1", "department": "Engineering", "session": "February",'
+            ' "card_type": "code_quality", "vote": "neutral", "progress": "stable", "updated_at": "2025-02-10"}\n'
+            'not json\n'
+        ), 'ndjson')
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['errors'], [(2, "not valid JSON")])
+        self.assertEqual(Vote.objects.get(user=self.engineer).vote, 'good')
+
+    def test_departments_are_not_duplicated(self):
+        self.run_import('departments', "name\nFinance\nFinance\n")
+
+        self.assertEqual(Department.objects.filter(name='Finance').count(), 1)
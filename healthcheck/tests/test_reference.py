@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.test import override_settings
+
+from healthcheck.models import HealthCheckSession, Team
+from healthcheck.reference import get_reference_data
+
+from .base import HealthcheckTestCase
+
+
+class ReferenceDataTests(HealthcheckTestCase):
+
+    def test_team_rename_is_seen(self):
+        self.assertEqual(get_reference_data().team(self.team.id).name, 'Team 1')
+        self.team.name = 'Platform'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+
+        self.assertEqual(get_reference_data().team(self.team.id).name, 'Platform')
+
+    def test_new_session_is_seen(self):
+        get_reference_data()
+        with self.captureOnCommitCallbacks(execute=True):
+            session = HealthCheckSession.objects.create(name='March', start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+
+        self.assertEqual(get_reference_data().latest_session.id, session.id)
+
+    def test_cached_reference_data_needs_no_queries(self):
+        get_reference_data()
+        with self.assertNumQueries(0):
+            get_reference_data().team(self.team.id)
+
+    @override_settings(REFERENCE_CACHE_TIMEOUT=0)
+    def test_timeout_bounds_how_long_it_is_kept(self):
+        get_reference_data()
+        Team.objects.filter(id=self.team.id).update(name='Renamed elsewhere')
+
+        self.assertEqual(get_reference_data().team(self.team.id).name, 'Renamed elsewhere')
@@ -0,0 +1,75 @@
+from unittest import skipUnless
+
+from django.db import connection
+
+from healthcheck.models import Vote
+from healthcheck.search import (
+    INDEX_TABLE, comment_index_missing_triggers, comment_snippet, match_expression, rebuild_comment_index,
+    search_comments,
+)
+from healthcheck.signals import restore_comment_index_triggers
+
+from .base import HealthcheckTestCase
+
+
+@skipUnless(connection.vendor == 'sqlite', "the comment index is SQLite's FTS5")
+class CommentSearchTests(HealthcheckTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'}, comments='The deployment pipeline is flaky')
+        self.vote(self.engineer, self.team, self.session, {'testing_coverage': 'good'}, comments='Coverage improved a lot')
+        self.vote(self.team_leader, self.team, self.session, {'code_quality': 'neutral'}, comments='Deployments deploy slowly')
+        self.vote(self.team_leader, self.team, self.session, {'testing_coverage': 'good'})
+
+    def found(self, query, votes=None):
+        return [vote.comments for vote in search_comments(votes or Vote.objects.all(), query)]
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.found('flaky pipeline'), ['The deployment pipeline is flaky'])
+        self.assertEqual(self.found('flaky coverage'), [])
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self.found('pipe'), ['The deployment pipeline is flaky'])
+        self.assertEqual(self.found('cover'), ['Coverage improved a lot'])
+        self.assertEqual(self.found('cover flaky'), [])
+
+    def test_operators_are_taken_literally(self):
+        self.assertEqual(match_expression('flaky OR "x'), '"flaky" "OR" "x"*')
+        self.assertEqual(self.found('flaky OR "pipeline'), [])
+        self.assertEqual(self.found('   '), [])
+
+    def test_search_is_limited_to_the_given_votes(self):
+        self.assertEqual(self.found('slowly', Vote.objects.filter(user=self.engineer)), [])
+        self.assertEqual(self.found('slowly', Vote.objects.filter(user=self.team_leader)), ['Deployments deploy slowly'])
+
+    def test_snippet_marks_the_matched_words(self):
+        vote = search_comments(Vote.objects.all(), 'flaky').get()
+
+        self.assertEqual(comment_snippet(vote, 'flaky'), 'The deployment pipeline is <mark>flaky</mark>')
+
+    def test_changed_and_deleted_comments_are_reindexed(self):
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'}, comments='Reviews are quick')
+        self.assertEqual(self.found('flaky'), [])
+        self.assertEqual(self.found('reviews'), ['Reviews are quick'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.filter(comments='Reviews are quick').delete()
+        self.assertEqual(self.found('reviews'), [])
+
+    def test_rebuild_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {INDEX_TABLE}_update')
+        self.assertTrue(comment_index_missing_triggers())
+
+        self.assertEqual(rebuild_comment_index(), 3)
+        self.assertFalse(comment_index_missing_triggers())
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'}, comments='Reviews are quick')
+        self.assertEqual(self.found('reviews'), ['Reviews are quick'])
+
+    def test_migrate_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {INDEX_TABLE}_insert')
+
+        restore_comment_index_triggers(sender=Vote._meta.app_config)
+        self.assertFalse(comment_index_missing_triggers())
@@ -0,0 +1,67 @@
+import time
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from .base import HealthcheckTestCase
+
+
+@override_settings(SHARED_CACHE=True)
+class SummaryApiConditionalTests(HealthcheckTestCase):
+
+    def team_url(self):
+        return reverse('team_summary_api') + f'?team={self.team.id}&session={self.session.id}'
+
+    def test_etag_answers_304_until_a_vote(self):
+        self.client.force_login(self.team_leader)
+        etag = self.client.get(self.team_url())['ETag']
+
+        self.assertEqual(self.client.get(self.team_url(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        response = self.client.get(self.team_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified_answers_304_until_a_vote(self):
+        self.client.force_login(self.team_leader)
+        last_modified = self.client.get(self.team_url())['Last-Modified']
+
+        self.assertEqual(self.client.get(self.team_url(), HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # HTTP dates are whole seconds, so the vote comes a little later
+        with mock.patch('healthcheck.dashboard_cache.time.time', return_value=time.time() + 2):
+            self.vote(self.engineer, self.team, self.session, {'code_quality': 'good'})
+        response = self.client.get(self.team_url(), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_conditional_request_needs_no_query_beyond_the_login(self):
+        self.client.force_login(self.team_leader)
+        etag = self.client.get(self.team_url())['ETag']
+
+        # the session and user lookups of the login
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.team_url(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_department_etag_changes_with_any_vote_in_the_session(self):
+        self.client.force_login(self.department_leader)
+        url = reverse('department_summary_api') + f'?department={self.engineering.id}&session={self.session.id}'
+        etag = self.client.get(url)['ETag']
+
+        self.vote(self.sales_engineer, self.sales_team, self.session, {'code_quality': 'good'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SummaryApiWithoutSharedCacheTests(HealthcheckTestCase):
+
+    # other processes' votes would not move this process's counters, so there is nothing
+    # to validate against
+    @override_settings(SHARED_CACHE=False)
+    def test_no_validators(self):
+        self.client.force_login(self.team_leader)
+        url = reverse('team_summary_api') + f'?team={self.team.id}&session={self.session.id}'
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
@@ -0,0 +1,85 @@
+from django.urls import reverse
+
+from healthcheck.models import Vote, VoteTally
+
+from .base import HealthcheckTestCase, make_user
+
+
+class TallyConsistencyTests(HealthcheckTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.vote(self.engineer, self.team, self.session, {'code_quality': 'good', 'testing_coverage': 'neutral'})
+        self.vote(self.team_leader, self.team, self.session, {'code_quality': 'needs_improvement'})
+        self.vote(self.sales_engineer, self.sales_team, self.session, {'code_quality': 'good'})
+        self.admin = make_user('admin', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+
+    def test_admin_change(self):
+        vote = Vote.objects.get(user=self.engineer, card_type='code_quality')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:healthcheck_vote_change', args=[vote.id]), {
+                'user': self.engineer.id,
+                'team': self.other_team.id,
+                'session': self.session.id,
+                'card_type': 'code_quality',
+                'vote': 'neutral',
+                'progress': 'declining',
+                'comments': '',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        vote.refresh_from_db()
+        self.assertEqual((vote.team, vote.department, vote.vote), (self.other_team, self.engineering, 'neutral'))
+        self.assertEqual(self.tally(self.team, self.session, 'code_quality').total_votes, 1)
+        self.assertEqual(self.tally(self.other_team, self.session, 'code_quality').neutral_count, 1)
+        self.assertTalliesMatchVotes()
+
+    def test_admin_delete(self):
+        vote = Vote.objects.get(user=self.engineer, card_type='code_quality')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:healthcheck_vote_delete', args=[vote.id]), {'post': 'yes'})
+
+        self.assertFalse(Vote.objects.filter(id=vote.id).exists())
+        self.assertEqual(self.tally(self.team, self.session, 'code_quality').total_votes, 1)
+        self.assertTalliesMatchVotes()
+
+    def test_admin_bulk_delete(self):
+        votes = Vote.objects.filter(team=self.team)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:healthcheck_vote_changelist'), {
+                'action': 'delete_selected',
+                '_selected_action': [vote.id for vote in votes],
+                'post': 'yes',
+            })
+
+        self.assertFalse(Vote.objects.filter(team=self.team).exists())
+        self.assertTalliesMatchVotes()
+
+    def test_user_delete_cascades(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engineer.delete()
+
+        self.assertEqual(self.tally(self.team, self.session, 'code_quality').total_votes, 1)
+        self.assertTalliesMatchVotes()
+
+    def test_team_delete_cascades(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.delete()
+
+        self.assertFalse(VoteTally.objects.filter(team_id=self.team.id).exists())
+        self.assertTalliesMatchVotes()
+
+    def test_session_delete_cascades(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.delete()
+
+        self.assertFalse(VoteTally.objects.exists())
+        self.assertTalliesMatchVotes()
+
+    def test_team_move_takes_its_votes(self):
+        self.team.department = self.sales
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+
+        self.assertEqual(set(Vote.objects.filter(team=self.team).values_list('department', flat=True)), {self.sales.id})
@@ -0,0 +1,109 @@
+import json
+
+from django.contrib.messages import get_messages
+from django.urls import reverse
+
+from healthcheck.models import Vote
+
+from .base import CARD_CODES, HealthcheckTestCase
+
+
+class CardFormTests(HealthcheckTestCase):
+
+    def form_data(self, vote='good', **overrides):
+        data = {'team': self.team.id, 'session': self.session.id}
+        for card_type in CARD_CODES:
+            data[f'vote_{card_type}'] = vote
+            data[f'progress_{card_type}'] = 'improving'
+        data.update(overrides)
+        return data
+
+    def test_submission_saves_votes_and_tallies(self):
+        self.client.force_login(self.engineer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('card_form'), self.form_data())
+
+        self.assertRedirects(
+            response, reverse('team_dashboard') + f'?team={self.team.id}&session={self.session.id}',
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(Vote.objects.filter(user=self.engineer).count(), len(CARD_CODES))
+        tally = self.tally(self.team, self.session, 'code_quality')
+        self.assertEqual((tally.good_count, tally.improving_count, tally.total_votes), (1, 1, 1))
+        self.assertTalliesMatchVotes()
+
+    def test_unknown_vote_is_rejected(self):
+        self.client.force_login(self.engineer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('card_form'), self.form_data(vote_code_quality='bogus'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["Code Quality: unknown vote 'bogus'."],
+        )
+        self.assertFalse(Vote.objects.exists())
+
+    def test_team_outside_the_users_departments_is_rejected(self):
+        self.client.force_login(self.engineer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('card_form'), self.form_data(team=self.sales_team.id))
+
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["Invalid session or team selected for your department(s)."],
+        )
+        self.assertFalse(Vote.objects.exists())
+
+
+class VotesApiTests(HealthcheckTestCase):
+
+    def post(self, user, votes):
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('votes_api'), json.dumps({'votes': votes}), content_type='application/json')
+
+    def entry(self, vote, card_type='code_quality', team=None):
+        return {
+            'team': (team or self.team).id,
+            'session': self.session.id,
+            'card_type': card_type,
+            'vote': vote,
+            'progress': 'stable',
+        }
+
+    def test_resubmission_moves_the_tally(self):
+        self.post(self.engineer, [self.entry('good'), self.entry('neutral', 'testing_coverage')])
+        response = self.post(self.engineer, [self.entry('needs_improvement')])
+
+        self.assertEqual(response.json(), {'saved': 1})
+        tally = self.tally(self.team, self.session, 'code_quality')
+        self.assertEqual((tally.good_count, tally.needs_improvement_count, tally.total_votes), (0, 1, 1))
+        self.assertTalliesMatchVotes()
+
+    def test_last_entry_for_a_card_wins(self):
+        response = self.post(self.engineer, [self.entry('good'), self.entry('neutral')])
+
+        self.assertEqual(response.json(), {'saved': 1})
+        self.assertEqual(Vote.objects.get(user=self.engineer).vote, 'neutral')
+        self.assertTalliesMatchVotes()
+
+    def test_invalid_entries_save_nothing(self):
+        response = self.post(self.engineer, [self.entry('good'), self.entry('good', team=self.sales_team)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [f"Vote 1: you cannot vote for team {self.sales_team.id}."])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_comments_must_be_text(self):
+        entry = dict(self.entry('good'), comments={'text': 'flaky'})
+        response = self.post(self.engineer, [dict(self.entry('neutral', 'testing_coverage'), comments='slow builds'), entry])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], ["Vote 1: 'comments' must be a string or null."])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_department_leaders_cannot_vote(self):
+        response = self.post(self.department_leader, [self.entry('good')])
+
+        self.assertEqual(response.status_code, 403)
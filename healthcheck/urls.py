@@ -15,10 +15,26 @@ urlpatterns = [
     path("card-form/", views.card_form_view, name="card_form"),
     path("team-dashboard/", views.team_dashboard_view, name="team_dashboard"),
     path("department-dashboard/", views.department_dashboard_view, name="department_dashboard"),
+    path("async/team-dashboard/", views.team_dashboard_async_view, name="team_dashboard_async"),
+    path("async/department-dashboard/", views.department_dashboard_async_view, name="department_dashboard_async"),
+    path("trends/", views.trend_view, name="trends"),
+    path("department-heatmap/", views.department_heatmap_view, name="department_heatmap"),
+    path("org-overview/", views.org_overview_view, name="org_overview"),
+    path("decline-alerts/", views.decline_alerts_view, name="decline_alerts"),
+    path("export/votes/", views.vote_export_view, name="vote_export"),
+    path("api/votes/", views.votes_api_view, name="votes_api"),
+    path("api/team-summary/", views.team_summary_api_view, name="team_summary_api"),
+    path("api/department-summary/", views.department_summary_api_view, name="department_summary_api"),
+    path("api/trends/", views.trend_api_view, name="trends_api"),
+    path("api/department-heatmap/", views.department_heatmap_api_view, name="department_heatmap_api"),
+    path("api/org-overview/", views.org_overview_api_view, name="org_overview_api"),
+    path("api/comment-search/", views.comment_search_api_view, name="comment_search_api"),
+    path("api/dashboard-cache-stats/", views.dashboard_cache_stats_view, name="dashboard_cache_stats"),
+    path("metrics", views.metrics_view, name="metrics"),
     
 
     path("forgot-password/", views.password_reset_request, name="password_reset"),
     path("password-reset/done/", views.password_reset_done, name="password_reset_done"),
     path("password-reset-confirm/<uidb64>/<token>/", views.password_reset_confirm, name="password_reset_confirm"),
     path("password-reset-complete/", views.password_reset_complete, name="password_reset_complete"),
-]
\ No newline at end of file
+]
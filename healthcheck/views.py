@@ -2,10 +2,16 @@
 # Oliver Bryan, Smaran Holkar, Aaron Madhok, Michael Robinson, Ibrahim Warsame 
 
 # all imports
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition, require_POST, require_safe
 from django.shortcuts import render, redirect
 from django.template import loader
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.forms import PasswordChangeForm, UserCreationForm, AuthenticationForm, PasswordResetForm
 from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
 from django.contrib import messages
@@ -14,7 +20,7 @@ from .decorators import anonymous_required
 from django.contrib.auth.models import User
 from django.core.mail import send_mail, BadHeaderError
 from django.template.loader import render_to_string
-from django.db.models import Count, Q, Case, When, Sum
+from django.db.models import Count, F, Q, Case, When, Sum
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.encoding import force_bytes, force_str
@@ -22,8 +28,18 @@ from django.contrib.auth import get_user_model
 from django import forms
 from django.urls import reverse
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
 import json
-from .models import HealthCheckSession, Team, Vote, TeamMembership, UserProfile, Department
+from .models import DeclineAlert, Vote
+from .exports import EXPORT_FORMATS
+from .dashboard_cache import (
+    cached_team_summary, cached_department_summary, cached_department_heatmap, cached_org_overview, cached_trend,
+    cache_stats, department_summary_validators, team_summary_validators,
+)
+from .votes import clean_vote_entries, upsert_votes
+from .metrics import render_metrics
+from .reference import get_reference_data
+from .search import comment_snippet, search_comments
 
 
 # redirects to the home view
@@ -34,41 +50,28 @@ def index(request):
 @login_required
 def home(request):
 
-    try:
-
-        user_profile = request.user.userprofile
-        user_role = user_profile.role
-    except UserProfile.DoesNotExist:
+    scope = request.access_scope
+    user_role = scope.role
+    if not scope.has_profile:
 
         messages.error(request, "User profile not found. Please contact support.")
 
-        user_profile = None
-        user_role = None
-
 
 
     user_teams = []
     user_departments_list = []
-    if user_profile:
-        memberships = TeamMembership.objects.filter(
-            user=request.user
-        ).select_related(
-            'team', 'team__department'
-        ).order_by(
-            'team__department__name', 'team__name'
-        )
+    if scope.has_profile:
         user_departments = set()
-        if memberships.exists():
-            for membership in memberships:
-                user_teams.append(membership.team.name)
-                if membership.team.department:
-                    user_departments.add(membership.team.department.name)
+        for team in scope.teams:
+            user_teams.append(team.name)
+            if team.department:
+                user_departments.add(team.department.name)
         user_departments_list = sorted(list(user_departments))
 
 
     context = {
         'user': request.user,
-        'user_profile': user_profile,
+        'scope': scope,
         'user_role': user_role,
         'user_teams': user_teams,
         'user_departments': user_departments_list,
@@ -85,27 +88,10 @@ def register_view(request):
             login(request, user)
             messages.success(request, 'Successfully registered!')
             return redirect("home")
-        else:
-            teams_by_department = {}
-            teams = Team.objects.filter(department__isnull=False).select_related('department').order_by('name')
-            for team in teams:
-                dept_id = str(team.department.id)
-                if dept_id not in teams_by_department:
-                    teams_by_department[dept_id] = []
-                teams_by_department[dept_id].append({'id': team.id, 'name': team.name})
-            teams_by_dept_json = json.dumps(teams_by_department)
     else:
         form = CustomUserCreationForm()
-        
-        teams_by_department = {}
-        teams = Team.objects.filter(department__isnull=False).select_related('department').order_by('name')
-        for team in teams:
-            dept_id = str(team.department.id)
-            if dept_id not in teams_by_department:
-                teams_by_department[dept_id] = []
-            teams_by_department[dept_id].append({'id': team.id, 'name': team.name})
-        teams_by_dept_json = json.dumps(teams_by_department)
-    
+
+    teams_by_dept_json = get_reference_data().teams_by_department_json
     return render(request, 'register.html', {'form': form, 'teams_by_dept_json': teams_by_dept_json})
 
 # login view: handles user authentication
@@ -175,70 +161,72 @@ def profile_view(request):
     return render(request, 'profile.html', context)
 
 
-# team dashboard view: displays voting results filtered by department, team, and session
-@login_required
-def team_dashboard_view(request):
-
-    user_profile = request.user.userprofile
-    user_role = user_profile.role
-    user_department = user_profile.department
+# departments and teams the team dashboard offers a user, narrowed by ?department=;
+# returns (relevant_departments, selected_department_id, teams) as lists from the reference data
+def _team_dashboard_scope(request, scope):
+    reference = scope.reference
+    user_role = scope.role
+    user_department = scope.department
 
 
-    all_departments = Department.objects.all()
-    relevant_departments = all_departments
+    relevant_departments = reference.departments
 
     if user_role == 'departmentLeader':
         if user_department:
 
-            relevant_departments = Department.objects.filter(id=user_department.id)
+            relevant_departments = [user_department]
         else:
 
             messages.warning(request, "You are not assigned to a department. Please contact an administrator.")
-            relevant_departments = Department.objects.none()
+            relevant_departments = []
     elif user_role in ['engineer', 'teamLeader']:
 
-        user_department_ids = Team.objects.filter(
-            teammembership__user=request.user,
-            department__isnull=False
-        ).values_list('department_id', flat=True).distinct()
-        relevant_departments = Department.objects.filter(id__in=list(user_department_ids))
+        relevant_departments = scope.permitted_departments()
 
 
 
     selected_department_id = request.GET.get('department')
-    selected_department = None
 
 
-    teams_queryset = Team.objects.select_related('department')
+    teams = reference.teams
 
 
     if selected_department_id:
-        try:
 
-            selected_department = relevant_departments.get(id=selected_department_id)
-            teams_queryset = teams_queryset.filter(department=selected_department)
-        except Department.DoesNotExist:
+        selected_department = reference.department(selected_department_id)
+        if selected_department in relevant_departments:
+            teams = reference.department_teams(selected_department.id)
+        else:
             messages.error(request, "Invalid department selected for your role.")
             selected_department_id = None
-            teams_queryset = Team.objects.none()
+            teams = []
     else:
 
         if user_role == 'departmentLeader':
             if user_department:
-                teams_queryset = teams_queryset.filter(department=user_department)
+                teams = reference.department_teams(user_department.id)
                 selected_department_id = str(user_department.id)
-                selected_department = user_department
             else:
-                teams_queryset = Team.objects.none()
+                teams = []
         elif user_role in ['engineer', 'teamLeader']:
 
-            teams_queryset = teams_queryset.filter(department__in=relevant_departments)
+            teams = scope.dashboard_teams()
+
 
+    return relevant_departments, selected_department_id, teams
 
-    all_teams_in_scope = teams_queryset.order_by('name')
 
+# team dashboard view: displays voting results filtered by department, team, and session
+@login_required
+def team_dashboard_view(request):
 
-    all_sessions = HealthCheckSession.objects.all().order_by('-start_date')
+    scope = request.access_scope
+    user_role = scope.role
+
+    relevant_departments, selected_department_id, all_teams_in_scope = _team_dashboard_scope(request, scope)
+
+
+    all_sessions = scope.reference.sessions
     selected_team_id = request.GET.get('team')
     selected_session_id = request.GET.get('session')
     my_votes_only = request.GET.get('my_votes_only')
@@ -249,53 +237,34 @@ def team_dashboard_view(request):
     is_filtered_my_votes = bool(my_votes_only)
 
 
-    if not selected_team_id and all_teams_in_scope.exists():
-        selected_team_id = all_teams_in_scope.first().id
+    if not selected_team_id and all_teams_in_scope:
+        selected_team_id = all_teams_in_scope[0].id
 
 
-    if not selected_session_id and all_sessions.exists():
-        selected_session_id = all_sessions.first().id
+    if not selected_session_id and all_sessions:
+        selected_session_id = all_sessions[0].id
 
 
-    try:
-        if selected_team_id:
+    if selected_team_id:
 
-            selected_team = all_teams_in_scope.get(id=selected_team_id)
-        if selected_session_id:
-            selected_session = HealthCheckSession.objects.get(id=selected_session_id)
-    except (Team.DoesNotExist, HealthCheckSession.DoesNotExist, ValueError):
+        selected_team = _find_by_id(all_teams_in_scope, selected_team_id)
+    if selected_session_id:
+        selected_session = _find_by_id(all_sessions, selected_session_id)
+    if (selected_team_id and selected_team is None) or (selected_session_id and selected_session is None):
 
         messages.error(request, "Invalid team or session selected.")
         selected_team = None
+        selected_session = None
 
 
 
     if selected_team and selected_session:
-        base_query = Vote.objects.filter(
-            team=selected_team,
-            session=selected_session
+        summary = cached_team_summary(
+            selected_team,
+            selected_session,
+            user=request.user if is_filtered_my_votes else None
         )
-        if is_filtered_my_votes:
-            base_query = base_query.filter(user=request.user)
-
-        vote_aggregation = base_query.values('card_type').annotate(
-            good_count=Count(Case(When(vote='good', then=1))),
-            neutral_count=Count(Case(When(vote='neutral', then=1))),
-            needs_improvement_count=Count(Case(When(vote='needs_improvement', then=1))),
-            improving_count=Count(Case(When(progress='improving', then=1))),
-            stable_count=Count(Case(When(progress='stable', then=1))),
-            declining_count=Count(Case(When(progress='declining', then=1))),
-            total_votes=Count('id')
-        ).order_by('card_type')
-
-        results_dict = {item['card_type']: item for item in vote_aggregation}
-        all_card_types = Vote.CARD_TYPES
-        for code, name in all_card_types:
-            display_data.append({
-                'code': code,
-                'name': name,
-                'result': results_dict.get(code)
-            })
+        display_data = summary['display_data']
 
     context = {
         'title': 'Team Dashboard',
@@ -428,61 +397,45 @@ def forgot_password(request):
 @login_required
 def card_form_view(request):
 
-    if request.user.userprofile.role in ['departmentLeader', 'seniorManager']:
+    scope = request.access_scope
+    if scope.role in ['departmentLeader', 'seniorManager']:
         messages.error(request, "Your role does not have permission to submit votes.")
         return redirect('home')
 
 
 
 
-    user_department_ids = Team.objects.filter(
-        teammembership__user=request.user,
-        department__isnull=False
-    ).values_list(
-        'department_id', flat=True
-    ).distinct()
-
-
-    teams_in_user_departments = Team.objects.filter(
-        department_id__in=list(user_department_ids)
-    ).order_by('department__name', 'name')
+    reference = scope.reference
+    teams_in_user_departments = scope.votable_teams
 
 
     default_team_id = None
-    if teams_in_user_departments.exists():
-
-        first_membership = TeamMembership.objects.filter(
-            user=request.user,
-            team__in=teams_in_user_departments
-        ).select_related('team').order_by('team__department__name', 'team__name').first()
-
-        if first_membership:
-            default_team_id = first_membership.team.id
-        else:
-
+    if teams_in_user_departments:
 
-            default_team_id = teams_in_user_departments.first().id
+        # the first of the user's own teams, otherwise the first team they may vote for
+        default_team_id = next(
+            (team.id for team in teams_in_user_departments if team.id in scope.team_ids),
+            teams_in_user_departments[0].id
+        )
 
 
 
-    all_sessions = HealthCheckSession.objects.all().order_by('-start_date')
+    all_sessions = reference.sessions
 
 
     if request.method == 'POST':
         session_id = request.POST.get('session')
         team_id = request.POST.get('team')
 
-        try:
-            session = HealthCheckSession.objects.get(id=session_id)
-
-            team = teams_in_user_departments.get(id=team_id)
-        except (HealthCheckSession.DoesNotExist, Team.DoesNotExist, ValueError):
+        session = reference.session(session_id)
+        team = _find_by_id(teams_in_user_departments, team_id)
+        if session is None or team is None:
             messages.error(request, 'Invalid session or team selected for your department(s).')
 
             context = {
                 'sessions': all_sessions,
                 'teams': teams_in_user_departments,
-                'card_types': Vote.CARD_TYPES,
+                'card_types': reference.cards,
                 'default_team_id': default_team_id,
                 'selected_session_id': session_id,
                 'selected_team_id': team_id,
@@ -498,11 +451,33 @@ def card_form_view(request):
                  messages.error(request, f'Missing vote or progress for {card_name}.')
                  validation_failed = True
 
-        if validation_failed:
+        # the same checks as the votes api, so only known vote and progress values are saved
+        entries, errors = [], []
+        if not validation_failed:
+            entries, errors = clean_vote_entries(
+                [
+                    {
+                        'team': team.id,
+                        'session': session.id,
+                        'card_type': card_type,
+                        'vote': request.POST.get(f'vote_{card_type}'),
+                        'progress': request.POST.get(f'progress_{card_type}'),
+                        'comments': request.POST.get(f'comments_{card_type}'),
+                    }
+                    for card_type, _ in Vote.CARD_TYPES
+                ],
+                {team.id for team in teams_in_user_departments},
+                set(reference.session_by_id),
+                labels=[card_name for _, card_name in Vote.CARD_TYPES],
+            )
+            for error in errors:
+                messages.error(request, error)
+
+        if validation_failed or errors:
             context = {
                 'sessions': all_sessions,
                 'teams': teams_in_user_departments,
-                'card_types': Vote.CARD_TYPES,
+                'card_types': reference.cards,
                 'default_team_id': default_team_id,
                 'selected_session_id': session_id,
                 'selected_team_id': team_id,
@@ -511,14 +486,7 @@ def card_form_view(request):
             return render(request, 'card_form.html', context)
 
 
-        for card_type, _ in Vote.CARD_TYPES:
-            vote_value = request.POST.get(f'vote_{card_type}')
-            progress_value = request.POST.get(f'progress_{card_type}')
-            comments = request.POST.get(f'comments_{card_type}')
-            Vote.objects.update_or_create(
-                user=request.user, team=team, session=session, card_type=card_type,
-                defaults={'vote': vote_value, 'progress': progress_value, 'comments': comments}
-            )
+        upsert_votes(request.user, entries)
 
 
         messages.success(request, 'Your votes have been saved successfully!')
@@ -529,35 +497,521 @@ def card_form_view(request):
     context = {
         'sessions': all_sessions,
         'teams': teams_in_user_departments,
-        'card_types': Vote.CARD_TYPES,
+        'card_types': reference.cards,
         'default_team_id': default_team_id,
     }
 
-    if not teams_in_user_departments.exists():
+    if not teams_in_user_departments:
          messages.info(request, "You are not currently assigned to any teams within a department. Please contact an administrator.")
 
     return render(request, 'card_form.html', context)
 
 
+# votes api view: saves a batch of votes for any number of teams and sessions as JSON
+# body: {"votes": [{"team": 1, "session": 2, "card_type": "...", "vote": "...", "progress": "...", "comments": "..."}]}
+@login_required
+@require_POST
+def votes_api_view(request):
+    scope = request.access_scope
+    if not scope.has_profile:
+        return JsonResponse({'errors': ["User profile not found."]}, status=403)
+    if scope.role in ['departmentLeader', 'seniorManager']:
+        return JsonResponse({'errors': ["Your role does not have permission to submit votes."]}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'errors': ["Request body must be valid JSON."]}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'errors': ["Request body must be a JSON object."]}, status=400)
+
+    allowed_team_ids = {team.id for team in scope.votable_teams}
+    session_ids = set(scope.reference.session_by_id)
+    entries, errors = clean_vote_entries(payload.get('votes'), allowed_team_ids, session_ids)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    saved = upsert_votes(request.user, entries)
+    return JsonResponse({'saved': saved})
+
+
+# works out which team or department a trend request is for, within what the user may see;
+# returns (teams, departments, team, department), with team and department None if invalid
+def _trend_scope(request):
+    teams = request.access_scope.dashboard_teams()
+    departments = request.access_scope.dashboard_departments()
+    team_id = request.GET.get('team')
+    department_id = request.GET.get('department')
+
+    team = None
+    department = None
+    if department_id:
+        department = _find_by_id(departments, department_id)
+    elif team_id:
+        team = _find_by_id(teams, team_id)
+    elif teams:
+        team = teams[0]
+    elif departments:
+        department = departments[0]
+    return teams, departments, team, department
+
+
+# trend view: per-card results across every session for one team or department
+@login_required
+def trend_view(request):
+    teams, departments, team, department = _trend_scope(request)
+    trend = None
+    if team or department:
+        sessions = get_reference_data().sessions_oldest_first
+        trend = cached_trend(sessions, team=team, department=department)
+    elif request.GET.get('team') or request.GET.get('department'):
+        messages.error(request, "Invalid team or department selected.")
+
+    context = {
+        'title': 'Health Check Trends',
+        'teams': teams,
+        'departments': departments,
+        'selected_team': team,
+        'selected_department': department,
+        'trend': trend,
+        'card_types': Vote.CARD_TYPES,
+    }
+    return render(request, 'trend.html', context)
+
+
+# trend api view: the trend view's data as JSON
+@login_required
+def trend_api_view(request):
+    _, _, team, department = _trend_scope(request)
+    if team is None and department is None:
+        return JsonResponse({'errors': ["Unknown team or department, or not visible to you."]}, status=404)
+
+    sessions = get_reference_data().sessions_oldest_first
+    scope = {'type': 'team', 'id': team.id, 'name': team.name} if team else \
+        {'type': 'department', 'id': department.id, 'name': department.name}
+    return JsonResponse({'scope': scope, **cached_trend(sessions, team=team, department=department)})
+
+
+# department and session of a heatmap request, within the departments whose teams the user
+# may see: ?department= (by default the user's own or first one) and ?session= (by default
+# the latest); returns (departments, department, session) with None for invalid choices
+def _heatmap_scope(request):
+    departments = request.access_scope.permitted_departments()
+    department_id = request.GET.get('department')
+    if department_id:
+        department = _find_by_id(departments, department_id)
+    else:
+        department = _find_by_id(departments, request.access_scope.department_id) if request.access_scope.department_id else None
+        department = department or (departments[0] if departments else None)
+    return departments, department, _summary_session(request)
+
+
+# teams of a heatmap ordered by ?sort=: name (default), overall good share or one card's
+# good share, weakest first and teams without votes last
+def _sorted_heatmap_teams(heatmap, sort):
+    card_positions = {card['code']: position for position, card in enumerate(heatmap['cards'])}
+    if sort == 'overall':
+        share = lambda team: team['good_share']
+    elif sort in card_positions:
+        share = lambda team: team['cells'][card_positions[sort]]['good_share']
+    else:
+        return heatmap['teams']
+    return sorted(heatmap['teams'], key=lambda team: (share(team) is None, share(team) or 0))
+
+
+# department heatmap view: every team of a department against every card for one session,
+# coloured by the share of good votes, to compare teams without opening each dashboard
+@login_required
+def department_heatmap_view(request):
+    departments, department, session = _heatmap_scope(request)
+    if not departments:
+        messages.error(request, "You do not have permission to view team results.")
+        return redirect('home')
+
+    heatmap = None
+    sort = request.GET.get('sort', 'name')
+    if department and session:
+        teams = request.access_scope.reference.department_teams(department.id)
+        heatmap = cached_department_heatmap(department, session, teams)
+        heatmap = {**heatmap, 'teams': _sorted_heatmap_teams(heatmap, sort)}
+    elif request.GET.get('department') or request.GET.get('session'):
+        messages.error(request, "Invalid department or session selected.")
+
+    context = {
+        'title': 'Team Heatmap',
+        'departments': departments,
+        'sessions': get_reference_data().sessions,
+        'selected_department': department,
+        'selected_session': session,
+        'sort': sort,
+        'heatmap': heatmap,
+    }
+    return render(request, 'department_heatmap.html', context)
+
+
+# department heatmap api view: the heatmap's data as JSON
+@login_required
+def department_heatmap_api_view(request):
+    _, department, session = _heatmap_scope(request)
+    if department is None or session is None:
+        return JsonResponse({'errors': ["Unknown department or session, or not visible to you."]}, status=404)
+
+    teams = request.access_scope.reference.department_teams(department.id)
+    heatmap = cached_department_heatmap(department, session, teams)
+    return JsonResponse({
+        'department': {'id': department.id, 'name': department.name},
+        'session': _session_json(session),
+        'cards': heatmap['cards'],
+        'teams': _sorted_heatmap_teams(heatmap, request.GET.get('sort', 'name')),
+    })
+
+
+# the sessions an organisation overview request covers, oldest first: the last
+# ORG_OVERVIEW_SESSIONS up to ?session= (by default the latest), or None if that is invalid
+def _org_overview_sessions(request):
+    selected = _summary_session(request)
+    if selected is None:
+        return None, []
+    sessions = get_reference_data().sessions_oldest_first
+    end = sessions.index(selected) + 1
+    return selected, sessions[max(end - settings.ORG_OVERVIEW_SESSIONS, 0):end]
+
+
+# organisation overview view: every department against every card over the recent sessions,
+# so senior managers can spot where to drill into the department dashboards
+@login_required
+def org_overview_view(request):
+    if request.access_scope.role != 'seniorManager':
+        messages.error(request, "You do not have permission to view the organisation overview.")
+        return redirect('home')
+
+    reference = request.access_scope.reference
+    selected_session, sessions = _org_overview_sessions(request)
+    overview = None
+    if sessions:
+        overview = cached_org_overview(sessions, reference.departments)
+    elif request.GET.get('session'):
+        messages.error(request, "Invalid session selected.")
+
+    context = {
+        'title': 'Organisation Overview',
+        'sessions': reference.sessions,
+        'selected_session': selected_session,
+        'overview': overview,
+    }
+    return render(request, 'org_overview.html', context)
+
+
+# organisation overview api view: the overview's data as JSON
+@login_required
+def org_overview_api_view(request):
+    if request.access_scope.role != 'seniorManager':
+        return JsonResponse({'errors': ["Only senior managers can view the organisation overview."]}, status=403)
+
+    _, sessions = _org_overview_sessions(request)
+    if not sessions:
+        return JsonResponse({'errors': ["Unknown session."]}, status=404)
+    return JsonResponse(cached_org_overview(sessions, request.access_scope.reference.departments))
+
+
+# session of a summary api request: ?session= or the latest one
+def _summary_session(request):
+    reference = get_reference_data()
+    session_id = request.GET.get('session')
+    if session_id:
+        return reference.session(session_id)
+    return reference.latest_session
+
+
+def _session_json(session):
+    return {'id': session.id, 'name': session.name, 'start_date': session.start_date, 'end_date': session.end_date}
+
+
+# team and session of a team summary api request, within the teams the user may see, with
+# its ETag and Last-Modified; kept on the request since condition() asks for each validator
+# separately and the view needs the team and session
+def _team_summary_request(request):
+    if not hasattr(request, '_team_summary'):
+        teams = request.access_scope.dashboard_teams()
+        team_id = request.GET.get('team')
+        if team_id:
+            team = _find_by_id(teams, team_id)
+        else:
+            team = teams[0] if teams else None
+        session = _summary_session(request)
+        etag = last_modified = None
+        if team and session:
+            etag, last_modified = team_summary_validators(team, session)
+        request._team_summary = (team, session, etag, last_modified)
+    return request._team_summary
+
+
+# department and session of a department summary api request; the summary includes every
+# department's totals, so its validators change with any vote of the session
+def _department_summary_request(request):
+    if not hasattr(request, '_department_summary'):
+        departments = request.access_scope.dashboard_departments()
+        department_id = request.GET.get('department') or request.access_scope.department_id
+        department = _find_by_id(departments, department_id) if department_id else None
+        session = _summary_session(request)
+        etag = last_modified = None
+        if department and session:
+            etag, last_modified = department_summary_validators(department, session)
+        request._department_summary = (department, session, etag, last_modified)
+    return request._department_summary
+
+
+# team summary api view: the team dashboard's per-card results as JSON; answers
+# If-None-Match/If-Modified-Since with 304 before anything is aggregated, when the cache
+# is shared by every process
+@login_required
+@require_safe
+@condition(
+    etag_func=lambda request: _team_summary_request(request)[2],
+    last_modified_func=lambda request: _team_summary_request(request)[3],
+)
+def team_summary_api_view(request):
+    team, session, _, _ = _team_summary_request(request)
+    if team is None or session is None:
+        return JsonResponse({'errors': ["Unknown team or session, or not visible to you."]}, status=404)
+
+    summary = cached_team_summary(team, session)
+    response = JsonResponse({
+        'team': {'id': team.id, 'name': team.name},
+        'session': _session_json(session),
+        'cards': summary['display_data'],
+    })
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# department summary api view: the department dashboard's data as JSON, with the same
+# conditional GET handling as the team summary api
+@login_required
+@require_safe
+@condition(
+    etag_func=lambda request: _department_summary_request(request)[2],
+    last_modified_func=lambda request: _department_summary_request(request)[3],
+)
+def department_summary_api_view(request):
+    department, session, _, _ = _department_summary_request(request)
+    if department is None or session is None:
+        return JsonResponse({'errors': ["Unknown department or session, or not visible to you."]}, status=404)
+
+    summary = cached_department_summary(department, session)
+    response = JsonResponse({
+        'department': {'id': department.id, 'name': department.name},
+        'session': _session_json(session),
+        'cards': summary['display_data'],
+        'other_departments': summary['other_departments'],
+    })
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# vote export view: streams votes as CSV or NDJSON to department leaders and senior managers,
+# filtered by ?department=, ?team=, ?session_from= and ?session_to= (session start dates)
+@login_required
+def vote_export_view(request):
+    departments = request.access_scope.dashboard_departments()
+    if not departments:
+        raise PermissionDenied
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Unknown format; use csv or ndjson.")
+
+    votes = Vote.objects.all()
+    department_id = request.GET.get('department')
+    team_id = request.GET.get('team')
+    department = _find_by_id(departments, department_id) if department_id else None
+    team = request.access_scope.reference.team(team_id) if team_id else None
+    if team and team.department_id is not None and team.department not in departments:
+        team = None
+    if (department_id and department is None) or (team_id and team is None):
+        return HttpResponseBadRequest("Unknown department or team.")
+    if department:
+        votes = votes.filter(department=department)
+    if team:
+        votes = votes.filter(team=team)
+
+    for parameter, lookup in (('session_from', 'session__start_date__gte'), ('session_to', 'session__start_date__lte')):
+        value = request.GET.get(parameter)
+        if value:
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                return HttpResponseBadRequest(f"{parameter} must be a date (YYYY-MM-DD).")
+            votes = votes.filter(**{lookup: parsed})
+
+    content_type, stream = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(votes), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="votes.{export_format}"'
+    return response
+
+
+COMMENT_SEARCH_PAGE_SIZE = 20
+
+
+# comment search api view: votes whose comments contain every word of ?q=, best match first,
+# with highlighted snippets, for leaders; narrowed by ?department=, ?team= and ?session=, a
+# page of COMMENT_SEARCH_PAGE_SIZE at a time with ?page=
+@login_required
+@require_safe
+def comment_search_api_view(request):
+    scope = request.access_scope
+    teams = scope.comment_search_teams()
+    if not teams:
+        return JsonResponse({'errors': ["Your role does not have permission to search comments."]}, status=403)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'errors': ["Enter the words to search for with ?q=."]}, status=400)
+
+    team_ids = {team.id for team in teams}
+    department_id = request.GET.get('department')
+    team_id = request.GET.get('team')
+    session_id = request.GET.get('session')
+    department = scope.reference.department(department_id) if department_id else None
+    team = scope.reference.team(team_id) if team_id else None
+    session = scope.reference.session(session_id) if session_id else None
+    if department and department.id not in {team.department_id for team in teams}:
+        department = None
+    if team and team.id not in team_ids:
+        team = None
+    if (department_id and department is None) or (team_id and team is None) or (session_id and session is None):
+        return JsonResponse({'errors': ["Unknown department, team or session, or not visible to you."]}, status=404)
+
+    if department:
+        team_ids &= {team.id for team in scope.reference.department_teams(department.id)}
+    if team:
+        team_ids &= {team.id}
+    votes = Vote.objects.filter(team_id__in=team_ids)
+    if session:
+        votes = votes.filter(session=session)
+
+    paginator = Paginator(search_comments(votes, query), COMMENT_SEARCH_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    results = []
+    for vote in page:
+        vote_team = scope.reference.team(vote.team_id)
+        vote_session = scope.reference.session(vote.session_id)
+        results.append({
+            'id': vote.id,
+            'team': {'id': vote_team.id, 'name': vote_team.name},
+            'session': {'id': vote_session.id, 'name': vote_session.name},
+            'card_type': vote.card_type,
+            'vote': vote.vote,
+            'progress': vote.progress,
+            'snippet': comment_snippet(vote, query),
+            'rank': getattr(vote, 'rank', None),
+        })
+    return JsonResponse({
+        'query': query,
+        'count': paginator.count,
+        'page': page.number,
+        'pages': paginator.num_pages,
+        'results': results,
+    })
+
+
+DECLINE_ALERTS_PAGE_SIZE = 50
+
+
+# decline alerts view: team cards whose share of good votes fell sharply since the session
+# before, newest sessions and biggest falls first, for department leaders (their department)
+# and senior managers; narrowed by ?department=, ?session= and ?card=
+@login_required
+def decline_alerts_view(request):
+    scope = request.access_scope
+    departments = scope.decline_alert_departments()
+    if not departments:
+        messages.error(request, "You do not have permission to view decline alerts.")
+        return redirect('home')
+
+    department = _find_by_id(departments, request.GET.get('department')) if request.GET.get('department') else None
+    session = scope.reference.session(request.GET.get('session')) if request.GET.get('session') else None
+    card_type = request.GET.get('card') if request.GET.get('card') in Vote.CARD_TYPES_DICT else None
+    if (request.GET.get('department') and department is None) or (request.GET.get('session') and session is None) \
+            or (request.GET.get('card') and card_type is None):
+        messages.error(request, "Invalid department, session or card selected.")
+
+    team_ids = [
+        team.id
+        for shown in ([department] if department else departments)
+        for team in scope.reference.department_teams(shown.id)
+    ]
+    alerts = DeclineAlert.objects.filter(team_id__in=team_ids).order_by(
+        '-session__start_date', F('good_share') - F('previous_good_share'), 'id'
+    )
+    if session:
+        alerts = alerts.filter(session=session)
+    if card_type:
+        alerts = alerts.filter(card_type=card_type)
+
+    page = Paginator(alerts, DECLINE_ALERTS_PAGE_SIZE).get_page(request.GET.get('page'))
+    rows = [
+        {
+            'alert': alert,
+            'team': scope.reference.team(alert.team_id),
+            'session': scope.reference.session(alert.session_id),
+            'previous_session': scope.reference.session(alert.previous_session_id),
+            'card_name': Vote.CARD_TYPES_DICT.get(alert.card_type, alert.card_type),
+            'drop': round(alert.previous_good_share - alert.good_share, 1),
+        }
+        for alert in page
+    ]
+
+    filters = request.GET.copy()
+    filters.pop('page', None)
+    context = {
+        'title': 'Decline Alerts',
+        'departments': departments,
+        'sessions': scope.reference.sessions,
+        'card_types': Vote.CARD_TYPES,
+        'selected_department': department,
+        'selected_session': session,
+        'selected_card': card_type,
+        'page': page,
+        'rows': rows,
+        'filter_query': filters.urlencode(),
+    }
+    return render(request, 'decline_alerts.html', context)
+
+
+# dashboard cache stats view: hit/miss counts of this server process, for staff
+@staff_member_required
+def dashboard_cache_stats_view(request):
+    return JsonResponse(cache_stats())
+
+
+# metrics view: request histograms and cache counts of this server process in the
+# Prometheus text format, for staff
+@staff_member_required
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 Vote.CARD_TYPES_DICT = dict(Vote.CARD_TYPES)
 
 # department dashboard view: summarises votes and displays charts for departments
 @login_required
 def department_dashboard_view(request):
-    try:
-        user_profile = request.user.userprofile
-    except UserProfile.DoesNotExist:
+    scope = request.access_scope
+    if not scope.has_profile:
         messages.error(request, "User profile not found. Please contact an administrator.")
         return redirect('home')
 
-    user_role = user_profile.role
+    user_role = scope.role
 
     if user_role not in ['departmentLeader', 'seniorManager']:
         messages.error(request, "You do not have permission to view the department dashboard.")
         return redirect('home')
 
-    leader_department = user_profile.department
-    all_departments = Department.objects.all()
+    reference = scope.reference
+    leader_department = scope.department
+    all_departments = reference.departments
     relevant_departments_for_filter = all_departments
 
     selected_department_id = request.GET.get('department')
@@ -571,107 +1025,38 @@ def department_dashboard_view(request):
             selected_department_id = None
 
     if selected_department_id:
-        try:
-            if user_role == 'seniorManager':
-                selected_department_for_view = all_departments.get(id=selected_department_id)
-            elif user_role == 'departmentLeader':
-                selected_department_for_view = all_departments.get(id=selected_department_id)
-            else:
-                selected_department_for_view = None
-                selected_department_id = str(leader_department.id)
-
-        except Department.DoesNotExist:
+        selected_department_for_view = reference.department(selected_department_id)
+        if selected_department_for_view is None:
             messages.error(request, "Selected department not found.")
-            selected_department_for_view = None
             selected_department_id = None
 
-    teams_in_viewed_department = Team.objects.none()
+    teams_in_viewed_department = []
     if selected_department_for_view:
-        teams_in_viewed_department = Team.objects.filter(department=selected_department_for_view).order_by('name')
+        teams_in_viewed_department = reference.department_teams(selected_department_for_view.id)
 
-    sessions = HealthCheckSession.objects.all().order_by('-start_date')
+    sessions = reference.sessions
     own_dept_display_data = []
     other_department_summaries = []
     selected_session_id = request.GET.get('session')
     selected_session = None
 
     chart_labels = []
-    chart_good_perc = []
-    chart_neutral_perc = []
-    chart_needsimp_perc = []
     chart_datasets = []
 
-    if not selected_session_id and sessions.exists():
-        selected_session_id = sessions.first().id
-    try:
-        if selected_session_id:
-            selected_session = HealthCheckSession.objects.get(id=selected_session_id)
-    except (HealthCheckSession.DoesNotExist, ValueError):
-         messages.error(request, "Invalid session selected.")
-         selected_session = None
-         selected_session_id = None
+    if not selected_session_id and sessions:
+        selected_session_id = sessions[0].id
+    if selected_session_id:
+        selected_session = reference.session(selected_session_id)
+        if selected_session is None:
+            messages.error(request, "Invalid session selected.")
+            selected_session_id = None
 
     if selected_session and selected_department_for_view:
-        own_dept_vote_aggregation = Vote.objects.filter(
-            team__department=selected_department_for_view,
-            session=selected_session
-        ).values('card_type').annotate(
-            good_count=Count(Case(When(vote='good', then=1))),
-            neutral_count=Count(Case(When(vote='neutral', then=1))),
-            needs_improvement_count=Count(Case(When(vote='needs_improvement', then=1))),
-            improving_count=Count(Case(When(progress='improving', then=1))),
-            stable_count=Count(Case(When(progress='stable', then=1))),
-            declining_count=Count(Case(When(progress='declining', then=1))),
-            total_votes=Count('id')
-        ).order_by('card_type')
-
-        results_dict = {item['card_type']: item for item in own_dept_vote_aggregation}
-        all_card_types = Vote.CARD_TYPES
-        own_dept_display_data = []
-        chart_labels, chart_good_perc, chart_neutral_perc, chart_needsimp_perc = [], [], [], []
-
-        for code, name in all_card_types:
-            current_result = results_dict.get(code)
-            own_dept_display_data.append({'code': code, 'name': name, 'result': current_result})
-            
-            chart_labels.append(name)
-            if current_result and current_result.get('total_votes', 0) > 0:
-                total = float(current_result['total_votes'])
-                good = current_result.get('good_count', 0)
-                neutral = current_result.get('neutral_count', 0)
-                good_perc = round((good / total) * 100, 1)
-                neutral_perc = round((neutral / total) * 100, 1)
-                needs_imp_perc = round(100.0 - good_perc - neutral_perc, 1)
-                chart_good_perc.append(good_perc)
-                chart_neutral_perc.append(neutral_perc)
-                chart_needsimp_perc.append(needs_imp_perc)
-            else:
-                chart_good_perc.append(0); chart_neutral_perc.append(0); chart_needsimp_perc.append(0)
-
-        chart_datasets = [
-            {'label': '% Good', 'data': chart_good_perc, 'backgroundColor': '#28a745'},
-            {'label': '% Neutral', 'data': chart_neutral_perc, 'backgroundColor': '#ffc107'},
-            {'label': '% Needs Improvement', 'data': chart_needsimp_perc, 'backgroundColor': '#dc3545'},
-        ]
-
-        other_departments_queryset = all_departments.exclude(id=selected_department_for_view.id)
-        other_department_summaries = [] # Reset
-
-        for other_dept in other_departments_queryset:
-            summary_aggregation = Vote.objects.filter(
-                team__department=other_dept,
-                session=selected_session
-            ).aggregate(
-                total_good=Count(Case(When(vote='good', then=1))),
-                total_neutral=Count(Case(When(vote='neutral', then=1))),
-                total_needs_improvement=Count(Case(When(vote='needs_improvement', then=1))),
-                total_dept_votes=Count('id')
-            )
-            if summary_aggregation.get('total_dept_votes', 0) > 0:
-                other_department_summaries.append({
-                    'department_name': other_dept.name,
-                    'summary': summary_aggregation
-                })
+        summary = cached_department_summary(selected_department_for_view, selected_session)
+        own_dept_display_data = summary['display_data']
+        chart_labels = summary['chart_labels']
+        chart_datasets = summary['chart_datasets']
+        other_department_summaries = summary['other_departments']
 
     context = {
         'title': f"{selected_department_for_view.name} Dept. Summary" if selected_department_for_view else "Department Dashboard",
@@ -689,4 +1074,150 @@ def department_dashboard_view(request):
         'chart_labels_json': json.dumps(chart_labels),
         'chart_datasets_json': json.dumps(chart_datasets),
     }
-    return render(request, 'department_dashboard.html', context)
\ No newline at end of file
+    return render(request, 'department_dashboard.html', context)
+
+# runs a blocking call in a worker thread with its own database connection, released
+# afterwards the way a request's connection would be; not on the shared thread-sensitive
+# executor, so concurrent requests' summaries do not queue behind each other
+async def _in_worker_thread(call):
+    def run():
+        try:
+            return call()
+        finally:
+            close_old_connections()
+
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
+# an object from an already fetched list by its (string) id, or None
+def _find_by_id(objects, object_id):
+    try:
+        object_id = int(object_id)
+    except (TypeError, ValueError):
+        return None
+    return next((obj for obj in objects if obj.id == object_id), None)
+
+
+# async team dashboard view: the team dashboard for ASGI servers. The user's scope comes
+# from the cache; once it allows the team and session, the sync summary code runs in a
+# worker thread. The async ORM is not used: Django runs its queries one at a time on a
+# single thread, so it would not overlap anything here
+@login_required
+async def team_dashboard_async_view(request):
+    user = await request.auser()
+    selected_team_id = request.GET.get('team')
+    selected_session_id = request.GET.get('session')
+    is_filtered_my_votes = bool(request.GET.get('my_votes_only'))
+    summary_user = user if is_filtered_my_votes else None
+
+    scope = await request.aaccess_scope()
+    user_role = scope.role
+
+    relevant_departments, selected_department_id, teams = _team_dashboard_scope(request, scope)
+    sessions = scope.reference.sessions
+
+    if not selected_team_id and teams:
+        selected_team_id = teams[0].id
+    if not selected_session_id and sessions:
+        selected_session_id = sessions[0].id
+
+    selected_team = _find_by_id(teams, selected_team_id) if selected_team_id else None
+    selected_session = _find_by_id(sessions, selected_session_id) if selected_session_id else None
+    if (selected_team_id and selected_team is None) or (selected_session_id and selected_session is None):
+        messages.error(request, "Invalid team or session selected.")
+        selected_team = None
+        selected_session = None
+
+    display_data = []
+    if selected_team and selected_session:
+        summary = await _in_worker_thread(lambda: cached_team_summary(selected_team, selected_session, user=summary_user))
+        display_data = summary['display_data']
+
+    context = {
+        'title': 'Team Dashboard',
+        'departments': relevant_departments,
+        'teams': teams,
+        'sessions': sessions,
+        'selected_department_id': selected_department_id,
+        'selected_team': selected_team,
+        'selected_session': selected_session,
+        'selected_team_id': selected_team_id,
+        'selected_session_id': selected_session_id,
+        'display_data': display_data,
+        'is_filtered_my_votes': is_filtered_my_votes,
+        'user_role': user_role,
+    }
+    return await sync_to_async(render)(request, 'team_dashboard.html', context)
+
+
+# async department dashboard view: the department dashboard for ASGI servers; like the
+# async team dashboard, the summary is computed in a worker thread only after the user's
+# scope allows the department dashboard
+@login_required
+async def department_dashboard_async_view(request):
+    scope = await request.aaccess_scope()
+    if not scope.has_profile:
+        messages.error(request, "User profile not found. Please contact an administrator.")
+        return redirect('home')
+
+    user_role = scope.role
+    if user_role not in ['departmentLeader', 'seniorManager']:
+        messages.error(request, "You do not have permission to view the department dashboard.")
+        return redirect('home')
+
+    leader_department = scope.department
+    selected_department_id = request.GET.get('department')
+    if user_role == 'departmentLeader':
+        if leader_department:
+            if not selected_department_id:
+                selected_department_id = str(leader_department.id)
+        else:
+            selected_department_id = None
+    selected_session_id = request.GET.get('session')
+
+    reference = scope.reference
+    all_departments = reference.departments
+    sessions = reference.sessions
+
+    selected_department_for_view = None
+    if selected_department_id:
+        selected_department_for_view = reference.department(selected_department_id)
+        if selected_department_for_view is None:
+            messages.error(request, "Selected department not found.")
+            selected_department_id = None
+
+    if not selected_session_id and sessions:
+        selected_session_id = sessions[0].id
+    selected_session = None
+    if selected_session_id:
+        selected_session = reference.session(selected_session_id)
+        if selected_session is None:
+            messages.error(request, "Invalid session selected.")
+            selected_session_id = None
+
+    teams_in_viewed_department = []
+    summary = {'display_data': [], 'chart_labels': [], 'chart_datasets': [], 'other_departments': []}
+    if selected_department_for_view:
+        teams_in_viewed_department = reference.department_teams(selected_department_for_view.id)
+        if selected_session:
+            summary = await _in_worker_thread(
+                lambda: cached_department_summary(selected_department_for_view, selected_session)
+            )
+
+    context = {
+        'title': f"{selected_department_for_view.name} Dept. Summary" if selected_department_for_view else "Department Dashboard",
+        'viewed_department': selected_department_for_view,
+        'department': leader_department,
+        'departments_for_filter': all_departments,
+        'teams_in_viewed_department': teams_in_viewed_department,
+        'sessions': sessions,
+        'selected_department_id': selected_department_id,
+        'selected_session': selected_session,
+        'selected_session_id': selected_session_id,
+        'own_dept_display_data': summary['display_data'],
+        'other_department_summaries': summary['other_departments'],
+        'user_role': user_role,
+        'chart_labels_json': json.dumps(summary['chart_labels']),
+        'chart_datasets_json': json.dumps(summary['chart_datasets']),
+    }
+    return await sync_to_async(render)(request, 'department_dashboard.html', context)
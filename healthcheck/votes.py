@@ -0,0 +1,64 @@
+# batched vote writes shared by the card form and the JSON votes endpoint
+
+from .events import record_vote_events
+from .models import Vote
+
+
+VOTE_VALUES = {value for value, _ in Vote.VOTE_CHOICES}
+PROGRESS_VALUES = {value for value, _ in Vote.PROGRESS_CHOICES}
+CARD_TYPE_VALUES = {value for value, _ in Vote.CARD_TYPES}
+
+
+# checks raw vote entries from a client and returns (entries, errors); each entry
+# needs team, session, card_type, vote and progress, and may carry comments (a string or
+# null). Errors name entries by `labels` when given (e.g. card names on the form), by
+# position otherwise
+def clean_vote_entries(raw_entries, allowed_team_ids, session_ids, labels=None):
+    entries = []
+    errors = []
+    if not isinstance(raw_entries, list) or not raw_entries:
+        return [], ["'votes' must be a non-empty list."]
+
+    for index, raw in enumerate(raw_entries):
+        label = labels[index] if labels else f"Vote {index}"
+        if not isinstance(raw, dict):
+            errors.append(f"{label}: must be an object.")
+            continue
+        try:
+            team_id = int(raw.get('team'))
+            session_id = int(raw.get('session'))
+        except (TypeError, ValueError):
+            errors.append(f"{label}: 'team' and 'session' must be ids.")
+            continue
+
+        if team_id not in allowed_team_ids:
+            errors.append(f"{label}: you cannot vote for team {team_id}.")
+        if session_id not in session_ids:
+            errors.append(f"{label}: session {session_id} does not exist.")
+        if raw.get('card_type') not in CARD_TYPE_VALUES:
+            errors.append(f"{label}: unknown card_type {raw.get('card_type')!r}.")
+        if raw.get('vote') not in VOTE_VALUES:
+            errors.append(f"{label}: unknown vote {raw.get('vote')!r}.")
+        if raw.get('progress') not in PROGRESS_VALUES:
+            errors.append(f"{label}: unknown progress {raw.get('progress')!r}.")
+        if raw.get('comments') is not None and not isinstance(raw.get('comments'), str):
+            errors.append(f"{label}: 'comments' must be a string or null.")
+
+        entries.append({
+            'team_id': team_id,
+            'session_id': session_id,
+            'card_type': raw.get('card_type'),
+            'vote': raw.get('vote'),
+            'progress': raw.get('progress'),
+            'comments': raw.get('comments'),
+        })
+
+    return entries, errors
+
+
+# records a user's votes in the vote event log; the current votes and tallies follow once
+# the events are consumed, with the last entry for a card winning. Returns the number of
+# cards voted on
+def upsert_votes(user, entries):
+    record_vote_events(user, entries)
+    return len({(entry['team_id'], entry['session_id'], entry['card_type']) for entry in entries})